@@ -538,6 +538,11 @@ class Chatbot(BaseModel):
     # Webhooks
     webhook_url: Optional[str] = None
     webhook_events: List[str] = []
+    
+    # Knowledge base retrieval: BM25 only, or BM25 fused with embeddings
+    retrieval_mode: Literal["lexical", "hybrid"] = "lexical"
+    # ANN clusters probed per query on large hybrid chatbots (higher = better recall, slower)
+    ann_nprobe: int = 8
 
 
 class ChatbotCreate(BaseModel):
@@ -581,6 +586,8 @@ class ChatbotUpdate(BaseModel):
     messages_per_hour: Optional[int] = None
     webhook_url: Optional[str] = None
     webhook_events: Optional[List[str]] = None
+    retrieval_mode: Optional[Literal["lexical", "hybrid"]] = None
+    ann_nprobe: Optional[int] = Field(None, ge=1, le=1024)
 
 
 class ChatbotResponse(BaseModel):
@@ -614,6 +621,8 @@ class ChatbotResponse(BaseModel):
     widget_size: str = "medium"
     auto_expand: bool = False
     powered_by_text: Optional[str] = None  # Custom "Powered by" text for white label
+    retrieval_mode: str = "lexical"
+    ann_nprobe: int = 8
 
 
 # Source Models
@@ -641,6 +650,16 @@ class Source(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     status: Literal["processing", "completed", "failed"] = "processing"
     error_message: Optional[str] = None
+    content_hash: Optional[str] = None  # SHA-256 of the uploaded bytes or text
+    duplicate_of: Optional[str] = None  # Source with identical content whose chunks are shared
+    chunks_saved: int = 0  # Chunks shared with other sources instead of stored again
+    bytes_saved: int = 0
+    # Website crawl budget (None uses the crawler defaults) and the pages crawled, in page-number
+    # order: url, etag, last_modified, content_hash, depth and the length of the page's text in content
+    crawl_max_pages: Optional[int] = None
+    crawl_max_depth: Optional[int] = None
+    crawl_use_sitemap: bool = False
+    crawled_pages: List[Dict[str, Any]] = []
 
 
 class SourceResponse(BaseModel):
@@ -654,6 +673,46 @@ class SourceResponse(BaseModel):
     created_at: datetime
     status: str
     error_message: Optional[str]
+    duplicate_of: Optional[str] = None
+    chunks_saved: int = 0
+    bytes_saved: int = 0
+
+
+class IngestionJob(BaseModel):
+    """Aggregate progress of a bulk upload; its sources are processed in the background"""
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    chatbot_id: str
+    user_id: str
+    source_ids: List[str] = []
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    status: Literal["processing", "completed", "failed"] = "processing"
+    error_message: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class IngestionJobResponse(BaseModel):
+    id: str
+    chatbot_id: str
+    total: int
+    completed: int
+    failed: int
+    pending: int
+    status: str
+    error_message: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class BulkIngestionResponse(BaseModel):
+    job_id: str
+    total: int
+    sources: List[SourceResponse]
+    skipped: List[Dict[str, str]] = []  # Files not ingested, with the reason
 
 
 # Chat Models
@@ -7,7 +7,7 @@ from models import (
     ConversationResponse, MessageResponse
 )
 from services.chat_service import ChatService
-from services.rag_service import RAGService
+from services.rag_service import get_rag_service
 from services.plan_service import plan_service
 from services.notification_service import NotificationService
 from services.cache_service import cache_service
@@ -28,7 +28,7 @@ def init_router(db: AsyncIOMotorDatabase):
     global db_instance, chat_service, rag_service, notification_service
     db_instance = db
     chat_service = ChatService()
-    rag_service = RAGService()
+    rag_service = get_rag_service()
     notification_service = NotificationService(db)
 
 
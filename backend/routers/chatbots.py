@@ -8,6 +8,8 @@ from models import (
 from auth import get_current_user, User
 from services.plan_service import plan_service
 from services.cache_service import cache_service
+from services.rag_service import get_rag_service
+from utils.background_tasks import spawn
 import logging
 import os
 import uuid
@@ -18,12 +20,26 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chatbots", tags=["chatbots"])
 db_instance = None
+rag_service = None
 
 
 def init_router(db: AsyncIOMotorDatabase):
     """Initialize router with database instance"""
-    global db_instance
+    global db_instance, rag_service
     db_instance = db
+    rag_service = get_rag_service()
+
+
+async def switch_retrieval_mode(chatbot_id: str, mode: str):
+    """Switch a chatbot's knowledge base to a retrieval mode, saving the mode once it is in effect"""
+    await rag_service.set_retrieval_mode(chatbot_id, mode)
+    
+    await db_instance.chatbots.update_one(
+        {"id": chatbot_id},
+        {"$set": {"retrieval_mode": mode, "updated_at": datetime.now(timezone.utc)}}
+    )
+    cache_service.delete(f"chatbot:{chatbot_id}")
+    cache_service.delete(f"public_chatbot:{chatbot_id}")
 
 
 @router.post("", response_model=ChatbotResponse, status_code=status.HTTP_201_CREATED)
@@ -185,6 +201,9 @@ async def update_chatbot(
                     }
                 )
         
+        # The retrieval mode is saved by switch_retrieval_mode once the switch succeeded
+        new_mode = update_data.pop("retrieval_mode", None)
+        
         if update_data:
             update_data["updated_at"] = datetime.now(timezone.utc)
             
@@ -196,6 +215,15 @@ async def update_chatbot(
             # Invalidate cache for this chatbot
             cache_service.delete(f"chatbot:{chatbot_id}")
             cache_service.delete(f"public_chatbot:{chatbot_id}")
+            
+            if update_data.get("ann_nprobe"):
+                await rag_service.vector_store.update_retrieval_settings(
+                    chatbot_id, {"ann_nprobe": update_data["ann_nprobe"]}
+                )
+        
+        # Switch knowledge base retrieval mode in background (hybrid embeds existing chunks)
+        if new_mode and new_mode != chatbot.get("retrieval_mode", "lexical"):
+            spawn(switch_retrieval_mode(chatbot_id, new_mode), f"retrieval-mode:{chatbot_id}")
         
         # Fetch updated chatbot
         updated_chatbot = await db_instance.chatbots.find_one({"id": chatbot_id})
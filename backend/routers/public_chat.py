@@ -7,7 +7,7 @@ from models import (
     EmbedConfig, EmbedCodeResponse, ConversationResponse, MessageResponse
 )
 from services.chat_service import ChatService
-from services.rag_service import RAGService
+from services.rag_service import get_rag_service
 from services.cache_service import cache_service
 import json
 import logging
@@ -23,7 +23,7 @@ def init_router(db: AsyncIOMotorDatabase):
     """Initialize router with database instance"""
     global db_instance, rag_service
     db_instance = db
-    rag_service = RAGService()
+    rag_service = get_rag_service()
 
 @router.get("/chatbot/{chatbot_id}", response_model=PublicChatbotInfo)
 async def get_public_chatbot(chatbot_id: str):
@@ -1,28 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List, Optional
+from typing import List, Optional, Dict
 from datetime import datetime, timezone
-from models import Source, SourceCreate, SourceResponse
+from models import Source, SourceCreate, SourceResponse, IngestionJob, IngestionJobResponse, BulkIngestionResponse
 from auth import get_current_user, get_current_user, User
 from services.document_processor import DocumentProcessor
-from services.website_scraper import WebsiteScraper
-from services.rag_service import RAGService
+from services.rag_service import get_rag_service
 from services.plan_service import plan_service
+from services.source_ingestion import SourceIngestionService
+from utils.background_tasks import spawn
 import logging
 import asyncio
+import os
+import zipfile
 
 logger = logging.getLogger(__name__)
 
+MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB per file
+MAX_BULK_FILES = int(os.environ.get('RAG_BULK_MAX_FILES', '500'))
+# Files of a bulk upload processed at once; CPU-bound work is further bounded by the ingestion pool
+BULK_CONCURRENCY = int(os.environ.get('RAG_BULK_CONCURRENCY', '4'))
+# "local" ingests in this process; "celery" hands files and websites to the workers' queues
+INGESTION_MODE = os.environ.get('RAG_INGESTION_MODE', 'local').lower()
+
 router = APIRouter(prefix="/sources", tags=["sources"])
 db_instance = None
 rag_service = None
+ingestion_service = None
 
 
 def init_router(db: AsyncIOMotorDatabase):
     """Initialize router with database instance"""
-    global db_instance, rag_service
+    global db_instance, rag_service, ingestion_service
     db_instance = db
-    rag_service = RAGService()
+    rag_service = get_rag_service()
+    ingestion_service = SourceIngestionService(db, rag_service)
 
 
 async def verify_chatbot_ownership(chatbot_id: str, user_id: str):
@@ -39,6 +51,60 @@ async def verify_chatbot_ownership(chatbot_id: str, user_id: str):
     return chatbot
 
 
+async def enqueue_ingestion_task(task_name: str, queue: str, *args):
+    """Send an ingestion task to a Celery worker queue (see celery_app.task_routes)"""
+    from celery_app import celery_app
+    # Publishing talks to the broker synchronously, so keep it off the event loop
+    await asyncio.to_thread(celery_app.send_task, task_name, args=list(args), queue=queue)
+
+
+async def dispatch_file_ingestion(
+    chatbot_id: str,
+    source_id: str,
+    filename: str,
+    file_content: bytes,
+    content_hash: str,
+    job_id: Optional[str] = None
+):
+    """
+    Ingest an uploaded file on a Celery worker (RAG_INGESTION_MODE=celery,
+    the file is staged in GridFS) or in this process
+    
+    Args:
+        job_id: Bulk ingestion job counting the source's outcome
+    """
+    if INGESTION_MODE != "celery":
+        succeeded = await ingestion_service.ingest_file(chatbot_id, source_id, filename, file_content, content_hash)
+        if job_id:
+            await ingestion_service.record_job_progress(job_id, succeeded)
+        return
+    
+    try:
+        file_id = await ingestion_service.store_upload(source_id, filename, file_content)
+        await enqueue_ingestion_task(
+            "backend.tasks.process_document", "documents",
+            source_id, chatbot_id, filename, file_id, content_hash, job_id
+        )
+    except Exception as e:
+        logger.error(f"Error queueing file ingestion: {str(e)}")
+        await ingestion_service.mark_failed(source_id, f"Failed to queue ingestion: {str(e)}")
+        if job_id:
+            await ingestion_service.record_job_progress(job_id, False)
+
+
+async def dispatch_website_ingestion(chatbot_id: str, source: Dict):
+    """Crawl and ingest a website source on a Celery worker (RAG_INGESTION_MODE=celery) or in this process"""
+    if INGESTION_MODE != "celery":
+        await ingestion_service.ingest_website(chatbot_id, source)
+        return
+    
+    try:
+        await enqueue_ingestion_task("backend.tasks.scrape_website", "websites", source["id"], chatbot_id)
+    except Exception as e:
+        logger.error(f"Error queueing website ingestion: {str(e)}")
+        await ingestion_service.mark_failed(source["id"], f"Failed to queue ingestion: {str(e)}")
+
+
 @router.get("/chatbot/{chatbot_id}", response_model=List[SourceResponse])
 async def get_sources(
     chatbot_id: str,
@@ -93,7 +159,6 @@ async def upload_file_source(
         file_size = len(file_content)
         
         # Check file size limit (100MB)
-        MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB in bytes
         if file_size > MAX_FILE_SIZE:
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
@@ -106,7 +171,8 @@ async def upload_file_source(
             type="file",
             name=file.filename,
             size=DocumentProcessor.format_size(file_size),
-            status="processing"
+            status="processing",
+            content_hash=DocumentProcessor.content_hash(file_content)
         )
         
         await db_instance.sources.insert_one(source.model_dump())
@@ -115,51 +181,11 @@ async def upload_file_source(
         await plan_service.increment_usage(current_user.id, "file_uploads")
         
         # Process file in background
-        async def process_file():
-            try:
-                content = DocumentProcessor.process_file(file.filename, file_content)
-                
-                await db_instance.sources.update_one(
-                    {"id": source.id},
-                    {"$set": {
-                        "content": content,
-                        "status": "completed"
-                    }}
-                )
-                
-                # Process with RAG (chunking + embeddings + vector storage)
-                logger.info(f"Processing document with RAG for source {source.id}")
-                rag_result = await rag_service.process_document(
-                    text=content,
-                    chatbot_id=chatbot_id,
-                    source_id=source.id,
-                    source_type="file",
-                    filename=file.filename,
-                    use_paragraph_chunking=True
-                )
-                
-                if rag_result.get("success"):
-                    logger.info(f"RAG processing successful: {rag_result.get('chunks_created')} chunks created")
-                else:
-                    logger.error(f"RAG processing failed: {rag_result.get('error')}")
-                
-                # Update chatbot last_trained timestamp
-                await db_instance.chatbots.update_one(
-                    {"id": chatbot_id},
-                    {"$set": {"last_trained": datetime.now(timezone.utc)}}
-                )
-            except Exception as e:
-                logger.error(f"Error processing file: {str(e)}")
-                await db_instance.sources.update_one(
-                    {"id": source.id},
-                    {"$set": {
-                        "status": "failed",
-                        "error_message": str(e)
-                    }}
-                )
-        
-        # Start background task
-        asyncio.create_task(process_file())
+        spawn(
+            dispatch_file_ingestion(chatbot_id, source.id, file.filename, file_content, source.content_hash),
+            f"ingest-file:{source.id}",
+            on_error=lambda error: ingestion_service.mark_failed(source.id, str(error))
+        )
         
         return SourceResponse(**source.model_dump())
     except HTTPException:
@@ -172,13 +198,305 @@ async def upload_file_source(
         )
 
 
+def collect_bulk_files(uploads: List[UploadFile]) -> tuple:
+    """
+    List the files of a bulk upload without reading their content
+    
+    Zip archives are expanded from their central directory, so the number of
+    files is known before anything is staged.
+    
+    Args:
+        uploads: Uploaded files and zip archives
+        
+    Returns:
+        (files, skipped): {"name", "upload", "member"} entries of the files to
+        stage (member is the zip entry, None for a plain upload), and
+        {"name", "reason"} entries for files that were left out
+    """
+    files = []
+    skipped = []
+    
+    for upload in uploads:
+        filename = upload.filename
+        if not filename.lower().endswith('.zip'):
+            if not DocumentProcessor.is_supported(filename):
+                skipped.append({"name": filename, "reason": "Unsupported file type"})
+            elif upload.size is not None and upload.size > MAX_FILE_SIZE:
+                skipped.append({"name": filename, "reason": "File exceeds 100MB"})
+            else:
+                files.append({"name": filename, "upload": upload, "member": None})
+            continue
+        
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile:
+            skipped.append({"name": filename, "reason": "Invalid zip archive"})
+            continue
+        with archive:
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or name.startswith('__MACOSX/') or name.split('/')[-1].startswith('.'):
+                    continue
+                if not DocumentProcessor.is_supported(name):
+                    skipped.append({"name": name, "reason": "Unsupported file type"})
+                elif member.file_size > MAX_FILE_SIZE:
+                    # Checked before decompressing so an archive cannot expand without bound
+                    skipped.append({"name": name, "reason": "File exceeds 100MB"})
+                else:
+                    files.append({"name": name.split('/')[-1], "upload": upload, "member": member})
+    
+    return files, skipped
+
+
+async def stage_bulk_files(chatbot_id: str, files: List[Dict], skipped: List[Dict]) -> tuple:
+    """
+    Stage the files listed by collect_bulk_files in GridFS as they are read
+    
+    Uploads are read block by block from their spooled files, so no upload is
+    ever held in memory.
+    
+    Args:
+        chatbot_id: Chatbot the files are uploaded to
+        files: Entries returned by collect_bulk_files
+        skipped: Skipped files so far (files found too large while reading are added)
+        
+    Returns:
+        (files, skipped): {"name", "file_id", "content_hash", "size"} entries of
+        the staged files, and {"name", "reason"} entries for files that were left out
+    """
+    staged_files = []
+    metadata = {"chatbot_id": chatbot_id}
+    archives: Dict[int, zipfile.ZipFile] = {}
+    
+    try:
+        for file in files:
+            upload, member = file["upload"], file["member"]
+            if member is None:
+                staged = await ingestion_service.stage_upload(file["name"], upload.file, metadata, max_bytes=MAX_FILE_SIZE)
+            else:
+                archive = archives.get(id(upload))
+                if archive is None:
+                    archive = archives[id(upload)] = zipfile.ZipFile(upload.file)
+                with archive.open(member) as stream:
+                    staged = await ingestion_service.stage_upload(file["name"], stream, metadata, max_bytes=MAX_FILE_SIZE)
+            
+            if staged is None:
+                skipped.append({"name": file["name"], "reason": "File exceeds 100MB"})
+                continue
+            file_id, content_hash, size = staged
+            staged_files.append({"name": file["name"], "file_id": file_id, "content_hash": content_hash, "size": size})
+    except Exception:
+        await discard_staged_files(staged_files)
+        raise
+    finally:
+        for archive in archives.values():
+            archive.close()
+    
+    return staged_files, skipped
+
+
+async def discard_staged_files(files: List[Dict]):
+    """Delete staged uploads that will not be ingested"""
+    for file in files:
+        await ingestion_service.delete_upload(file["file_id"])
+
+
+async def dispatch_staged_file_ingestion(
+    chatbot_id: str,
+    source_id: str,
+    filename: str,
+    file_id: str,
+    content_hash: str,
+    job_id: str
+):
+    """
+    Ingest a file staged in GridFS on a Celery worker (RAG_INGESTION_MODE=celery)
+    or in this process, counting its outcome on the bulk ingestion job
+    """
+    if INGESTION_MODE != "celery":
+        try:
+            file_content = await ingestion_service.load_upload(file_id)
+            succeeded = await ingestion_service.ingest_file(chatbot_id, source_id, filename, file_content, content_hash)
+            await ingestion_service.delete_upload(file_id)
+        except Exception as e:
+            logger.error(f"Error ingesting staged file {filename}: {str(e)}")
+            await ingestion_service.mark_failed(source_id, str(e))
+            succeeded = False
+        await ingestion_service.record_job_progress(job_id, succeeded)
+        return
+    
+    try:
+        await enqueue_ingestion_task(
+            "backend.tasks.process_document", "documents",
+            source_id, chatbot_id, filename, file_id, content_hash, job_id
+        )
+    except Exception as e:
+        logger.error(f"Error queueing file ingestion: {str(e)}")
+        await ingestion_service.mark_failed(source_id, f"Failed to queue ingestion: {str(e)}")
+        await ingestion_service.record_job_progress(job_id, False)
+
+
+async def run_ingestion_job(job_id: str, chatbot_id: str, files: List[tuple]):
+    """
+    Process (or queue, in celery mode) the sources of a bulk upload through a
+    bounded set of workers; each source's outcome is counted on the job document
+    
+    Args:
+        job_id: Ingestion job ID
+        chatbot_id: Chatbot the sources belong to
+        files: (source_id, filename, file_id, content_hash) tuples, file_id
+            being the GridFS id of the staged upload
+    """
+    slots = asyncio.Semaphore(max(1, BULK_CONCURRENCY))
+    
+    async def ingest(source_id: str, filename: str, file_id: str, content_hash: str):
+        async with slots:
+            await dispatch_staged_file_ingestion(chatbot_id, source_id, filename, file_id, content_hash, job_id)
+    
+    await asyncio.gather(*(ingest(*file) for file in files))
+
+
+@router.post("/chatbot/{chatbot_id}/bulk", response_model=BulkIngestionResponse, status_code=status.HTTP_201_CREATED)
+async def bulk_upload_sources(
+    chatbot_id: str,
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Upload many files (or zip archives of files) as training sources in one call"""
+    try:
+        # Verify ownership
+        await verify_chatbot_ownership(chatbot_id, current_user.id)
+        
+        # Count the files and check them against the plan before anything is staged
+        candidates, skipped = collect_bulk_files(files)
+        if not candidates:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "No supported files to ingest", "skipped": skipped}
+            )
+        if len(candidates) > MAX_BULK_FILES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"A bulk upload can contain at most {MAX_BULK_FILES} files"
+            )
+        
+        # Check plan limits for the whole batch
+        limit_check = await plan_service.check_limit(current_user.id, "file_uploads")
+        if limit_check["current"] + len(candidates) > limit_check["max"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail={
+                    "message": "File upload limit reached for your plan",
+                    "current": limit_check["current"],
+                    "max": limit_check["max"],
+                    "requested": len(candidates),
+                    "upgrade_required": True
+                }
+            )
+        
+        # Uploads are closed once the response is sent, so stage them before processing
+        to_ingest, skipped = await stage_bulk_files(chatbot_id, candidates, skipped)
+        if not to_ingest:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "No supported files to ingest", "skipped": skipped}
+            )
+        
+        # Create every source entry in one round trip
+        sources = [
+            Source(
+                chatbot_id=chatbot_id,
+                type="file",
+                name=file["name"],
+                size=DocumentProcessor.format_size(file["size"]),
+                status="processing",
+                content_hash=file["content_hash"]
+            )
+            for file in to_ingest
+        ]
+        await db_instance.sources.insert_many([source.model_dump() for source in sources])
+        
+        # Increment usage count
+        await plan_service.increment_usage(current_user.id, "file_uploads", amount=len(sources))
+        
+        job = IngestionJob(
+            chatbot_id=chatbot_id,
+            user_id=current_user.id,
+            source_ids=[source.id for source in sources],
+            total=len(sources)
+        )
+        await db_instance.ingestion_jobs.insert_one(job.model_dump())
+        
+        # Process all files in background; if the job itself breaks, its
+        # sources would otherwise stay "processing" forever
+        source_ids = [] if INGESTION_MODE == "celery" else job.source_ids
+        spawn(
+            run_ingestion_job(job.id, chatbot_id, [
+                (source.id, file["name"], file["file_id"], file["content_hash"])
+                for source, file in zip(sources, to_ingest)
+            ]),
+            f"ingestion-job:{job.id}",
+            on_error=lambda error: ingestion_service.fail_job(job.id, str(error), source_ids)
+        )
+        
+        logger.info(f"Bulk upload for chatbot {chatbot_id}: {len(sources)} sources, {len(skipped)} skipped (job {job.id})")
+        return BulkIngestionResponse(
+            job_id=job.id,
+            total=len(sources),
+            sources=[SourceResponse(**source.model_dump()) for source in sources],
+            skipped=skipped
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in bulk upload: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to upload files"
+        )
+
+
+@router.get("/bulk/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Get the aggregate progress of a bulk upload"""
+    try:
+        job = await db_instance.ingestion_jobs.find_one({
+            "id": job_id,
+            "user_id": current_user.id
+        })
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Ingestion job not found"
+            )
+        
+        return IngestionJobResponse(
+            **job,
+            pending=job["total"] - job["completed"] - job["failed"]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching ingestion job: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch ingestion job"
+        )
+
+
 @router.post("/chatbot/{chatbot_id}/website", response_model=SourceResponse, status_code=status.HTTP_201_CREATED)
 async def add_website_source(
     chatbot_id: str,
     url: str = Form(...),
+    max_pages: Optional[int] = Form(None),
+    max_depth: Optional[int] = Form(None),
+    use_sitemap: bool = Form(False),
     current_user: User = Depends(get_current_user)
 ):
-    """Add a website as a training source"""
+    """Add a website as a training source, crawling same-site links (or its sitemap) up to a page budget"""
     try:
         # Check plan limits for website sources
         limit_check = await plan_service.check_limit(current_user.id, "website_sources")
@@ -202,7 +520,10 @@ async def add_website_source(
             type="website",
             name=url,
             url=url,
-            status="processing"
+            status="processing",
+            crawl_max_pages=max_pages,
+            crawl_max_depth=max_depth,
+            crawl_use_sitemap=use_sitemap
         )
         
         await db_instance.sources.insert_one(source.model_dump())
@@ -210,52 +531,12 @@ async def add_website_source(
         # Increment usage count
         await plan_service.increment_usage(current_user.id, "website_sources")
         
-        # Scrape website in background
-        async def scrape_website():
-            try:
-                content = WebsiteScraper.scrape_url(url)
-                
-                await db_instance.sources.update_one(
-                    {"id": source.id},
-                    {"$set": {
-                        "content": content,
-                        "status": "completed"
-                    }}
-                )
-                
-                # Process with RAG
-                logger.info(f"Processing website with RAG for source {source.id}")
-                rag_result = await rag_service.process_document(
-                    text=content,
-                    chatbot_id=chatbot_id,
-                    source_id=source.id,
-                    source_type="website",
-                    filename=url,
-                    use_paragraph_chunking=True
-                )
-                
-                if rag_result.get("success"):
-                    logger.info(f"RAG processing successful: {rag_result.get('chunks_created')} chunks created")
-                else:
-                    logger.error(f"RAG processing failed: {rag_result.get('error')}")
-                
-                # Update chatbot last_trained timestamp
-                await db_instance.chatbots.update_one(
-                    {"id": chatbot_id},
-                    {"$set": {"last_trained": datetime.now(timezone.utc)}}
-                )
-            except Exception as e:
-                logger.error(f"Error scraping website: {str(e)}")
-                await db_instance.sources.update_one(
-                    {"id": source.id},
-                    {"$set": {
-                        "status": "failed",
-                        "error_message": str(e)
-                    }}
-                )
-        
-        # Start background task
-        asyncio.create_task(scrape_website())
+        # Crawl website in background
+        spawn(
+            dispatch_website_ingestion(chatbot_id, source.model_dump()),
+            f"ingest-website:{source.id}",
+            on_error=lambda error: ingestion_service.mark_failed(source.id, str(error))
+        )
         
         return SourceResponse(**source.model_dump())
     except HTTPException:
@@ -299,7 +580,8 @@ async def add_text_source(
             type="text",
             name=name,
             content=content,
-            status="completed"
+            status="processing",
+            content_hash=DocumentProcessor.content_hash(content.encode("utf-8"))
         )
         
         await db_instance.sources.insert_one(source.model_dump())
@@ -308,27 +590,10 @@ async def add_text_source(
         await plan_service.increment_usage(current_user.id, "text_sources")
         
         # Process with RAG immediately (text is already available)
-        async def process_text():
-            try:
-                logger.info(f"Processing text content with RAG for source {source.id}")
-                rag_result = await rag_service.process_document(
-                    text=content,
-                    chatbot_id=chatbot_id,
-                    source_id=source.id,
-                    source_type="text",
-                    filename=name,
-                    use_paragraph_chunking=True
-                )
-                
-                if rag_result.get("success"):
-                    logger.info(f"RAG processing successful: {rag_result.get('chunks_created')} chunks created")
-                else:
-                    logger.error(f"RAG processing failed: {rag_result.get('error')}")
-            except Exception as e:
-                logger.error(f"Error in RAG processing for text: {str(e)}")
-        
-        # Start background task
-        asyncio.create_task(process_text())
+        spawn(
+            ingestion_service.ingest_text(chatbot_id, source.id, name, content, source.content_hash),
+            f"ingest-text:{source.id}"
+        )
         
         # Update chatbot last_trained timestamp
         await db_instance.chatbots.update_one(
@@ -347,6 +612,115 @@ async def add_text_source(
         )
 
 
+@router.post("/{source_id}/refresh", response_model=SourceResponse)
+async def refresh_source(
+    source_id: str,
+    content: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Refresh a text source (new content) or website source (scraped again), rewriting only changed chunks"""
+    try:
+        # Get source
+        source = await db_instance.sources.find_one({"id": source_id})
+        if not source:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Source not found"
+            )
+        
+        # Verify ownership through chatbot
+        await verify_chatbot_ownership(source["chatbot_id"], current_user.id)
+        
+        if source["type"] == "text" and content is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Content is required to refresh a text source"
+            )
+        if source["type"] not in ("text", "website"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Only text and website sources can be refreshed"
+            )
+        
+        chatbot_id = source["chatbot_id"]
+        
+        # Re-ingest in background; the current chunks keep serving until then
+        async def refresh():
+            try:
+                pages = None
+                crawled_pages = source.get("crawled_pages", [])
+                if source["type"] == "text":
+                    new_content = content
+                else:
+                    # Pages answering 304 or with an unchanged body are not parsed again
+                    new_content, pages, crawled_pages = await ingestion_service.crawl_website(source, conditional=True)
+                content_hash = DocumentProcessor.content_hash(new_content.encode("utf-8"))
+                
+                if content_hash == source.get("content_hash"):
+                    if source["type"] == "website":
+                        # Keep the latest validators for the next conditional re-crawl
+                        await db_instance.sources.update_one(
+                            {"id": source_id},
+                            {"$set": {"crawled_pages": crawled_pages}}
+                        )
+                    logger.info(f"Source {source_id} is unchanged, nothing to refresh")
+                    return
+                
+                rag_result = await rag_service.refresh_document(
+                    text=new_content,
+                    chatbot_id=chatbot_id,
+                    source_id=source_id,
+                    source_type=source["type"],
+                    filename=source["name"],
+                    use_paragraph_chunking=True,
+                    pages=pages
+                )
+                if not rag_result.get("success"):
+                    raise Exception(rag_result.get("error"))
+                
+                logger.info(
+                    f"Refreshed source {source_id}: {rag_result['chunks_added']} chunks added, "
+                    f"{rag_result['chunks_kept']} kept, {rag_result['chunks_removed']} removed"
+                )
+                
+                await db_instance.sources.update_one(
+                    {"id": source_id},
+                    {"$set": {
+                        "content": new_content,
+                        "content_hash": content_hash,
+                        "crawled_pages": crawled_pages,
+                        "status": "completed",
+                        "error_message": None,
+                        "duplicate_of": None
+                    }}
+                )
+                
+                # Update chatbot last_trained timestamp
+                await db_instance.chatbots.update_one(
+                    {"id": chatbot_id},
+                    {"$set": {"last_trained": datetime.now(timezone.utc)}}
+                )
+            except Exception as e:
+                logger.error(f"Error refreshing source: {str(e)}")
+                await db_instance.sources.update_one(
+                    {"id": source_id},
+                    {"$set": {"error_message": f"Refresh failed: {str(e)}"}}
+                )
+        
+        # Start background task
+        spawn(refresh(), f"refresh-source:{source_id}")
+        
+        return SourceResponse(**source)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error refreshing source: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to refresh source"
+        )
+
+
 @router.delete("/{source_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_source(
     source_id: str,
@@ -0,0 +1,108 @@
+"""Benchmark HTML-to-text extractors on a corpus of saved pages
+
+Compares the throughput and peak memory of every extractor in
+services.html_extractor.HTML_EXTRACTORS, and how often each one's text
+differs from the BeautifulSoup reference.
+
+Usage (from the backend directory):
+    python scripts/benchmark_html_extraction.py [CORPUS_DIR] [--repeat N]
+
+CORPUS_DIR holds saved pages (*.html, *.htm). Without it a synthetic corpus
+of documentation-like pages is generated.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.html_extractor import HTML_EXTRACTORS, BeautifulSoupExtractor  # noqa: E402
+
+
+def load_corpus(directory: str):
+    """Read the saved pages of a directory (recursively)"""
+    pages = []
+    for path in sorted(Path(directory).rglob("*")):
+        if path.suffix.lower() in (".html", ".htm") and path.is_file():
+            pages.append((str(path), path.read_bytes()))
+    return pages
+
+
+def synthetic_corpus(count: int = 200):
+    """Documentation-like pages with navigation, scripts and long bodies"""
+    nav = "<nav><ul>" + "".join(f'<li><a href="/docs/{i}">Section {i}</a></li>' for i in range(60)) + "</ul></nav>"
+    script = "<script>" + "var config = {key: 'value'};\n" * 200 + "</script>"
+    style = "<style>" + ".cls { color: red; }\n" * 200 + "</style>"
+    pages = []
+    for page_no in range(count):
+        sections = []
+        for section in range(40 + page_no % 40):
+            sections.append(
+                f"<h2 id='s{section}'>Heading {section}</h2>"
+                f"<p>Paragraph {section} of page {page_no} explains <b>refunds</b>, "
+                f"<a href='/docs/{section}#anchor'>billing</a> &amp; integrations in detail.</p>"
+                f"<ul><li>First item</li><li>Second item</li></ul>"
+                f"<pre><code>curl https://api.example.com/v1/{section}</code></pre>"
+            )
+        html = (
+            f"<!DOCTYPE html><html><head><title>Page {page_no}</title>{style}{script}</head>"
+            f"<body><header><h1>Docs</h1></header>{nav}<main>{''.join(sections)}</main>"
+            f"<footer>Copyright</footer>{script}</body></html>"
+        )
+        pages.append((f"synthetic-{page_no}.html", html.encode("utf-8")))
+    return pages
+
+
+def run(extractor, pages, repeat: int):
+    """Extract every page `repeat` times; returns (seconds, outputs of the last pass)"""
+    outputs = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        outputs = [extractor.extract_page(html, "https://example.com/") for _, html in pages]
+    return time.perf_counter() - started, outputs
+
+
+def peak_memory(extractor, pages) -> int:
+    """Highest traced allocation while extracting a single page, over the corpus"""
+    peak = 0
+    for _, html in pages:
+        tracemalloc.start()
+        extractor.extract_page(html, "https://example.com/")
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", help="Directory of saved pages (*.html)")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per extractor")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not pages:
+        sys.exit(f"No pages found in {args.corpus}")
+    total_mb = sum(len(html) for _, html in pages) / (1024 * 1024)
+    print(f"Corpus: {len(pages)} pages, {total_mb:.1f} MB, {args.repeat} passes (pid {os.getpid()})")
+
+    _, reference = run(BeautifulSoupExtractor(), pages, 1)
+
+    print(f"{'extractor':<15}{'seconds':>10}{'MB/s':>10}{'pages/s':>10}{'peak MB':>10}{'text diffs':>12}{'link diffs':>12}")
+    for name, extractor_class in HTML_EXTRACTORS.items():
+        extractor = extractor_class()
+        seconds, outputs = run(extractor, pages, args.repeat)
+        peak = peak_memory(extractor, pages)
+        text_diffs = sum(1 for out, ref in zip(outputs, reference) if out[0] != ref[0])
+        link_diffs = sum(1 for out, ref in zip(outputs, reference) if out[1] != ref[1])
+        print(
+            f"{name:<15}{seconds:>10.2f}{total_mb * args.repeat / seconds:>10.1f}"
+            f"{len(pages) * args.repeat / seconds:>10.0f}{peak / (1024 * 1024):>10.1f}"
+            f"{text_diffs:>12}{link_diffs:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
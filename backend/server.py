@@ -116,6 +116,9 @@ async def root():
 async def health_check():
     """Health check endpoint with database and connection pool status"""
     from config.scalability import get_pool_health
+    from services.cache_service import cache_service, corpus_cache, query_cache
+    from services.retrieval_metrics import retrieval_metrics
+    from services.ingestion_pool import ingestion_pool
     
     try:
         # Check database connectivity
@@ -137,7 +140,14 @@ async def health_check():
             "min_pool_size": ScalabilityConfig.MONGO_MIN_POOL_SIZE,
             "concurrent_tasks_limit": ScalabilityConfig.ASYNC_CONCURRENCY_LIMIT,
             "rate_limit_per_minute": ScalabilityConfig.RATE_LIMIT_PER_MINUTE
-        }
+        },
+        "caches": {
+            "settings": cache_service.get_stats(),
+            "retrieval_corpus": corpus_cache.get_stats(),
+            "retrieval_results": query_cache.get_stats()
+        },
+        "retrieval": retrieval_metrics.get_stats(),
+        "ingestion": ingestion_pool.get_stats()
     }
 
 # Include all routers
@@ -229,8 +239,9 @@ async def startup_event():
     
     # Create database indexes for optimal performance
     try:
-        from utils.database_indexes import create_performance_indexes
+        from utils.database_indexes import create_performance_indexes, index_registry
         await create_performance_indexes(db)
+        await index_registry.ensure()
     except Exception as e:
         logger.warning(f"Note: Some indexes may already exist: {e}")
     
@@ -297,6 +308,20 @@ async def shutdown_db_client():
     except Exception as e:
         logger.warning(f"Error stopping Discord bots: {str(e)}")
     
+    # Stop ingestion worker processes
+    try:
+        from services.ingestion_pool import ingestion_pool
+        ingestion_pool.shutdown()
+    except Exception as e:
+        logger.warning(f"Error stopping ingestion pool: {str(e)}")
+    
+    # Close pooled crawler connections
+    try:
+        from services.website_crawler import website_crawler
+        await website_crawler.close()
+    except Exception as e:
+        logger.warning(f"Error closing website crawler: {str(e)}")
+    
     client.close()
 
 
@@ -0,0 +1,108 @@
+import logging
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo import DESCENDING
+from .dense_index import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+
+class AnnIndexStore:
+    """
+    Persists per-chatbot IVF indexes in MongoDB GridFS
+
+    Every save uploads a new revision and removes the older ones, so all
+    processes can tell whether the copy they hold in memory is current by
+    comparing revisions.
+    """
+
+    def __init__(self, db, bucket_name: str = "ann_indexes"):
+        """
+        Initialize GridFS bucket
+
+        Args:
+            db: Motor database instance
+            bucket_name: GridFS bucket holding the serialized indexes
+        """
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files_collection = db[f"{bucket_name}.files"]
+
+    @staticmethod
+    def _filename(chatbot_id: str) -> str:
+        return f"{chatbot_id}.ivf"
+
+    async def _latest_file(self, chatbot_id: str) -> Optional[dict]:
+        """Metadata of the newest stored revision"""
+        cursor = self.files_collection.find(
+            {"filename": self._filename(chatbot_id)},
+            {"_id": 1, "metadata": 1}
+        ).sort("metadata.revision", DESCENDING).limit(1)
+        files = await cursor.to_list(length=1)
+        return files[0] if files else None
+
+    async def get_revision(self, chatbot_id: str) -> int:
+        """
+        Get the newest stored revision of a chatbot's index
+
+        Returns:
+            Revision number (0 if no index is stored)
+        """
+        latest = await self._latest_file(chatbot_id)
+        return latest["metadata"]["revision"] if latest else 0
+
+    async def load(self, chatbot_id: str) -> Optional[IVFIndex]:
+        """
+        Load the newest stored index of a chatbot
+
+        Args:
+            chatbot_id: Chatbot identifier
+
+        Returns:
+            IVFIndex or None if no index is stored
+        """
+        latest = await self._latest_file(chatbot_id)
+        if not latest:
+            return None
+
+        stream = await self.bucket.open_download_stream(latest["_id"])
+        data = await stream.read()
+        return IVFIndex.from_bytes(data, revision=latest["metadata"]["revision"])
+
+    async def save(self, chatbot_id: str, index: IVFIndex) -> int:
+        """
+        Store an index as a new revision
+
+        Args:
+            chatbot_id: Chatbot identifier
+            index: Index to store (its revision is updated in place)
+
+        Returns:
+            New revision number
+        """
+        filename = self._filename(chatbot_id)
+        revision = max(index.revision, await self.get_revision(chatbot_id)) + 1
+
+        await self.bucket.upload_from_stream(
+            filename,
+            index.to_bytes(),
+            metadata={"chatbot_id": chatbot_id, "revision": revision, "count": index.count}
+        )
+        index.revision = revision
+
+        # Older revisions are no longer needed once the new one is readable
+        async for stale in self.files_collection.find(
+            {"filename": filename, "metadata.revision": {"$lt": revision}},
+            {"_id": 1}
+        ):
+            await self.bucket.delete(stale["_id"])
+
+        logger.info(f"Saved ANN index revision {revision} for chatbot {chatbot_id} ({index.count} vectors)")
+        return revision
+
+    async def delete(self, chatbot_id: str):
+        """Remove every stored revision of a chatbot's index"""
+        async for stored in self.files_collection.find(
+            {"filename": self._filename(chatbot_id)},
+            {"_id": 1}
+        ):
+            await self.bucket.delete(stored["_id"])
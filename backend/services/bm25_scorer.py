@@ -0,0 +1,430 @@
+import logging
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def bm25_idf(doc_freqs: np.ndarray, total_docs: int) -> np.ndarray:
+    """
+    Calculate BM25 inverse document frequency for an array of terms
+
+    Args:
+        doc_freqs: Number of documents containing each term
+        total_docs: Number of documents in the corpus
+
+    Returns:
+        Array of IDF weights (always positive)
+    """
+    doc_freqs = np.asarray(doc_freqs, dtype=np.float64)
+    return np.log1p((total_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+
+def bm25_contribution(
+    idf: float,
+    tf: float,
+    doc_length: float,
+    avg_doc_length: float,
+    k1: float = 1.5,
+    b: float = 0.75
+) -> float:
+    """
+    Score a single term adds to one chunk (scalar form of bm25_scores)
+
+    Args:
+        idf: IDF weight of the term
+        tf: Frequency of the term in the chunk
+        doc_length: Number of index terms of the chunk
+        avg_doc_length: Average document length of the whole corpus
+        k1: BM25 parameter (term frequency saturation)
+        b: BM25 parameter (length normalization)
+
+    Returns:
+        BM25 contribution of the term
+    """
+    length_norm = 1 - b + b * (doc_length / max(avg_doc_length, 1))
+    return idf * tf * (k1 + 1) / (tf + k1 * length_norm)
+
+
+def bm25_max_contribution(idf: float, max_tf: float, avg_doc_length: float) -> float:
+    """
+    Upper bound of a term's BM25 contribution to the score of any chunk
+
+    A chunk containing the term tf times has at least tf index terms, and the
+    contribution at that shortest length grows with tf, so the bound for the
+    highest tf of the term holds for all of its postings.
+
+    Args:
+        idf: IDF weight of the term
+        max_tf: Highest frequency of the term in any chunk
+        avg_doc_length: Average document length of the whole corpus
+
+    Returns:
+        Largest score the term can add to a chunk
+    """
+    return bm25_contribution(idf, max_tf, max_tf, avg_doc_length)
+
+
+class SparseTermMatrix:
+    """
+    Compressed sparse column (CSC) term-frequency matrix
+
+    Rows are chunks and columns are terms. The postings of every term are
+    stored as contiguous int32 row / float32 tf slices, so a query scores all
+    of its candidate chunks in a single vectorized pass.
+    """
+
+    def __init__(
+        self,
+        chunk_ids: List[str],
+        doc_lengths: np.ndarray,
+        vocabulary: Dict[str, int],
+        indptr: np.ndarray,
+        rows: np.ndarray,
+        tfs: np.ndarray
+    ):
+        """
+        Initialize matrix from CSC arrays
+
+        Args:
+            chunk_ids: Chunk identifier of each row
+            doc_lengths: Number of index terms of each row
+            vocabulary: Mapping of term to column
+            indptr: Column start offsets into rows/tfs (len(vocabulary) + 1)
+            rows: Row index of each non-zero entry
+            tfs: Term frequency of each non-zero entry
+        """
+        self.chunk_ids = chunk_ids
+        self.doc_lengths = doc_lengths
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.rows = rows
+        self.tfs = tfs
+
+    @classmethod
+    def from_postings(cls, postings: Dict[str, List[Dict]]) -> "SparseTermMatrix":
+        """
+        Build a matrix from postings grouped by term
+
+        Args:
+            postings: Dictionary mapping term to posting dicts with
+                chunk_id, tf and doc_length
+
+        Returns:
+            SparseTermMatrix covering every chunk referenced by the postings
+        """
+        row_of: Dict[str, int] = {}
+        chunk_ids: List[str] = []
+        doc_lengths: List[int] = []
+        vocabulary: Dict[str, int] = {}
+        indptr = [0]
+        rows: List[int] = []
+        tfs: List[int] = []
+
+        for term, term_postings in postings.items():
+            vocabulary[term] = len(vocabulary)
+            for posting in term_postings:
+                chunk_id = posting["chunk_id"]
+                row = row_of.get(chunk_id)
+                if row is None:
+                    row = row_of[chunk_id] = len(chunk_ids)
+                    chunk_ids.append(chunk_id)
+                    doc_lengths.append(posting["doc_length"])
+                rows.append(row)
+                tfs.append(posting["tf"])
+            indptr.append(len(rows))
+
+        return cls(
+            chunk_ids=chunk_ids,
+            doc_lengths=np.asarray(doc_lengths, dtype=np.float32),
+            vocabulary=vocabulary,
+            indptr=np.asarray(indptr, dtype=np.int64),
+            rows=np.asarray(rows, dtype=np.int32),
+            tfs=np.asarray(tfs, dtype=np.float32)
+        )
+
+    @classmethod
+    def from_term_counts(
+        cls,
+        chunk_ids: List[str],
+        term_counts: List[Dict[str, int]]
+    ) -> "SparseTermMatrix":
+        """
+        Build a matrix from per-chunk term frequencies
+
+        Args:
+            chunk_ids: Chunk identifier of each row
+            term_counts: Term frequency map of each row
+
+        Returns:
+            SparseTermMatrix with one row per chunk
+        """
+        term_rows: Dict[str, List[int]] = {}
+        term_tfs: Dict[str, List[int]] = {}
+        doc_lengths = np.zeros(len(chunk_ids), dtype=np.float32)
+
+        for row, counts in enumerate(term_counts):
+            doc_lengths[row] = sum(counts.values())
+            for term, tf in counts.items():
+                term_rows.setdefault(term, []).append(row)
+                term_tfs.setdefault(term, []).append(tf)
+
+        vocabulary = {term: col for col, term in enumerate(term_rows)}
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(rows) for rows in term_rows.values()])
+
+        rows = np.fromiter(
+            (row for term_row in term_rows.values() for row in term_row),
+            dtype=np.int32, count=int(indptr[-1])
+        )
+        tfs = np.fromiter(
+            (tf for term_tf in term_tfs.values() for tf in term_tf),
+            dtype=np.float32, count=int(indptr[-1])
+        )
+
+        return cls(
+            chunk_ids=list(chunk_ids),
+            doc_lengths=doc_lengths,
+            vocabulary=vocabulary,
+            indptr=indptr,
+            rows=rows,
+            tfs=tfs
+        )
+
+    @property
+    def doc_freqs(self) -> np.ndarray:
+        """Number of rows containing each term (indexed by column)"""
+        return np.diff(self.indptr)
+
+    @property
+    def num_docs(self) -> int:
+        """Number of chunks (rows) in the matrix"""
+        return len(self.chunk_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the numeric arrays"""
+        return self.doc_lengths.nbytes + self.indptr.nbytes + self.rows.nbytes + self.tfs.nbytes
+
+    def bm25_scores(
+        self,
+        term_weights: Dict[str, float],
+        avg_doc_length: float,
+        k1: float = 1.5,
+        b: float = 0.75
+    ) -> np.ndarray:
+        """
+        Score every row against a weighted query
+
+        Args:
+            term_weights: IDF weight of each query term
+            avg_doc_length: Average document length of the whole corpus
+            k1: BM25 parameter (term frequency saturation)
+            b: BM25 parameter (length normalization)
+
+        Returns:
+            Dense float32 array with one BM25 score per row
+        """
+        columns = [
+            (self.vocabulary[term], weight)
+            for term, weight in term_weights.items()
+            if term in self.vocabulary
+        ]
+        if not columns or not self.num_docs:
+            return np.zeros(self.num_docs, dtype=np.float32)
+
+        # Gather the non-zero entries of all query columns at once
+        slices = [np.arange(self.indptr[col], self.indptr[col + 1]) for col, _ in columns]
+        entries = np.concatenate(slices)
+        weights = np.repeat(
+            np.asarray([weight for _, weight in columns], dtype=np.float32),
+            [len(entry_slice) for entry_slice in slices]
+        )
+
+        rows = self.rows[entries]
+        tf = self.tfs[entries]
+        length_norm = 1 - b + b * (self.doc_lengths[rows] / max(avg_doc_length, 1))
+        contributions = weights * tf * (k1 + 1) / (tf + k1 * length_norm)
+
+        return np.bincount(rows, weights=contributions, minlength=self.num_docs).astype(np.float32)
+
+    def bm25_scores_batch(
+        self,
+        term_weights: List[Dict[str, float]],
+        avg_doc_length: float,
+        k1: float = 1.5,
+        b: float = 0.75
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score many weighted queries at once
+
+        The BM25 term contributions of every candidate row are computed once
+        for the union of all query terms; the per-query scores are then a
+        single (queries x terms) @ (terms x candidates) matrix product.
+
+        Args:
+            term_weights: IDF weight of each query term, one dict per query
+            avg_doc_length: Average document length of the whole corpus
+            k1: BM25 parameter (term frequency saturation)
+            b: BM25 parameter (length normalization)
+
+        Returns:
+            Tuple of (candidate rows, float32 scores with one row per query and
+            one column per candidate)
+        """
+        terms = list(dict.fromkeys(
+            term for weights in term_weights for term in weights if term in self.vocabulary
+        ))
+        if not terms or not self.num_docs:
+            return np.empty(0, dtype=np.int32), np.zeros((len(term_weights), 0), dtype=np.float32)
+
+        column_of = {term: i for i, term in enumerate(terms)}
+        query_weights = np.zeros((len(term_weights), len(terms)), dtype=np.float32)
+        for query, weights in enumerate(term_weights):
+            for term, weight in weights.items():
+                if term in column_of:
+                    query_weights[query, column_of[term]] = weight
+
+        # Gather the non-zero entries of every query term
+        columns = np.asarray([self.vocabulary[term] for term in terms], dtype=np.int64)
+        starts = self.indptr[columns]
+        counts = self.indptr[columns + 1] - starts
+        entry_terms = np.repeat(np.arange(len(terms)), counts)
+        entries = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+
+        rows = self.rows[entries]
+        tf = self.tfs[entries]
+        length_norm = 1 - b + b * (self.doc_lengths[rows] / max(avg_doc_length, 1))
+        contributions = tf * (k1 + 1) / (tf + k1 * length_norm)
+
+        candidates, candidate_index = np.unique(rows, return_inverse=True)
+        term_matrix = np.zeros((len(terms), len(candidates)), dtype=np.float32)
+        term_matrix[entry_terms, candidate_index] = contributions
+
+        return candidates, query_weights @ term_matrix
+
+    def top_k(self, scores: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[float, str]]:
+        """
+        Select the k best positive scores
+
+        Args:
+            scores: Scores returned by bm25_scores (or one row of bm25_scores_batch)
+            k: Number of results
+            rows: Matrix row of each score (default: scores cover every row)
+
+        Returns:
+            List of (score, chunk_id) sorted by descending score
+        """
+        positive = np.flatnonzero(scores > 0)
+        if not len(positive) or k <= 0:
+            return []
+
+        if len(positive) > k:
+            # argpartition is O(n); only the k winners get sorted
+            positive = positive[np.argpartition(scores[positive], -k)[-k:]]
+
+        best = positive[np.argsort(-scores[positive], kind="stable")]
+        if rows is not None:
+            return [(float(scores[i]), self.chunk_ids[rows[i]]) for i in best]
+        return [(float(scores[row]), self.chunk_ids[row]) for row in best]
+
+
+class CorpusIndex:
+    """
+    In-memory BM25 index over every chunk of a chatbot
+
+    Holds the full term-frequency matrix built from the term counts stored at
+    ingest time, so a cached chatbot is ranked without touching the postings
+    collection; only the text of the winners is read from MongoDB. The corpus
+    version it was built from is used to detect when it has gone stale.
+    """
+
+    # Rough per-object overhead used for the memory estimate
+    CHUNK_OVERHEAD_BYTES = 100
+    TERM_OVERHEAD_BYTES = 120
+
+    def __init__(self, matrix: SparseTermMatrix, version: int):
+        """
+        Initialize corpus index
+
+        Args:
+            matrix: Term-frequency matrix over all chunks of the chatbot
+            version: Corpus version the index was built from
+        """
+        self.matrix = matrix
+        self.version = version
+        self.checked_at = 0.0
+
+        total_docs = matrix.num_docs
+        self.avg_doc_length = float(matrix.doc_lengths.mean()) if total_docs else 0.0
+        self.idf = bm25_idf(matrix.doc_freqs, total_docs)
+
+    @classmethod
+    def from_term_counts(
+        cls,
+        chunk_ids: List[str],
+        term_counts: List[Dict[str, int]],
+        version: int
+    ) -> "CorpusIndex":
+        """
+        Build an index from per-chunk term frequencies
+
+        Args:
+            chunk_ids: Chunk identifier of each chunk
+            term_counts: Term frequency map of each chunk
+            version: Corpus version the chunks were read at
+
+        Returns:
+            CorpusIndex over the given chunks
+        """
+        return cls(SparseTermMatrix.from_term_counts(chunk_ids, term_counts), version)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the index"""
+        return (
+            self.matrix.nbytes
+            + self.idf.nbytes
+            + self.matrix.num_docs * self.CHUNK_OVERHEAD_BYTES
+            + len(self.matrix.vocabulary) * self.TERM_OVERHEAD_BYTES
+        )
+
+    def _term_weights(self, query_terms: List[str]) -> Dict[str, float]:
+        """IDF weight of each query term present in the corpus"""
+        vocabulary = self.matrix.vocabulary
+        return {
+            term: float(self.idf[vocabulary[term]])
+            for term in query_terms
+            if term in vocabulary
+        }
+
+    def search(self, query_terms: List[str], top_k: int) -> List[Tuple[float, str]]:
+        """
+        Rank chunks for a query
+
+        Args:
+            query_terms: Normalized query terms
+            top_k: Number of results
+
+        Returns:
+            List of (score, chunk_id) sorted by descending score
+        """
+        scores = self.matrix.bm25_scores(self._term_weights(query_terms), self.avg_doc_length)
+        return self.matrix.top_k(scores, top_k)
+
+    def search_batch(self, queries_terms: List[List[str]], top_k: int) -> List[List[Tuple[float, str]]]:
+        """
+        Rank chunks for many queries in one vectorized pass
+
+        Args:
+            queries_terms: Normalized terms of each query
+            top_k: Number of results per query
+
+        Returns:
+            One list of (score, chunk_id) per query, sorted by descending score
+        """
+        rows, scores = self.matrix.bm25_scores_batch(
+            [self._term_weights(query_terms) for query_terms in queries_terms],
+            self.avg_doc_length
+        )
+        return [self.matrix.top_k(query_scores, top_k, rows) for query_scores in scores]
@@ -1,6 +1,8 @@
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
+from collections import OrderedDict
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -107,5 +109,159 @@ class CacheService:
         }
 
 
+class LRUCache:
+    """
+    In-memory LRU cache bounded by an approximate memory budget
+    Used for large per-chatbot objects such as in-memory retrieval indexes,
+    and with an optional TTL for retrieval results
+    """
+    
+    def __init__(self, max_bytes: int, ttl_seconds: Optional[int] = None):
+        """
+        Initialize LRU cache
+        
+        Args:
+            max_bytes: Memory budget shared by all entries
+            ttl_seconds: Optional time to live for entries (no expiry if not provided)
+        """
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+        logger.info(f"LRU cache initialized with {max_bytes // (1024 * 1024)}MB budget")
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get value from cache and mark it as most recently used
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Cached value or None if not found or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        if entry["expires_at"] is not None and datetime.now() > entry["expires_at"]:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry["value"]
+    
+    def peek(self, key: str) -> Optional[Any]:
+        """Get value without touching recency or hit/miss statistics"""
+        entry = self._entries.get(key)
+        return entry["value"] if entry is not None else None
+    
+    def set(self, key: str, value: Any, size_bytes: int) -> bool:
+        """
+        Set value in cache, evicting least recently used entries if needed
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            size_bytes: Approximate memory used by the value
+            
+        Returns:
+            False if the value alone exceeds the memory budget (not cached)
+        """
+        if size_bytes > self.max_bytes:
+            return False
+        
+        self._remove(key)
+        
+        while self._entries and self.current_bytes + size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted["size_bytes"]
+            self.evictions += 1
+        
+        expires_at = None
+        if self.ttl_seconds is not None:
+            expires_at = datetime.now() + timedelta(seconds=self.ttl_seconds)
+        
+        self._entries[key] = {"value": value, "size_bytes": size_bytes, "expires_at": expires_at}
+        self.current_bytes += size_bytes
+        return True
+    
+    def delete(self, key: str):
+        """Invalidate a key"""
+        if self._remove(key):
+            self.invalidations += 1
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Invalidate every key starting with a prefix
+        
+        Args:
+            prefix: Key prefix
+            
+        Returns:
+            Number of entries removed
+        """
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        return len(keys)
+    
+    def clear(self):
+        """Clear all cache entries"""
+        self._entries.clear()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+        logger.info("LRU cache cleared")
+    
+    def _remove(self, key: str) -> bool:
+        """Remove an entry and release its memory"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.current_bytes -= entry["size_bytes"]
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total_requests = self.hits + self.misses
+        hit_rate = (self.hits / total_requests * 100) if total_requests > 0 else 0
+        
+        return {
+            "size": len(self._entries),
+            "memory_bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+            "hit_rate": round(hit_rate, 2),
+            "total_requests": total_requests
+        }
+
+
 # Global cache instance
 cache_service = CacheService(default_ttl_seconds=300)  # 5 minutes default TTL
+
+# Per-chatbot in-memory retrieval indexes (hot knowledge bases answered from RAM)
+corpus_cache = LRUCache(max_bytes=int(os.environ.get('RAG_CORPUS_CACHE_MB', '256')) * 1024 * 1024)
+
+# Formatted retrieval results of repeated questions, keyed by corpus version
+query_cache = LRUCache(
+    max_bytes=int(os.environ.get('RAG_QUERY_CACHE_MB', '32')) * 1024 * 1024,
+    ttl_seconds=int(os.environ.get('RAG_QUERY_CACHE_TTL_SECONDS', '600'))
+)
@@ -1,6 +1,8 @@
 import tiktoken
 import logging
-from typing import List, Dict
+import time
+from itertools import accumulate
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,10 @@ class ChunkingService:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         
+        # Throughput of the most recent chunking call (reported by get_stats)
+        self.last_run_tokens = 0
+        self.last_run_seconds = 0.0
+        
         # Initialize tokenizer (using cl100k_base encoding for GPT-3.5/4)
         try:
             self.tokenizer = tiktoken.get_encoding("cl100k_base")
@@ -31,8 +37,8 @@ class ChunkingService:
         return len(self.tokenizer.encode(text))
     
     def chunk_text(
-        self, 
-        text: str, 
+        self,
+        text: str,
         metadata: Dict = None
     ) -> List[Dict]:
         """
@@ -41,7 +47,7 @@ class ChunkingService:
         Args:
             text: Text to chunk
             metadata: Optional metadata to attach to each chunk (filename, page, etc.)
-            
+        
         Returns:
             List of chunk dictionaries with text and metadata
         """
@@ -50,59 +56,27 @@ class ChunkingService:
                 logger.warning("Empty text provided for chunking")
                 return []
             
+            started = time.perf_counter()
+            
             # Encode text to tokens
-            tokens = self.tokenizer.encode(text)
+            tokens = self.tokenizer.encode_ordinary(text)
             total_tokens = len(tokens)
             
             logger.info(f"Chunking text with {total_tokens} tokens (chunk_size={self.chunk_size}, overlap={self.chunk_overlap})")
             
-            chunks = []
-            start_idx = 0
-            chunk_num = 0
-            
-            while start_idx < total_tokens:
-                # Calculate end index for this chunk
-                end_idx = min(start_idx + self.chunk_size, total_tokens)
-                
-                # Extract chunk tokens
-                chunk_tokens = tokens[start_idx:end_idx]
-                
-                # Decode back to text
-                chunk_text = self.tokenizer.decode(chunk_tokens)
-                
-                # Create chunk with metadata
-                chunk = {
-                    "text": chunk_text,
-                    "chunk_index": chunk_num,
-                    "start_token": start_idx,
-                    "end_token": end_idx,
-                    "token_count": len(chunk_tokens)
-                }
-                
-                # Add provided metadata
-                if metadata:
-                    chunk.update(metadata)
-                
-                chunks.append(chunk)
-                
-                # Move to next chunk with overlap
-                start_idx = end_idx - self.chunk_overlap
-                chunk_num += 1
-                
-                # Prevent infinite loop on last chunk
-                if end_idx >= total_tokens:
-                    break
+            chunks = list(self._iter_windows(tokens, text, metadata, first_index=0))
+            self._record_run(total_tokens, started)
             
             logger.info(f"Created {len(chunks)} chunks from text")
             return chunks
-            
+        
         except Exception as e:
             logger.error(f"Error chunking text: {str(e)}")
             raise Exception(f"Failed to chunk text: {str(e)}")
     
     def chunk_by_paragraphs(
-        self, 
-        text: str, 
+        self,
+        text: str,
         metadata: Dict = None
     ) -> List[Dict]:
         """
@@ -117,37 +91,68 @@ class ChunkingService:
             List of chunk dictionaries
         """
         try:
-            # Split into paragraphs
-            paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+            chunks = list(self.iter_chunks_by_paragraphs(text, metadata))
+            
+            logger.info(f"Created {len(chunks)} paragraph-based chunks")
+            return chunks
+            
+        except Exception as e:
+            logger.error(f"Error in paragraph chunking: {str(e)}")
+            # Fallback to regular chunking
+            return self.chunk_text(text, metadata)
+    
+    def iter_chunks_by_paragraphs(
+        self,
+        text: Union[str, Iterable[str]],
+        metadata: Dict = None,
+        encode_batch_size: int = 256
+    ) -> Iterator[Dict]:
+        """
+        Yield paragraph-based chunks as soon as they are complete
+        
+        Memory stays bounded by the largest paragraph instead of growing with
+        the document: paragraphs are read lazily (from a string or from text
+        pieces such as pages), encoded in small batches, and each paragraph is
+        tokenized exactly once. Oversized paragraphs are split by slicing their
+        token array.
+        
+        Args:
+            text: Text to chunk, or an iterable of consecutive text pieces
+            metadata: Optional metadata
+            encode_batch_size: Paragraphs passed to the tokenizer per call
             
-            chunks = []
-            current_chunk = []
-            current_tokens = 0
-            chunk_num = 0
+        Yields:
+            Chunk dictionaries with consecutive chunk_index values
+        """
+        total_tokens = 0
+        busy_seconds = 0.0
+        resumed = time.perf_counter()
+        
+        current_chunk = []
+        current_tokens = 0
+        chunk_num = 0
+        
+        for paragraphs in self.batched(self._iter_paragraphs(text), encode_batch_size):
+            encoded = self.tokenizer.encode_ordinary_batch(paragraphs)
             
-            for para in paragraphs:
-                para_tokens = self.count_tokens(para)
+            for para, para_token_ids in zip(paragraphs, encoded):
+                para_tokens = len(para_token_ids)
+                total_tokens += para_tokens
+                
+                completed = []
                 
                 # If single paragraph exceeds chunk size, split it
                 if para_tokens > self.chunk_size:
                     # Save current chunk if any
                     if current_chunk:
-                        chunk_text = '\n\n'.join(current_chunk)
-                        chunks.append({
-                            "text": chunk_text,
-                            "chunk_index": chunk_num,
-                            "token_count": current_tokens,
-                            **(metadata or {})
-                        })
+                        completed.append(self._build_chunk('\n\n'.join(current_chunk), chunk_num, current_tokens, metadata))
                         chunk_num += 1
                         current_chunk = []
                         current_tokens = 0
                     
-                    # Split large paragraph using token-based chunking
-                    para_chunks = self.chunk_text(para, metadata)
-                    for pc in para_chunks:
-                        pc["chunk_index"] = chunk_num
-                        chunks.append(pc)
+                    # Split large paragraph into token windows
+                    for window in self._iter_windows(para_token_ids, para, metadata, first_index=chunk_num):
+                        completed.append(window)
                         chunk_num += 1
                 
                 # Add paragraph to current chunk
@@ -158,49 +163,318 @@ class ChunkingService:
                 # Start new chunk
                 else:
                     # Save current chunk
-                    chunk_text = '\n\n'.join(current_chunk)
-                    chunks.append({
-                        "text": chunk_text,
-                        "chunk_index": chunk_num,
-                        "token_count": current_tokens,
-                        **(metadata or {})
-                    })
+                    completed.append(self._build_chunk('\n\n'.join(current_chunk), chunk_num, current_tokens, metadata))
                     chunk_num += 1
                     
                     # Start new chunk with current paragraph
                     current_chunk = [para]
                     current_tokens = para_tokens
+                
+                for chunk in completed:
+                    # Time spent by the consumer is not chunking time
+                    busy_seconds += time.perf_counter() - resumed
+                    yield chunk
+                    resumed = time.perf_counter()
+        
+        # Add final chunk
+        if current_chunk:
+            busy_seconds += time.perf_counter() - resumed
+            yield self._build_chunk('\n\n'.join(current_chunk), chunk_num, current_tokens, metadata)
+            resumed = time.perf_counter()
+        
+        busy_seconds += time.perf_counter() - resumed
+        self.last_run_tokens = total_tokens
+        self.last_run_seconds = busy_seconds
+    
+    def iter_chunks_by_pages(
+        self,
+        pages: Iterable[Tuple[int, str]],
+        metadata: Dict = None
+    ) -> Iterator[Dict]:
+        """
+        Yield paragraph-based chunks of a paginated document, page by page
+        
+        Chunks never span two pages, so each one carries the page number its
+        text comes from. Pages are consumed lazily.
+        
+        Args:
+            pages: (page number, text) pairs in document order
+            metadata: Optional metadata
             
-            # Add final chunk
-            if current_chunk:
-                chunk_text = '\n\n'.join(current_chunk)
-                chunks.append({
-                    "text": chunk_text,
-                    "chunk_index": chunk_num,
-                    "token_count": current_tokens,
-                    **(metadata or {})
-                })
+        Yields:
+            Chunk dictionaries with a page key and consecutive chunk_index values
+        """
+        total_tokens = 0
+        busy_seconds = 0.0
+        chunk_num = 0
+        
+        for page_no, page_text in pages:
+            page_metadata = {**(metadata or {}), "page": page_no}
             
-            logger.info(f"Created {len(chunks)} paragraph-based chunks")
-            return chunks
+            for chunk in self.iter_chunks_by_paragraphs(page_text, page_metadata):
+                chunk["chunk_index"] = chunk_num
+                chunk_num += 1
+                yield chunk
             
-        except Exception as e:
-            logger.error(f"Error in paragraph chunking: {str(e)}")
-            # Fallback to regular chunking
-            return self.chunk_text(text, metadata)
+            total_tokens += self.last_run_tokens
+            busy_seconds += self.last_run_seconds
+        
+        self.last_run_tokens = total_tokens
+        self.last_run_seconds = busy_seconds
+    
+    def iter_chunks_by_rows(
+        self,
+        rows: Iterable[Tuple[str, str, str]],
+        metadata: Dict = None,
+        encode_batch_size: int = 256
+    ) -> Iterator[Dict]:
+        """
+        Yield row-group chunks of tabular data (spreadsheets, CSV)
+        
+        Consecutive rows of a table are packed into chunks of up to chunk_size
+        tokens, and every chunk starts with the table name and header row so
+        it can be understood on its own. Rows are consumed lazily and encoded
+        in batches, so memory stays bounded by one chunk regardless of table size.
+        
+        Args:
+            rows: (table name, header row, row) triples in table order
+            metadata: Optional metadata
+            encode_batch_size: Rows passed to the tokenizer per call
+            
+        Yields:
+            Chunk dictionaries with consecutive chunk_index values
+        """
+        total_tokens = 0
+        busy_seconds = 0.0
+        resumed = time.perf_counter()
+        
+        current_table = None
+        heading = ""
+        heading_tokens = 0
+        current_rows = []
+        current_tokens = 0
+        chunk_num = 0
+        
+        for batch in self.batched(rows, encode_batch_size):
+            encoded = self.tokenizer.encode_ordinary_batch([row for _, _, row in batch])
+            
+            for (table, header, row), row_token_ids in zip(batch, encoded):
+                total_tokens += len(row_token_ids)
+                # One more token for the line break joining rows
+                row_tokens = len(row_token_ids) + 1
+                
+                completed = []
+                
+                # A new table flushes the current chunk and changes the heading
+                if (table, header) != current_table:
+                    if current_rows:
+                        completed.append(self._build_chunk(heading + '\n'.join(current_rows), chunk_num, heading_tokens + current_tokens, metadata))
+                        chunk_num += 1
+                        current_rows = []
+                        current_tokens = 0
+                    
+                    current_table = (table, header)
+                    heading = self.format_table_heading(table, header)
+                    heading_tokens = len(self.tokenizer.encode_ordinary(heading))
+                
+                # If a single row exceeds the chunk size, split it
+                if heading_tokens + row_tokens > self.chunk_size:
+                    if current_rows:
+                        completed.append(self._build_chunk(heading + '\n'.join(current_rows), chunk_num, heading_tokens + current_tokens, metadata))
+                        chunk_num += 1
+                        current_rows = []
+                        current_tokens = 0
+                    
+                    for window in self._iter_windows(row_token_ids, row, metadata, first_index=chunk_num):
+                        window["text"] = heading + window["text"]
+                        window["token_count"] += heading_tokens
+                        completed.append(window)
+                        chunk_num += 1
+                
+                # Add row to current chunk
+                elif heading_tokens + current_tokens + row_tokens <= self.chunk_size:
+                    current_rows.append(row)
+                    current_tokens += row_tokens
+                
+                # Start new chunk
+                else:
+                    completed.append(self._build_chunk(heading + '\n'.join(current_rows), chunk_num, heading_tokens + current_tokens, metadata))
+                    chunk_num += 1
+                    
+                    current_rows = [row]
+                    current_tokens = row_tokens
+                
+                for chunk in completed:
+                    # Time spent by the consumer is not chunking time
+                    busy_seconds += time.perf_counter() - resumed
+                    yield chunk
+                    resumed = time.perf_counter()
+        
+        # Add final chunk
+        if current_rows:
+            busy_seconds += time.perf_counter() - resumed
+            yield self._build_chunk(heading + '\n'.join(current_rows), chunk_num, heading_tokens + current_tokens, metadata)
+            resumed = time.perf_counter()
+        
+        busy_seconds += time.perf_counter() - resumed
+        self.last_run_tokens = total_tokens
+        self.last_run_seconds = busy_seconds
+    
+    @staticmethod
+    def format_table_heading(table: str, header: str) -> str:
+        """Context lines repeated at the start of every chunk of a table"""
+        lines = []
+        if table:
+            lines.append(f"Sheet: {table}")
+        if header:
+            lines.append(header)
+        return ''.join(line + '\n' for line in lines)
+    
+    @staticmethod
+    def _iter_paragraphs(text: Union[str, Iterable[str]]) -> Iterator[str]:
+        """Yield the non-empty, stripped paragraphs of a text or of consecutive text pieces"""
+        pieces = (text,) if isinstance(text, str) else text
+        buffer = ""
+        
+        for piece in pieces:
+            buffer += piece
+            start = 0
+            while True:
+                end = buffer.find('\n\n', start)
+                if end == -1:
+                    break
+                para = buffer[start:end].strip()
+                if para:
+                    yield para
+                start = end + 2
+            buffer = buffer[start:]
+        
+        para = buffer.strip()
+        if para:
+            yield para
+    
+    @staticmethod
+    def batched(items: Iterable, size: int) -> Iterator[List]:
+        """Group an iterator into lists of at most size items"""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def _build_chunk(self, text: str, chunk_index: int, token_count: int, metadata: Optional[Dict]) -> Dict:
+        """Build a chunk dictionary from whole paragraphs"""
+        return {
+            "text": text,
+            "chunk_index": chunk_index,
+            "token_count": token_count,
+            **(metadata or {})
+        }
+    
+    def _iter_windows(
+        self,
+        tokens: List[int],
+        text: str,
+        metadata: Optional[Dict],
+        first_index: int
+    ) -> Iterator[Dict]:
+        """
+        Yield overlapping token windows of a text as chunks
+        
+        Window text is sliced from the UTF-8 bytes of the original text using
+        the byte length of each token, instead of decoding every window.
+        
+        Args:
+            tokens: Tokens of text (from encode_ordinary)
+            text: Text the tokens were encoded from
+            metadata: Optional metadata to attach to each chunk
+            first_index: chunk_index of the first window
+        
+        Yields:
+            Chunk dictionaries
+        """
+        total_tokens = len(tokens)
+        text_bytes = text.encode("utf-8")
+        byte_offsets = list(accumulate(
+            (len(token_bytes) for token_bytes in self.tokenizer.decode_tokens_bytes(tokens)),
+            initial=0
+        ))
+        
+        start_idx = 0
+        chunk_num = first_index
+        
+        while start_idx < total_tokens:
+            # Calculate end index for this chunk
+            end_idx = min(start_idx + self.chunk_size, total_tokens)
+            
+            # Windows may cut a multi-byte character, like decoding tokens would
+            chunk_text = text_bytes[byte_offsets[start_idx]:byte_offsets[end_idx]].decode("utf-8", errors="replace")
+            
+            # Create chunk with metadata
+            chunk = {
+                "text": chunk_text,
+                "chunk_index": chunk_num,
+                "start_token": start_idx,
+                "end_token": end_idx,
+                "token_count": end_idx - start_idx
+            }
+            
+            # Add provided metadata
+            if metadata:
+                chunk.update(metadata)
+            
+            yield chunk
+            
+            # Prevent infinite loop on last chunk
+            if end_idx >= total_tokens:
+                break
+            
+            # Move to next chunk with overlap
+            start_idx = end_idx - self.chunk_overlap
+            chunk_num += 1
+    
+    def _record_run(self, total_tokens: int, started: float):
+        """Remember the size and duration of a chunking call"""
+        self.last_run_tokens = total_tokens
+        self.last_run_seconds = time.perf_counter() - started
     
     def get_stats(self, chunks: List[Dict]) -> Dict:
         """Get statistics about chunks"""
         if not chunks:
             return {"total_chunks": 0, "total_tokens": 0}
         
-        total_tokens = sum(chunk.get("token_count", 0) for chunk in chunks)
-        avg_tokens = total_tokens / len(chunks) if chunks else 0
+        return self.build_stats(len(chunks), sum(chunk.get("token_count", 0) for chunk in chunks))
+    
+    def build_stats(self, total_chunks: int, total_tokens: int) -> Dict:
+        """
+        Get statistics from chunk totals (for chunks consumed as a stream)
+        
+        Args:
+            total_chunks: Number of chunks produced
+            total_tokens: Sum of their token counts
+            
+        Returns:
+            Dictionary with chunk statistics and chunking throughput
+        """
+        if not total_chunks:
+            return {"total_chunks": 0, "total_tokens": 0}
+        
+        avg_tokens = total_tokens / total_chunks
+        
+        # Throughput of the chunking call that produced these chunks
+        tokens_per_second = (
+            self.last_run_tokens / self.last_run_seconds if self.last_run_seconds > 0 else 0
+        )
         
         return {
-            "total_chunks": len(chunks),
+            "total_chunks": total_chunks,
             "total_tokens": total_tokens,
             "avg_tokens_per_chunk": round(avg_tokens, 2),
             "chunk_size_config": self.chunk_size,
-            "overlap_config": self.chunk_overlap
+            "overlap_config": self.chunk_overlap,
+            "chunking_seconds": round(self.last_run_seconds, 4),
+            "tokens_per_second": round(tokens_per_second, 1)
         }
@@ -0,0 +1,389 @@
+import io
+import logging
+from typing import List, Dict, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def encode_embedding(embedding: List[float]) -> bytes:
+    """Pack an embedding as little-endian float32 bytes for storage"""
+    return np.asarray(embedding, dtype="<f4").tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """Unpack an embedding stored with encode_embedding"""
+    return np.frombuffer(data, dtype="<f4")
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Tuple[float, str]]],
+    top_k: int,
+    k: int = 60
+) -> List[Tuple[float, str]]:
+    """
+    Fuse several ranked lists with reciprocal rank fusion
+
+    Each list contributes 1 / (k + rank) for every item it contains, so items
+    ranked well by both lexical and dense retrieval rise to the top without
+    having to calibrate their raw scores against each other.
+
+    Args:
+        rankings: Ranked lists of (score, chunk_id), best first
+        top_k: Number of fused results
+        k: RRF damping constant
+
+    Returns:
+        List of (fused_score, chunk_id) sorted by descending score
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, (_, chunk_id) in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [(score, chunk_id) for chunk_id, score in ordered[:top_k]]
+
+
+class DenseIndex:
+    """
+    Brute-force cosine similarity index over a chatbot's chunk embeddings
+
+    Embeddings are kept as one contiguous, L2-normalized float32 matrix so a
+    query is a single matrix-vector product.
+    """
+
+    def __init__(self, chunk_ids: List[str], vectors: np.ndarray, version: int):
+        """
+        Initialize dense index
+
+        Args:
+            chunk_ids: Chunk identifier of each row
+            vectors: Float32 matrix with one embedding per row
+            version: Corpus version the embeddings were read at
+        """
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.chunk_ids = chunk_ids
+        self.vectors = (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+        self.version = version
+        self.checked_at = 0.0
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict], dimensions: int, version: int) -> "DenseIndex":
+        """
+        Build an index from chunk documents with stored embeddings
+
+        Args:
+            documents: Chunk documents with chunk_id and binary embedding
+            dimensions: Embedding size to keep (other sizes are skipped)
+            version: Corpus version the documents were read at
+
+        Returns:
+            DenseIndex over the matching embeddings
+        """
+        chunk_ids = []
+        vectors = np.empty((len(documents), dimensions), dtype=np.float32)
+        for document in documents:
+            vector = decode_embedding(document["embedding"])
+            if len(vector) != dimensions:
+                continue
+            vectors[len(chunk_ids)] = vector
+            chunk_ids.append(document["chunk_id"])
+
+        return cls(chunk_ids, vectors[:len(chunk_ids)], version)
+
+    @property
+    def dimensions(self) -> int:
+        """Embedding size"""
+        return self.vectors.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the index"""
+        return self.vectors.nbytes + len(self.chunk_ids) * 100
+
+    def search(self, query_embedding: List[float], top_k: int) -> List[Tuple[float, str]]:
+        """
+        Find the chunks most similar to a query embedding
+
+        Args:
+            query_embedding: Query vector with the same dimensions as the index
+            top_k: Number of results
+
+        Returns:
+            List of (cosine_similarity, chunk_id) sorted by descending similarity
+        """
+        if not self.chunk_ids or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = self.vectors @ query
+
+        if len(similarities) > top_k:
+            best = np.argpartition(similarities, -top_k)[-top_k:]
+        else:
+            best = np.arange(len(similarities))
+        best = best[np.argsort(-similarities[best], kind="stable")]
+
+        return [(float(similarities[row]), self.chunk_ids[row]) for row in best]
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) approximate nearest-neighbour index
+
+    Vectors are clustered with spherical k-means; a query only scores the
+    vectors of the nprobe clusters whose centroids are closest to it. Vectors
+    are L2-normalized and scalar-quantized to int8 to keep large corpora
+    compact in memory and on disk; each dimension gets its own scale so the
+    int8 range covers the values actually seen during training.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        codes: np.ndarray,
+        assignments: np.ndarray,
+        scales: np.ndarray,
+        chunk_ids: List[str],
+        trained_count: int,
+        revision: int = 0
+    ):
+        """
+        Initialize IVF index
+
+        Args:
+            centroids: Float32 matrix of normalized cluster centroids
+            codes: Int8 matrix of quantized vectors (one row per chunk)
+            assignments: Cluster of each row
+            scales: Per-dimension quantization scale (code = value * scale)
+            chunk_ids: Chunk identifier of each row
+            trained_count: Number of vectors when the centroids were trained
+            revision: Persisted revision the index was loaded from
+        """
+        self.centroids = centroids
+        self.codes = codes
+        self.assignments = assignments
+        self.scales = scales
+        self.chunk_ids = list(chunk_ids)
+        self.trained_count = trained_count
+        self.revision = revision
+        self.checked_at = 0.0
+        self._lists = None
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors * scales), -127, 127).astype(np.int8)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        """Nearest centroid (by cosine) of each vector, computed in batches"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors[start:start + batch_size]
+            assignments[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+        return assignments
+
+    @classmethod
+    def train(
+        cls,
+        chunk_ids: List[str],
+        vectors: np.ndarray,
+        nlist: int = None,
+        iterations: int = 10,
+        max_training_vectors: int = 50000,
+        seed: int = 0
+    ) -> "IVFIndex":
+        """
+        Build an index with spherical k-means
+
+        Args:
+            chunk_ids: Chunk identifier of each vector
+            vectors: Float matrix with one embedding per row
+            nlist: Number of clusters (default: sqrt of the corpus size)
+            iterations: k-means iterations
+            max_training_vectors: Sample size used to train the centroids
+            seed: Random seed (training is deterministic for a given seed)
+
+        Returns:
+            Trained IVFIndex containing every vector
+        """
+        vectors = cls._normalize(vectors)
+        rng = np.random.default_rng(seed)
+
+        if nlist is None:
+            nlist = int(np.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, len(vectors)))
+
+        sample = vectors
+        if len(vectors) > max_training_vectors:
+            sample = vectors[rng.choice(len(vectors), max_training_vectors, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls._assign(sample, centroids)
+
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+
+            # Re-seed empty clusters with random training vectors
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(len(sample), len(empty))]
+
+            centroids = cls._normalize(sums)
+
+        scales = 127.0 / np.maximum(np.abs(vectors).max(axis=0), 1e-6)
+
+        return cls(
+            centroids=centroids,
+            codes=cls._quantize(vectors, scales),
+            assignments=cls._assign(vectors, centroids),
+            scales=scales.astype(np.float32),
+            chunk_ids=chunk_ids,
+            trained_count=len(vectors)
+        )
+
+    @property
+    def count(self) -> int:
+        """Number of indexed vectors"""
+        return len(self.chunk_ids)
+
+    @property
+    def dimensions(self) -> int:
+        """Embedding size"""
+        return self.centroids.shape[1]
+
+    @property
+    def nlist(self) -> int:
+        """Number of clusters"""
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the index"""
+        return (
+            self.centroids.nbytes + self.codes.nbytes + self.assignments.nbytes + self.scales.nbytes
+            + len(self.chunk_ids) * 100
+        )
+
+    def needs_retraining(self, growth_factor: float = 2.0) -> bool:
+        """Whether the corpus grew enough since training for centroids to drift"""
+        return self.count > self.trained_count * growth_factor
+
+    def add(self, chunk_ids: List[str], vectors: np.ndarray):
+        """
+        Add vectors to the nearest existing clusters (no retraining)
+
+        Args:
+            chunk_ids: Chunk identifier of each vector
+            vectors: Float matrix with one embedding per row
+        """
+        if not len(chunk_ids):
+            return
+        vectors = self._normalize(vectors)
+        self.codes = np.concatenate([self.codes, self._quantize(vectors, self.scales)])
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors, self.centroids)])
+        self.chunk_ids.extend(chunk_ids)
+        self._lists = None
+
+    def remove(self, chunk_ids: List[str]):
+        """
+        Remove vectors by chunk id
+
+        Args:
+            chunk_ids: Chunk identifiers to drop
+        """
+        removed = set(chunk_ids)
+        keep = np.fromiter(
+            (chunk_id not in removed for chunk_id in self.chunk_ids),
+            dtype=bool, count=self.count
+        )
+        if keep.all():
+            return
+        self.codes = self.codes[keep]
+        self.assignments = self.assignments[keep]
+        self.chunk_ids = [chunk_id for chunk_id, kept in zip(self.chunk_ids, keep) if kept]
+        self._lists = None
+
+    def _get_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows grouped by cluster as (order, offsets)"""
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(self.assignments, minlength=self.nlist))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def search(self, query_embedding: List[float], top_k: int, nprobe: int = 8) -> List[Tuple[float, str]]:
+        """
+        Find approximately the most similar chunks
+
+        Args:
+            query_embedding: Query vector
+            top_k: Number of results
+            nprobe: Clusters to scan; higher improves recall at the cost of latency
+
+        Returns:
+            List of (cosine_similarity, chunk_id) sorted by descending similarity
+        """
+        if not self.count or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        nprobe = max(1, min(nprobe, self.nlist))
+        probes = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+
+        order, offsets = self._get_lists()
+        candidates = np.concatenate([order[offsets[probe]:offsets[probe + 1]] for probe in probes])
+        if not len(candidates):
+            return []
+
+        # Dequantize through the query: (code / scale) . q == code . (q / scale)
+        similarities = self.codes[candidates].astype(np.float32) @ (query / self.scales)
+
+        if len(similarities) > top_k:
+            best = np.argpartition(similarities, -top_k)[-top_k:]
+        else:
+            best = np.arange(len(similarities))
+        best = best[np.argsort(-similarities[best], kind="stable")]
+
+        return [(float(similarities[i]), self.chunk_ids[candidates[i]]) for i in best]
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index (NumPy .npz, no pickling)"""
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            centroids=self.centroids,
+            codes=self.codes,
+            assignments=self.assignments,
+            scales=self.scales,
+            chunk_ids=np.asarray(self.chunk_ids, dtype=str),
+            trained_count=np.asarray(self.trained_count)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, revision: int = 0) -> "IVFIndex":
+        """Deserialize an index written with to_bytes"""
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(
+                centroids=arrays["centroids"],
+                codes=arrays["codes"],
+                assignments=arrays["assignments"],
+                scales=arrays["scales"],
+                chunk_ids=arrays["chunk_ids"].tolist(),
+                trained_count=int(arrays["trained_count"]),
+                revision=revision
+            )
@@ -1,8 +1,10 @@
 import io
+import csv
+import hashlib
 from pypdf import PdfReader
 from docx import Document
 import openpyxl
-from typing import Optional
+from typing import Iterator, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,20 +13,32 @@ logger = logging.getLogger(__name__)
 class DocumentProcessor:
     """Process various document types and extract text content"""
     
+    # Extensions process_file can extract text from
+    SUPPORTED_EXTENSIONS = ('pdf', 'docx', 'doc', 'txt', 'xlsx', 'xls', 'csv')
+    
+    # Extensions whose text is extracted page by page (chunks carry page numbers)
+    PAGINATED_EXTENSIONS = ('pdf',)
+    
+    # Extensions whose rows are extracted one at a time (chunked in row groups)
+    TABULAR_EXTENSIONS = ('xlsx', 'xls', 'csv')
+    
     @staticmethod
-    def process_pdf(file_content: bytes) -> str:
-        """Extract text from PDF file"""
+    def iter_pdf_pages(file_content: bytes) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) for each page of a PDF file, starting at 1"""
         try:
             pdf_file = io.BytesIO(file_content)
             reader = PdfReader(pdf_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text.strip()
+            for page_no, page in enumerate(reader.pages, start=1):
+                yield page_no, page.extract_text() or ""
         except Exception as e:
             logger.error(f"Error processing PDF: {str(e)}")
             raise Exception(f"Failed to process PDF: {str(e)}")
     
+    @staticmethod
+    def process_pdf(file_content: bytes) -> str:
+        """Extract text from PDF file"""
+        return "\n".join(text for _, text in DocumentProcessor.iter_pdf_pages(file_content)).strip()
+    
     @staticmethod
     def process_docx(file_content: bytes) -> str:
         """Extract text from DOCX file"""
@@ -50,20 +64,31 @@ class DocumentProcessor:
     
     @staticmethod
     def process_xlsx(file_content: bytes) -> str:
-        """Extract text from XLSX file"""
+        """Extract text from XLSX file (rows are streamed, see iter_xlsx_rows)"""
+        return DocumentProcessor.rows_to_text(DocumentProcessor.iter_xlsx_rows(file_content)).strip()
+    
+    @staticmethod
+    def iter_xlsx_rows(file_content: bytes) -> Iterator[Tuple[str, str, str]]:
+        """
+        Yield (sheet title, header row, row) for each data row of an XLSX file
+        
+        The workbook is read in read-only mode, so memory does not grow with
+        the sheet size. The first non-empty row of a sheet is its header;
+        empty rows are skipped.
+        """
         try:
             xlsx_file = io.BytesIO(file_content)
-            workbook = openpyxl.load_workbook(xlsx_file)
-            text = ""
-            
-            for sheet in workbook.worksheets:
-                text += f"Sheet: {sheet.title}\n"
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = "\t".join([str(cell) if cell is not None else "" for cell in row])
-                    text += row_text + "\n"
-                text += "\n"
+            workbook = openpyxl.load_workbook(xlsx_file, read_only=True)
             
-            return text.strip()
+            try:
+                for sheet in workbook.worksheets:
+                    cells = (
+                        [str(cell) if cell is not None else "" for cell in row]
+                        for row in sheet.iter_rows(values_only=True)
+                    )
+                    yield from DocumentProcessor._iter_table_rows(sheet.title, cells)
+            finally:
+                workbook.close()
         except Exception as e:
             logger.error(f"Error processing XLSX: {str(e)}")
             raise Exception(f"Failed to process XLSX: {str(e)}")
@@ -77,6 +102,77 @@ class DocumentProcessor:
             logger.error(f"Error processing CSV: {str(e)}")
             raise Exception(f"Failed to process CSV: {str(e)}")
     
+    @staticmethod
+    def iter_csv_rows(file_content: bytes) -> Iterator[Tuple[str, str, str]]:
+        """
+        Yield ("", header row, row) for each data row of a CSV file
+        
+        Rows are parsed one at a time by the csv module; cells are joined with
+        tabs like XLSX rows.
+        """
+        try:
+            csv_file = io.TextIOWrapper(io.BytesIO(file_content), encoding='utf-8', errors='ignore', newline='')
+            yield from DocumentProcessor._iter_table_rows("", csv.reader(csv_file))
+        except Exception as e:
+            logger.error(f"Error processing CSV: {str(e)}")
+            raise Exception(f"Failed to process CSV: {str(e)}")
+    
+    @staticmethod
+    def _iter_table_rows(table: str, rows: Iterator[List[str]]) -> Iterator[Tuple[str, str, str]]:
+        """Pair the data rows of a table with its header row (its first non-empty row)"""
+        header = None
+        has_rows = False
+        
+        for cells in rows:
+            if not any(cell.strip() for cell in cells):
+                continue
+            
+            row_text = "\t".join(cells).rstrip("\t")
+            if header is None:
+                header = row_text
+                continue
+            
+            has_rows = True
+            yield table, header, row_text
+        
+        # A table with a single row is all data
+        if header is not None and not has_rows:
+            yield table, "", header
+    
+    @staticmethod
+    def is_tabular(filename: str) -> bool:
+        """Whether a file is extracted row by row (see process_file_rows)"""
+        return filename.lower().split('.')[-1] in DocumentProcessor.TABULAR_EXTENSIONS
+    
+    @staticmethod
+    def process_file_rows(filename: str, file_content: bytes) -> Iterator[Tuple[str, str, str]]:
+        """Yield (table name, header row, row) triples of a spreadsheet or CSV file"""
+        extension = filename.lower().split('.')[-1]
+        if extension in ('xlsx', 'xls'):
+            return DocumentProcessor.iter_xlsx_rows(file_content)
+        if extension == 'csv':
+            return DocumentProcessor.iter_csv_rows(file_content)
+        raise Exception(f"File type has no rows: {extension}")
+    
+    @staticmethod
+    def rows_to_text(rows: Iterator[Tuple[str, str, str]]) -> str:
+        """Render table rows as text: each table's name and header, then its rows"""
+        lines = []
+        current = None
+        
+        for table, header, row in rows:
+            if (table, header) != current:
+                if lines:
+                    lines.append("")
+                if table:
+                    lines.append(f"Sheet: {table}")
+                if header:
+                    lines.append(header)
+                current = (table, header)
+            lines.append(row)
+        
+        return "\n".join(lines)
+    
     @staticmethod
     def process_file(filename: str, file_content: bytes) -> str:
         """Process file based on extension"""
@@ -98,6 +194,53 @@ class DocumentProcessor:
         
         return processor(file_content)
     
+    @staticmethod
+    def is_supported(filename: str) -> bool:
+        """Whether process_file can extract text from a file"""
+        return '.' in filename and filename.lower().split('.')[-1] in DocumentProcessor.SUPPORTED_EXTENSIONS
+    
+    @staticmethod
+    def has_pages(filename: str) -> bool:
+        """Whether a file is extracted page by page (see process_file_pages)"""
+        return filename.lower().split('.')[-1] in DocumentProcessor.PAGINATED_EXTENSIONS
+    
+    @staticmethod
+    def process_file_pages(filename: str, file_content: bytes) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) pairs of a paginated file"""
+        extension = filename.lower().split('.')[-1]
+        if extension == 'pdf':
+            return DocumentProcessor.iter_pdf_pages(file_content)
+        raise Exception(f"File type has no pages: {extension}")
+    
+    @staticmethod
+    def preview_text(filename: str, file_content: bytes, max_chars: int) -> str:
+        """
+        Extract the beginning of a paginated or tabular file's text, reading
+        only the pages or rows needed for max_chars characters
+        """
+        if DocumentProcessor.is_tabular(filename):
+            rows = DocumentProcessor.process_file_rows(filename, file_content)
+            return DocumentProcessor.rows_to_text(DocumentProcessor._take_chars(rows, max_chars))[:max_chars]
+        
+        pages = DocumentProcessor.process_file_pages(filename, file_content)
+        texts = (page_text for _, page_text in DocumentProcessor._take_chars(pages, max_chars))
+        return "\n".join(texts).strip()[:max_chars]
+    
+    @staticmethod
+    def _take_chars(items: Iterator[Tuple], max_chars: int) -> Iterator[Tuple]:
+        """Yield items (each ending with its text) until their text reaches max_chars"""
+        length = 0
+        for item in items:
+            yield item
+            length += len(item[-1]) + 1
+            if length >= max_chars:
+                return
+    
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        """SHA-256 hex digest identifying a source's content"""
+        return hashlib.sha256(content).hexdigest()
+    
     @staticmethod
     def format_size(size_bytes: int) -> str:
         """Format file size in human-readable format"""
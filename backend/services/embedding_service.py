@@ -1,8 +1,11 @@
 import os
 import logging
+import hashlib
+import math
 from typing import List
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from .inverted_index import tokenize
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -60,15 +63,16 @@ class EmbeddingService:
             texts: List of texts to embed
             
         Returns:
-            List of embedding vectors
+            One embedding vector per text, in order (a zero vector for blank texts)
         """
         try:
-            # Filter out empty texts
-            valid_texts = [text.strip() for text in texts if text.strip()]
+            # Only non-blank texts are sent to the API
+            positions = [i for i, text in enumerate(texts) if text.strip()]
+            valid_texts = [texts[i].strip() for i in positions]
             
             if not valid_texts:
                 logger.warning("No valid texts provided for batch embedding")
-                return []
+                return [[0.0] * self.get_model_info()["dimensions"] for _ in texts]
             
             # Generate embeddings in batch (OpenAI supports up to 2048 texts)
             batch_size = 100  # Process in smaller batches for safety
@@ -87,7 +91,10 @@ class EmbeddingService:
                 
                 logger.info(f"Generated {len(batch_embeddings)} embeddings (batch {i//batch_size + 1})")
             
-            return all_embeddings
+            embeddings = [[0.0] * len(all_embeddings[0]) for _ in texts]
+            for position, embedding in zip(positions, all_embeddings):
+                embeddings[position] = embedding
+            return embeddings
             
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {str(e)}")
@@ -101,3 +108,68 @@ class EmbeddingService:
             "max_tokens": 8191,
             "cost_per_1k_tokens": 0.00002  # $0.02 per 1M tokens
         }
+
+
+class HashingEmbeddingService:
+    """
+    Deterministic local embedder based on feature hashing
+    
+    Stand-in for EmbeddingService that needs no API key or network access:
+    unigrams and bigrams are hashed into a fixed number of signed buckets and
+    the result is L2-normalized. Useful for offline testing of hybrid retrieval.
+    """
+    
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.model = f"local-hashing-{dimensions}"
+    
+    def _embed(self, text: str) -> List[float]:
+        """Hash the terms of a text into a normalized vector"""
+        terms = tokenize(text)
+        features = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+        
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimensions] += sign
+        
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+    
+    async def generate_embedding(self, text: str) -> List[float]:
+        """Generate embedding for a single text"""
+        text = text.strip()
+        if not text:
+            logger.warning("Empty text provided for embedding")
+            return []
+        return self._embed(text)
+    
+    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate one embedding per text, in order (a zero vector for blank texts)"""
+        return [self._embed(text) for text in texts]
+    
+    def get_model_info(self) -> dict:
+        """Get information about the embedding model"""
+        return {
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "max_tokens": None,
+            "cost_per_1k_tokens": 0
+        }
+
+
+def get_embedding_service():
+    """
+    Create the embedding service selected by RAG_EMBEDDING_PROVIDER
+    
+    "openai" uses EmbeddingService, "local" uses HashingEmbeddingService.
+    Defaults to OpenAI when EMERGENT_LLM_KEY is configured, local otherwise.
+    """
+    default_provider = "openai" if os.environ.get('EMERGENT_LLM_KEY') else "local"
+    provider = os.environ.get('RAG_EMBEDDING_PROVIDER', default_provider).lower()
+    
+    if provider == "local":
+        return HashingEmbeddingService()
+    return EmbeddingService()
@@ -0,0 +1,171 @@
+import logging
+import os
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin, urldefrag
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+
+logger = logging.getLogger(__name__)
+
+
+# Elements whose content is never part of a page's text
+SKIPPED_TAGS = ("script", "style", "nav", "header", "footer")
+
+
+def _decode(html: Union[str, bytes]) -> str:
+    """Decode raw HTML the way BeautifulSoup does (declared or detected encoding)"""
+    if isinstance(html, str):
+        return html
+    return UnicodeDammit(html, is_html=True).unicode_markup or ""
+
+
+def _resolve_link(base_url: str, href: str) -> Optional[str]:
+    """Absolute http(s) URL of a link without its fragment (None for other schemes)"""
+    link = urldefrag(urljoin(base_url, href.strip()))[0]
+    return link if link.startswith(('http://', 'https://')) else None
+
+
+def _clean_lines(lines: List[str]) -> str:
+    """Join stripped, non-empty lines"""
+    return '\n'.join(line for line in (line.strip() for line in lines) if line)
+
+
+class BeautifulSoupExtractor:
+    """
+    Extract page text by building a full BeautifulSoup tree
+
+    Skipped elements are decomposed before get_text. Robust but slow and
+    memory-hungry on large pages; kept as the reference implementation.
+    """
+
+    name = "beautifulsoup"
+
+    def extract_text(self, html: Union[str, bytes]) -> str:
+        """Text of a page, one line per text node"""
+        return self._soup_text(BeautifulSoup(html, 'html.parser'))
+
+    def extract_page(self, html: Union[str, bytes], base_url: str) -> Tuple[str, List[str]]:
+        """Text and absolute outgoing links of a page"""
+        soup = BeautifulSoup(html, 'html.parser')
+
+        links = []
+        for anchor in soup.find_all('a', href=True):
+            link = _resolve_link(base_url, anchor['href'])
+            if link:
+                links.append(link)
+
+        return self._soup_text(soup), links
+
+    @staticmethod
+    def _soup_text(soup: BeautifulSoup) -> str:
+        for element in soup(list(SKIPPED_TAGS)):
+            element.decompose()
+        return _clean_lines(soup.get_text(separator='\n', strip=True).splitlines())
+
+
+class _TextCollector(HTMLParser):
+    """html.parser event handler collecting text lines and links as tags stream by"""
+
+    def __init__(self, base_url: Optional[str] = None):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.lines: List[str] = []
+        self.links: List[str] = []
+        # Open skipped elements by tag (nested and unbalanced tags are counted per tag)
+        self._skipping: Dict[str, int] = {}
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping[tag] = self._skipping.get(tag, 0) + 1
+            self._skip_depth += 1
+        elif tag == "a" and self.base_url is not None:
+            # Links inside skipped elements (e.g. nav) are still followed
+            for attr, value in attrs:
+                if attr == "href":
+                    link = _resolve_link(self.base_url, value or "")
+                    if link:
+                        self.links.append(link)
+                    break
+
+    def handle_endtag(self, tag):
+        if self._skipping.get(tag):
+            self._skipping[tag] -= 1
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        for line in data.splitlines():
+            line = line.strip()
+            if line:
+                self.lines.append(line)
+
+    def unknown_decl(self, data):
+        # CDATA sections are text, as in BeautifulSoup
+        if data.startswith("CDATA["):
+            self.handle_data(data[len("CDATA["):])
+
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+
+class StreamingHTMLExtractor:
+    """
+    Extract page text from html.parser events without building a tree
+
+    Text is collected as the parser streams through the document and content
+    of skipped elements is dropped on the fly, so memory stays proportional
+    to the extracted text. Produces the same text as BeautifulSoupExtractor
+    for well-formed pages.
+    """
+
+    name = "streaming"
+
+    def extract_text(self, html: Union[str, bytes]) -> str:
+        """Text of a page, one line per text node"""
+        return self._parse(html, None).text()
+
+    def extract_page(self, html: Union[str, bytes], base_url: str) -> Tuple[str, List[str]]:
+        """Text and absolute outgoing links of a page"""
+        collector = self._parse(html, base_url)
+        return collector.text(), collector.links
+
+    @staticmethod
+    def _parse(html: Union[str, bytes], base_url: Optional[str]) -> _TextCollector:
+        collector = _TextCollector(base_url)
+        collector.feed(_decode(html))
+        collector.close()
+        return collector
+
+
+# Extractors selectable with RAG_HTML_EXTRACTOR; an extractor provides
+# extract_text(html) and extract_page(html, base_url)
+HTML_EXTRACTORS = {
+    StreamingHTMLExtractor.name: StreamingHTMLExtractor,
+    BeautifulSoupExtractor.name: BeautifulSoupExtractor,
+}
+
+_extractor = None
+
+
+def get_html_extractor(name: Optional[str] = None):
+    """
+    Get the HTML extractor selected by RAG_HTML_EXTRACTOR
+
+    "streaming" (default) uses StreamingHTMLExtractor, "beautifulsoup" uses
+    BeautifulSoupExtractor. Passing a name creates that extractor instead.
+    """
+    global _extractor
+    if name is not None:
+        return HTML_EXTRACTORS[name]()
+
+    if _extractor is None:
+        selected = os.environ.get('RAG_HTML_EXTRACTOR', StreamingHTMLExtractor.name).lower()
+        if selected not in HTML_EXTRACTORS:
+            logger.warning(f"Unknown HTML extractor '{selected}', using {StreamingHTMLExtractor.name}")
+            selected = StreamingHTMLExtractor.name
+        _extractor = HTML_EXTRACTORS[selected]()
+    return _extractor
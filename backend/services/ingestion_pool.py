@@ -0,0 +1,597 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .chunking_service import ChunkingService
+from .document_processor import DocumentProcessor
+from .inverted_index import InvertedIndex
+from .website_scraper import WebsiteScraper
+
+logger = logging.getLogger(__name__)
+
+
+# Chunkers of the current worker process, created on first use (loading the
+# tokenizer is expensive, so each worker does it once)
+_chunkers: Dict[Tuple[int, int], ChunkingService] = {}
+
+
+def _get_chunker(chunk_size: int, chunk_overlap: int) -> ChunkingService:
+    key = (chunk_size, chunk_overlap)
+    if key not in _chunkers:
+        _chunkers[key] = ChunkingService(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return _chunkers[key]
+
+
+def extract_text(filename: str, file_content: bytes) -> str:
+    """Extract the text of an uploaded file (runs in a worker process)"""
+    return DocumentProcessor.process_file(filename, file_content)
+
+
+def extract_preview(filename: str, file_content: bytes, max_chars: int) -> str:
+    """Extract the beginning of a paginated or tabular file's text (runs in a worker process)"""
+    return DocumentProcessor.preview_text(filename, file_content, max_chars)
+
+
+def extract_html(html: str, base_url: str) -> Tuple[str, List[str]]:
+    """Extract the text and links of a crawled web page (runs in a worker process)"""
+    return WebsiteScraper.extract_page(html, base_url)
+
+
+def _shard_result(chunker: ChunkingService, chunks: List[Dict]) -> Dict:
+    """Count the index terms of every chunk and report the chunker's throughput"""
+    for chunk in chunks:
+        chunk["term_freqs"] = InvertedIndex.count_terms(chunk["text"])
+
+    return {
+        "chunks": chunks,
+        "tokens": chunker.last_run_tokens,
+        "seconds": chunker.last_run_seconds
+    }
+
+
+def chunk_shard(
+    text: str,
+    metadata: Optional[Dict],
+    chunk_size: int,
+    chunk_overlap: int,
+    use_paragraph_chunking: bool
+) -> Dict:
+    """
+    Chunk one shard of a document and count the index terms of every chunk
+    (runs in a worker process)
+
+    Returns:
+        Dictionary with the chunks (each carrying term_freqs), the number of
+        tokens encoded and the seconds spent chunking
+    """
+    chunker = _get_chunker(chunk_size, chunk_overlap)
+    if use_paragraph_chunking:
+        chunks = chunker.chunk_by_paragraphs(text, metadata)
+    else:
+        chunks = chunker.chunk_text(text, metadata)
+
+    return _shard_result(chunker, chunks)
+
+
+def chunk_page_shard(
+    pages: List[Tuple[int, str]],
+    metadata: Optional[Dict],
+    chunk_size: int,
+    chunk_overlap: int
+) -> Dict:
+    """
+    Chunk consecutive pages of a document, page by page (runs in a worker process)
+
+    Returns:
+        Same as chunk_shard; every chunk also carries its page number
+    """
+    chunker = _get_chunker(chunk_size, chunk_overlap)
+    return _shard_result(chunker, list(chunker.iter_chunks_by_pages(pages, metadata)))
+
+
+def chunk_row_shard(
+    rows: List[Tuple[str, str, str]],
+    metadata: Optional[Dict],
+    chunk_size: int,
+    chunk_overlap: int
+) -> Dict:
+    """
+    Chunk consecutive table rows in row groups (runs in a worker process)
+
+    Returns:
+        Same as chunk_shard
+    """
+    chunker = _get_chunker(chunk_size, chunk_overlap)
+    return _shard_result(chunker, list(chunker.iter_chunks_by_rows(rows, metadata)))
+
+
+def _send(channel, cancelled, message: Tuple) -> bool:
+    """Put a message on a bounded channel, giving up once the reader cancelled"""
+    while not cancelled.is_set():
+        try:
+            channel.put(message, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def stream_file_chunks(
+    filename: str,
+    file_content: bytes,
+    metadata: Optional[Dict],
+    chunk_size: int,
+    chunk_overlap: int,
+    batch_size: int,
+    channel,
+    cancelled
+):
+    """
+    Extract and chunk a paginated file page by page (or a tabular file in row
+    groups), sending chunk batches through a bounded channel as they are
+    produced (runs in a worker process)
+
+    Pages and rows are extracted lazily and chunked as they come, so the
+    worker holds one page (or chunk of rows) and one batch at a time; a full
+    channel pauses extraction until the reader caught up. Messages are
+    ("chunks", shard result) followed by ("done", shard result with the run's
+    tokens and seconds), or ("error", message).
+    """
+    try:
+        chunker = _get_chunker(chunk_size, chunk_overlap)
+        if DocumentProcessor.is_tabular(filename):
+            chunks = chunker.iter_chunks_by_rows(
+                DocumentProcessor.process_file_rows(filename, file_content), metadata
+            )
+        else:
+            chunks = chunker.iter_chunks_by_pages(
+                DocumentProcessor.process_file_pages(filename, file_content), metadata
+            )
+
+        for batch in chunker.batched(chunks, batch_size):
+            for chunk in batch:
+                chunk["term_freqs"] = InvertedIndex.count_terms(chunk["text"])
+            if not _send(channel, cancelled, ("chunks", {"chunks": batch, "tokens": 0, "seconds": 0.0})):
+                return
+
+        _send(channel, cancelled, ("done", _shard_result(chunker, [])))
+    except Exception as e:
+        _send(channel, cancelled, ("error", str(e)))
+
+
+def split_shards(text: str, shard_chars: int) -> List[str]:
+    """
+    Split text into shards of at least shard_chars characters, cutting only
+    at paragraph breaks so no paragraph is split between shards
+    """
+    shards = []
+    start = 0
+
+    while len(text) - start > shard_chars:
+        end = text.find('\n\n', start + shard_chars)
+        if end == -1:
+            break
+        shards.append(text[start:end])
+        start = end + 2
+
+    shards.append(text[start:])
+    return shards
+
+
+def split_item_shards(items: List[Tuple], shard_chars: int) -> List[List[Tuple]]:
+    """
+    Group consecutive items (pages or table rows, each ending with its text)
+    into shards of at least shard_chars characters
+    """
+    shards = []
+    shard = []
+    shard_length = 0
+
+    for item in items:
+        shard.append(item)
+        shard_length += len(item[-1])
+        if shard_length >= shard_chars:
+            shards.append(shard)
+            shard = []
+            shard_length = 0
+
+    if shard or not shards:
+        shards.append(shard)
+    return shards
+
+
+class IngestionPool:
+    """
+    Process pool for the CPU-bound part of ingestion
+
+    Text extraction, tokenization and term counting hold the GIL, so running
+    them in the API process stalls every request served by its event loop.
+    Large documents are split into shards at paragraph breaks and chunked on
+    all workers in parallel; shard results are merged back in document order.
+
+    A paragraph never spans two shards, so chunks are packed exactly as the
+    in-process chunker packs them except at shard boundaries.
+
+    Every task is admitted through a limit of tasks_per_worker tasks per
+    worker; the rest wait on the event loop (not in the executor's unbounded
+    queue), which keeps uploads from starving each other and makes the queue
+    depth observable.
+
+    Files are extracted and chunked as a stream by a single task whose chunk
+    batches come back through a bounded channel (see iter_file_chunk_shards).
+    """
+
+    # Chunk batches a streaming task may send ahead of the reader
+    STREAM_BUFFER_BATCHES = 2
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        shard_chars: Optional[int] = None,
+        tasks_per_worker: Optional[int] = None
+    ):
+        """
+        Initialize pool settings (worker processes start on first use)
+
+        Args:
+            max_workers: Worker processes (0 runs the work on one thread of
+                the API process instead; default RAG_INGEST_WORKERS or up to 4)
+            shard_chars: Minimum characters per shard (default RAG_INGEST_SHARD_CHARS)
+            tasks_per_worker: Tasks admitted to the executor per worker
+                (default RAG_INGEST_TASKS_PER_WORKER or 1)
+        """
+        if max_workers is None:
+            max_workers = int(os.environ.get('RAG_INGEST_WORKERS', str(min(4, os.cpu_count() or 1))))
+        if shard_chars is None:
+            shard_chars = int(os.environ.get('RAG_INGEST_SHARD_CHARS', '200000'))
+        if tasks_per_worker is None:
+            tasks_per_worker = int(os.environ.get('RAG_INGEST_TASKS_PER_WORKER', '1'))
+
+        self.max_workers = max_workers
+        self.shard_chars = shard_chars
+        self.tasks_per_worker = max(1, tasks_per_worker)
+        self.max_concurrent_tasks = max(1, max_workers) * self.tasks_per_worker
+        self._executor: Optional[Executor] = None
+        self._manager = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Live gauges (tasks waiting for a slot and tasks in the executor)
+        self.queue_depth = 0
+        self.running = 0
+        self.reset_stats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.enabled:
+                # Workers are spawned rather than forked: the API process runs
+                # threads (Motor, the event loop) that must not be copied mid-state
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Started ingestion pool with {self.max_workers} worker processes")
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion")
+        return self._executor
+
+    def _open_channel(self) -> Tuple[Any, Any]:
+        """A bounded queue and a cancel flag shared with a streaming task"""
+        if not self.enabled:
+            return queue.Queue(self.STREAM_BUFFER_BATCHES), threading.Event()
+
+        if self._manager is None:
+            # Worker processes reach the reader's queue through a manager process
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager.Queue(self.STREAM_BUFFER_BATCHES), self._manager.Event()
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_tasks)
+        return self._slots
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run a module-level function in the pool and await its result
+
+        Waits for a free task slot first; time spent waiting and running is
+        recorded for get_stats.
+        """
+        slots = self._get_slots()
+
+        queued_at = time.perf_counter()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await slots.acquire()
+        finally:
+            self.queue_depth -= 1
+
+        started = time.perf_counter()
+        self.wait_seconds += started - queued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.run_seconds += time.perf_counter() - started
+            slots.release()
+
+    def reset_stats(self):
+        """Reset task counters"""
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool size, current queue depth and per-task averages"""
+        finished = max(self.completed + self.failed, 1)
+
+        return {
+            "workers": self.max_workers,
+            "max_concurrent_tasks": self.max_concurrent_tasks,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.wait_seconds * 1000 / finished, 3),
+            "avg_run_ms": round(self.run_seconds * 1000 / finished, 3)
+        }
+
+    async def extract_text(self, filename: str, file_content: bytes) -> str:
+        """
+        Extract the text of an uploaded file off the event loop
+
+        Args:
+            filename: File name (its extension selects the parser)
+            file_content: Raw file bytes
+
+        Returns:
+            Extracted text
+        """
+        return await self.run(extract_text, filename, file_content)
+
+    async def extract_html(self, html: str, base_url: str) -> Tuple[str, List[str]]:
+        """
+        Extract the text and outgoing links of a web page off the event loop
+
+        Args:
+            html: HTML document
+            base_url: URL the page was fetched from
+
+        Returns:
+            (text, absolute link URLs)
+        """
+        return await self.run(extract_html, html, base_url)
+
+    async def extract_preview(self, filename: str, file_content: bytes, max_chars: int) -> str:
+        """
+        Extract the first max_chars characters of a streamed file's text off
+        the event loop (only the pages or rows needed are read)
+
+        Args:
+            filename: File name (its extension selects the parser)
+            file_content: Raw file bytes
+            max_chars: Maximum characters to return
+
+        Returns:
+            Beginning of the file's text
+        """
+        return await self.run(extract_preview, filename, file_content, max_chars)
+
+    async def iter_chunk_shards(
+        self,
+        text: str,
+        metadata: Optional[Dict],
+        chunk_size: int,
+        chunk_overlap: int,
+        use_paragraph_chunking: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        Chunk a document on the pool, one shard per task
+
+        Args:
+            text: Document text
+            metadata: Optional metadata attached to every chunk
+            chunk_size: Target chunk size in tokens
+            chunk_overlap: Token overlap of split paragraphs
+            use_paragraph_chunking: Whether to use paragraph-aware chunking
+                (fixed windows overlap across the whole text, so the text is
+                not sharded)
+
+        Yields:
+            Shard results with chunks (carrying term_freqs), tokens and seconds
+        """
+        shards = split_shards(text, self.shard_chars) if use_paragraph_chunking else [text]
+        tasks = (
+            (chunk_shard, shard, metadata, chunk_size, chunk_overlap, use_paragraph_chunking)
+            for shard in shards
+        )
+
+        async for result in self._iter_ordered_results(tasks, len(shards)):
+            yield result
+
+    async def iter_page_chunk_shards(
+        self,
+        pages: List[Tuple[int, str]],
+        metadata: Optional[Dict],
+        chunk_size: int,
+        chunk_overlap: int
+    ) -> AsyncIterator[Dict]:
+        """
+        Chunk a paginated document on the pool, one run of whole pages per task
+
+        Args:
+            pages: (page number, text) pairs in document order
+            metadata: Optional metadata attached to every chunk
+            chunk_size: Target chunk size in tokens
+            chunk_overlap: Token overlap of split paragraphs
+
+        Yields:
+            Shard results as in iter_chunk_shards; chunks also carry their page
+        """
+        shards = split_item_shards(pages, self.shard_chars)
+        tasks = ((chunk_page_shard, shard, metadata, chunk_size, chunk_overlap) for shard in shards)
+
+        async for result in self._iter_ordered_results(tasks, len(shards)):
+            yield result
+
+    async def iter_row_chunk_shards(
+        self,
+        rows: List[Tuple[str, str, str]],
+        metadata: Optional[Dict],
+        chunk_size: int,
+        chunk_overlap: int
+    ) -> AsyncIterator[Dict]:
+        """
+        Chunk tabular data on the pool, one run of consecutive rows per task
+
+        Args:
+            rows: (table name, header row, row) triples in table order
+            metadata: Optional metadata attached to every chunk
+            chunk_size: Target chunk size in tokens
+            chunk_overlap: Token overlap of split rows
+
+        Yields:
+            Shard results as in iter_chunk_shards
+        """
+        shards = split_item_shards(rows, self.shard_chars)
+        tasks = ((chunk_row_shard, shard, metadata, chunk_size, chunk_overlap) for shard in shards)
+
+        async for result in self._iter_ordered_results(tasks, len(shards)):
+            yield result
+
+    async def iter_file_chunk_shards(
+        self,
+        filename: str,
+        file_content: bytes,
+        metadata: Optional[Dict],
+        chunk_size: int,
+        chunk_overlap: int,
+        batch_size: int
+    ) -> AsyncIterator[Dict]:
+        """
+        Extract and chunk a paginated file (see DocumentProcessor.has_pages)
+        page by page, or a tabular file (see DocumentProcessor.is_tabular) in
+        row groups, on the pool, yielding chunk batches as they are produced
+
+        One task streams the whole file: pages and rows are never collected
+        into a list, and the task pauses while STREAM_BUFFER_BATCHES batches wait to
+        be read, so memory stays bounded regardless of the file's size.
+
+        Args:
+            filename: File name (its extension selects the parser)
+            file_content: Raw file bytes
+            metadata: Optional metadata attached to every chunk
+            chunk_size: Target chunk size in tokens
+            chunk_overlap: Token overlap of split paragraphs
+            batch_size: Chunks per yielded batch
+
+        Yields:
+            Shard results as in iter_chunk_shards (the last one carries the
+            run's tokens and seconds and no chunks)
+        """
+        channel, cancelled = self._open_channel()
+        producer = asyncio.ensure_future(self.run(
+            stream_file_chunks, filename, file_content, metadata,
+            chunk_size, chunk_overlap, batch_size, channel, cancelled
+        ))
+
+        try:
+            while True:
+                kind, payload = await self._receive(channel, producer)
+                if kind == "error":
+                    raise Exception(payload)
+                yield payload
+                if kind == "done":
+                    break
+        finally:
+            # Stops a task the reader abandoned; it exits within a second
+            cancelled.set()
+            try:
+                await producer
+            except Exception as e:
+                logger.error(f"Streaming ingestion task failed: {str(e)}")
+
+    @staticmethod
+    async def _receive(channel, producer: asyncio.Future) -> Tuple:
+        """Read the next message of a streaming task (fails if the task died without one)"""
+        while True:
+            try:
+                return await asyncio.to_thread(channel.get, True, 1)
+            except queue.Empty:
+                if producer.done():
+                    producer.result()
+                    raise Exception("Streaming ingestion task stopped without finishing")
+
+    async def _iter_ordered_results(self, tasks: Iterator[Tuple], shard_count: int) -> AsyncIterator[Dict]:
+        """
+        Run shard tasks (function followed by its arguments) and yield their
+        results in submission order
+
+        At most two shards per worker are submitted at a time, so memory stays
+        bounded for very large documents. chunk_index is renumbered to run
+        consecutively across shards.
+        """
+        in_flight = max(1, self.max_workers) * 2
+        pending = deque()
+        next_index = 0
+
+        def submit_next() -> bool:
+            task = next(tasks, None)
+            if task is None:
+                return False
+            pending.append(asyncio.ensure_future(self.run(*task)))
+            return True
+
+        while len(pending) < in_flight and submit_next():
+            pass
+
+        try:
+            while pending:
+                result = await pending.popleft()
+                submit_next()
+
+                for chunk in result["chunks"]:
+                    chunk["chunk_index"] = next_index
+                    next_index += 1
+
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+        if shard_count > 1:
+            logger.info(f"Chunked {shard_count} shards into {next_index} chunks")
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+# Global ingestion pool instance
+ingestion_pool = IngestionPool()
@@ -0,0 +1,454 @@
+import asyncio
+import logging
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+# Common stop words ignored by keyword extraction and indexing
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that',
+    'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'
+}
+
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into normalized index terms
+
+    Lowercases, strips punctuation and drops stop words and words of
+    two characters or less.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of terms in document order
+    """
+    words = _NON_WORD_RE.sub(' ', text.lower()).split()
+    return [word for word in words if word not in STOP_WORDS and len(word) > 2]
+
+
+class InvertedIndex:
+    """
+    Per-chatbot inverted index stored in MongoDB
+
+    Each posting maps (chatbot_id, term) to a chunk with the term frequency
+    and the chunk length, so retrieval only touches the postings of the
+    query terms instead of scanning every chunk of the chatbot.
+
+    Corpus-level statistics needed for BM25 (document count, total length and
+    per-term document frequency) are maintained incrementally on every write.
+    """
+
+    def __init__(self, db):
+        """
+        Initialize index collections
+
+        Args:
+            db: Motor database instance
+        """
+        self.postings_collection = db['chunk_postings']
+        self.stats_collection = db['chunk_index_stats']
+        self.terms_collection = db['chunk_term_stats']
+
+    async def ensure_indexes(self):
+        """Create the MongoDB indexes backing the inverted index"""
+        try:
+            # Impact-ordered postings: highest tf first for each term
+            await self.postings_collection.create_index(
+                [("chatbot_id", ASCENDING), ("term", ASCENDING), ("tf", DESCENDING)]
+            )
+            await self.postings_collection.create_index(
+                [("chatbot_id", ASCENDING), ("source_id", ASCENDING)]
+            )
+            # Postings of given chunks (score completion and chunk removal)
+            await self.postings_collection.create_index(
+                [("chatbot_id", ASCENDING), ("chunk_id", ASCENDING)]
+            )
+            await self.stats_collection.create_index([("chatbot_id", ASCENDING)], unique=True)
+            await self.terms_collection.create_index(
+                [("chatbot_id", ASCENDING), ("term", ASCENDING)], unique=True
+            )
+        except Exception as e:
+            logger.warning(f"Index may already exist: {str(e)}")
+
+    @staticmethod
+    def count_terms(text: str) -> Dict[str, int]:
+        """
+        Count the index terms of a chunk
+
+        Args:
+            text: Chunk text
+
+        Returns:
+            Dictionary mapping term to frequency (its values sum to the doc length)
+        """
+        return dict(Counter(tokenize(text)))
+
+    @staticmethod
+    def build_postings(
+        chatbot_id: str,
+        source_id: str,
+        chunk_id: str,
+        term_freqs: Dict[str, int]
+    ) -> List[Dict]:
+        """
+        Build posting documents for a single chunk
+
+        Args:
+            chatbot_id: Chatbot identifier
+            source_id: Source document identifier
+            chunk_id: Chunk identifier
+            term_freqs: Term frequencies of the chunk (from count_terms)
+
+        Returns:
+            List of posting documents (empty if the chunk has no index terms)
+        """
+        doc_length = sum(term_freqs.values())
+
+        return [
+            {
+                "chatbot_id": chatbot_id,
+                "term": term,
+                "chunk_id": chunk_id,
+                "source_id": source_id,
+                "tf": tf,
+                "doc_length": doc_length
+            }
+            for term, tf in term_freqs.items()
+        ]
+
+    async def add_postings(self, chatbot_id: str, postings: List[Dict]) -> Dict:
+        """
+        Insert postings and update corpus statistics
+
+        Args:
+            chatbot_id: Chatbot identifier
+            postings: Posting documents built with build_postings
+
+        Returns:
+            Dictionary with number of documents and postings indexed
+        """
+        if not postings:
+            return {"documents_indexed": 0, "postings_added": 0}
+
+        doc_lengths = {p["chunk_id"]: p["doc_length"] for p in postings}
+
+        await self.postings_collection.insert_many(postings, ordered=False)
+        await self._update_document_frequencies(
+            chatbot_id, Counter(posting["term"] for posting in postings)
+        )
+        await self._update_stats(chatbot_id, len(doc_lengths), sum(doc_lengths.values()))
+
+        return {"documents_indexed": len(doc_lengths), "postings_added": len(postings)}
+
+    async def remove_source(self, chatbot_id: str, source_id: str) -> Dict:
+        """
+        Remove all postings of a source and update corpus statistics
+
+        Args:
+            chatbot_id: Chatbot identifier
+            source_id: Source identifier
+
+        Returns:
+            Dictionary with number of documents and postings removed
+        """
+        return await self._remove_postings(chatbot_id, {"chatbot_id": chatbot_id, "source_id": source_id})
+
+    async def remove_chunks(self, chatbot_id: str, chunk_ids: List[str]) -> Dict:
+        """
+        Remove the postings of individual chunks and update corpus statistics
+
+        Args:
+            chatbot_id: Chatbot identifier
+            chunk_ids: Chunks to remove
+
+        Returns:
+            Dictionary with number of documents and postings removed
+        """
+        if not chunk_ids:
+            return {"documents_removed": 0, "postings_removed": 0}
+
+        return await self._remove_postings(
+            chatbot_id, {"chatbot_id": chatbot_id, "chunk_id": {"$in": chunk_ids}}
+        )
+
+    async def _remove_postings(self, chatbot_id: str, match: Dict) -> Dict:
+        """Remove the postings matching a filter and update corpus statistics"""
+        # Collect document statistics before the postings disappear
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$chunk_id", "doc_length": {"$first": "$doc_length"}}},
+            {"$group": {"_id": None, "docs": {"$sum": 1}, "length": {"$sum": "$doc_length"}}}
+        ]
+        totals = await self.postings_collection.aggregate(pipeline).to_list(length=1)
+
+        term_pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$term", "df": {"$sum": 1}}}
+        ]
+        term_counts = {
+            row["_id"]: -row["df"]
+            async for row in self.postings_collection.aggregate(term_pipeline)
+        }
+
+        result = await self.postings_collection.delete_many(match)
+
+        removed_docs = totals[0]["docs"] if totals else 0
+        removed_length = totals[0]["length"] if totals else 0
+        await self._update_document_frequencies(chatbot_id, term_counts)
+        await self._update_stats(chatbot_id, -removed_docs, -removed_length)
+
+        return {"documents_removed": removed_docs, "postings_removed": result.deleted_count}
+
+    async def remove_chatbot(self, chatbot_id: str):
+        """Drop the whole index of a chatbot"""
+        await self.postings_collection.delete_many({"chatbot_id": chatbot_id})
+        await self.terms_collection.delete_many({"chatbot_id": chatbot_id})
+        await self.stats_collection.delete_one({"chatbot_id": chatbot_id})
+
+    async def get_postings(
+        self,
+        chatbot_id: str,
+        terms: List[str],
+        chunk_ids: Optional[List[str]] = None
+    ) -> Dict[str, List[Dict]]:
+        """
+        Fetch the complete postings of the query terms
+
+        Args:
+            chatbot_id: Chatbot identifier
+            terms: Query terms
+            chunk_ids: Only return the postings of these chunks
+
+        Returns:
+            Dictionary mapping each term to its postings
+        """
+        projection = {"_id": 0, "chunk_id": 1, "tf": 1, "doc_length": 1}
+
+        async def fetch(term: str) -> List[Dict]:
+            query = {"chatbot_id": chatbot_id, "term": term}
+            if chunk_ids is not None:
+                query["chunk_id"] = {"$in": chunk_ids}
+            return await self.postings_collection.find(query, projection).to_list(length=None)
+
+        unique_terms = list(dict.fromkeys(terms))
+        results = await asyncio.gather(*[fetch(term) for term in unique_terms])
+        return dict(zip(unique_terms, results))
+
+    async def get_max_term_frequencies(self, chatbot_id: str, terms: List[str]) -> Dict[str, int]:
+        """
+        Get the highest term frequency of each term in any chunk
+
+        Each lookup reads a single entry of the (chatbot_id, term, tf) index.
+
+        Args:
+            chatbot_id: Chatbot identifier
+            terms: Terms to look up
+
+        Returns:
+            Dictionary mapping term to its highest frequency (terms without postings omitted)
+        """
+        async def fetch(term: str) -> Optional[Dict]:
+            return await self.postings_collection.find_one(
+                {"chatbot_id": chatbot_id, "term": term},
+                {"_id": 0, "tf": 1},
+                sort=[("tf", DESCENDING)]
+            )
+
+        unique_terms = list(dict.fromkeys(terms))
+        results = await asyncio.gather(*[fetch(term) for term in unique_terms])
+        return {term: row["tf"] for term, row in zip(unique_terms, results) if row}
+
+    async def get_document_frequencies(self, chatbot_id: str, terms: List[str]) -> Dict[str, int]:
+        """
+        Get the number of documents containing each term
+
+        Args:
+            chatbot_id: Chatbot identifier
+            terms: Terms to look up
+
+        Returns:
+            Dictionary mapping term to document frequency (missing terms omitted)
+        """
+        cursor = self.terms_collection.find(
+            {"chatbot_id": chatbot_id, "term": {"$in": list(set(terms))}},
+            {"_id": 0, "term": 1, "df": 1}
+        )
+        return {row["term"]: row["df"] async for row in cursor}
+
+    async def get_stats(self, chatbot_id: str) -> Optional[Dict]:
+        """Get corpus statistics for a chatbot (None if the index was never built)"""
+        return await self.stats_collection.find_one({"chatbot_id": chatbot_id}, {"_id": 0})
+
+    async def claim_build(self, chatbot_id: str, stale_after: float) -> bool:
+        """
+        Claim the backfill of a chatbot's index
+
+        The statistics document is created in the "building" state. A build
+        that was released after a failure, or whose builder stopped sending
+        heartbeats for stale_after seconds, can be claimed again to resume it.
+
+        Returns:
+            True if this call holds the claim and must backfill existing chunks
+        """
+        now = datetime.now(timezone.utc)
+        result = await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id},
+            {"$setOnInsert": {
+                "chatbot_id": chatbot_id,
+                "total_docs": 0,
+                "total_length": 0,
+                "chunk_count": 0,
+                "version": 0,
+                "build_state": "building",
+                "build_heartbeat": now,
+                "updated_at": now
+            }},
+            upsert=True
+        )
+        if result.upserted_id is not None:
+            return True
+
+        result = await self.stats_collection.update_one(
+            {
+                "chatbot_id": chatbot_id,
+                "build_state": "building",
+                "$or": [
+                    {"build_heartbeat": None},
+                    {"build_heartbeat": {"$lt": now - timedelta(seconds=stale_after)}}
+                ]
+            },
+            {"$set": {"build_heartbeat": now}}
+        )
+        return result.modified_count == 1
+
+    async def heartbeat_build(self, chatbot_id: str):
+        """Keep a build claim fresh while the backfill progresses"""
+        await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id, "build_state": "building"},
+            {"$set": {"build_heartbeat": datetime.now(timezone.utc)}}
+        )
+
+    async def release_build(self, chatbot_id: str):
+        """Give up a build claim after a failure so the next caller resumes it"""
+        await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id, "build_state": "building"},
+            {"$set": {"build_heartbeat": None}}
+        )
+
+    async def finish_build(self, chatbot_id: str):
+        """Mark a chatbot's index as complete"""
+        await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id},
+            {
+                "$set": {"build_state": "ready", "updated_at": datetime.now(timezone.utc)},
+                "$unset": {"build_heartbeat": ""}
+            }
+        )
+
+    @staticmethod
+    def is_building(stats: Optional[Dict]) -> bool:
+        """Whether statistics belong to an index whose backfill has not finished"""
+        # Indexes built before build states existed are complete
+        return stats is not None and stats.get("build_state", "ready") == "building"
+
+    async def update_chunk_count(self, chatbot_id: str, delta: int) -> Optional[int]:
+        """
+        Apply a delta to the number of chunks stored for a chatbot
+
+        Unlike total_docs this counts every chunk, including chunks without
+        indexable terms.
+
+        Returns:
+            The new count, or None if the chatbot's count was never seeded
+        """
+        stats = await self.stats_collection.find_one_and_update(
+            {"chatbot_id": chatbot_id, "chunk_count": {"$exists": True}},
+            {"$inc": {"chunk_count": delta}},
+            projection={"_id": 0, "chunk_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return stats["chunk_count"] if stats else None
+
+    async def seed_chunk_count(self, chatbot_id: str, count: int):
+        """Store the chunk count of a chatbot indexed before the counter existed"""
+        await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id, "chunk_count": {"$exists": False}},
+            {"$set": {"chunk_count": count}}
+        )
+
+    async def set_chunk_count(self, chatbot_id: str, count: int):
+        """Overwrite the chunk count of a chatbot with a fresh count"""
+        await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id},
+            {"$set": {"chunk_count": count}}
+        )
+
+    async def update_settings(self, chatbot_id: str, settings: Dict):
+        """
+        Store per-chatbot retrieval settings next to the corpus statistics
+
+        The corpus version is bumped, so results cached for the old settings
+        (by any process) are no longer served.
+
+        Args:
+            chatbot_id: Chatbot identifier
+            settings: Fields to set (e.g. retrieval_mode)
+        """
+        await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id},
+            {
+                "$set": {**settings, "updated_at": datetime.now(timezone.utc)},
+                "$inc": {"version": 1}
+            },
+            upsert=True
+        )
+
+    async def touch(self, chatbot_id: str):
+        """Bump the corpus version without changing statistics"""
+        await self._update_stats(chatbot_id, 0, 0)
+
+    async def _update_document_frequencies(self, chatbot_id: str, deltas: Dict[str, int]):
+        """Apply per-term document frequency deltas"""
+        if not deltas:
+            return
+
+        operations = [
+            UpdateOne(
+                {"chatbot_id": chatbot_id, "term": term},
+                {"$inc": {"df": delta}},
+                upsert=True
+            )
+            for term, delta in deltas.items()
+        ]
+        await self.terms_collection.bulk_write(operations, ordered=False)
+
+        # Terms no longer present in any chunk
+        if any(delta < 0 for delta in deltas.values()):
+            await self.terms_collection.delete_many({"chatbot_id": chatbot_id, "df": {"$lte": 0}})
+
+    async def _update_stats(self, chatbot_id: str, docs_delta: int, length_delta: int):
+        """Apply document count/length deltas and bump the corpus version"""
+        await self.stats_collection.update_one(
+            {"chatbot_id": chatbot_id},
+            {
+                "$inc": {
+                    "total_docs": docs_delta,
+                    "total_length": length_delta,
+                    "version": 1
+                },
+                "$set": {"updated_at": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
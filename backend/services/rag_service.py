@@ -1,17 +1,26 @@
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Tuple, Union, AsyncIterator
 from .chunking_service import ChunkingService
 from .vector_store import VectorStore
+from .embedding_service import get_embedding_service
+from .cache_service import query_cache
+from .ingestion_pool import ingestion_pool
 
 logger = logging.getLogger(__name__)
 
 
 class RAGService:
     """
-    Main RAG (Retrieval Augmented Generation) service - Basic version
-    Orchestrates chunking and text-based retrieval (no embeddings)
+    Main RAG (Retrieval Augmented Generation) service
+    Orchestrates chunking and text-based retrieval, with an opt-in per-chatbot
+    hybrid mode that fuses BM25 with embedding similarity
     """
     
+    RETRIEVAL_MODES = ("lexical", "hybrid")
+    
+    # Rough size of a cached retrieval result besides its text
+    QUERY_CACHE_ENTRY_OVERHEAD_BYTES = 2048
+    
     def __init__(self):
         """Initialize RAG service with sub-services"""
         self.chunking_service = ChunkingService(
@@ -23,28 +32,64 @@ class RAGService:
         # Configuration - OPTIMIZED for speed and token usage
         self.top_k_results = 2  # Reduced from 3 to 2 to save 10-20% tokens per message
         self.similarity_threshold = 0.4  # Increased from 0.3 to 0.4 for better quality
+        self.ingest_batch_size = 256  # Chunks embedded and inserted per insert_many
+        
+        # Worker processes for chunking and term counting (off the event loop)
+        self.ingestion_pool = ingestion_pool
+        
+        # Embedding service is created on first use (hybrid chatbots only)
+        self._embedding_service = None
         
         logger.info("Basic RAG Service initialized successfully (no embeddings) - OPTIMIZED")
     
+    @property
+    def embedding_service(self):
+        """Embedding service used by hybrid retrieval"""
+        if self._embedding_service is None:
+            self._embedding_service = get_embedding_service()
+        return self._embedding_service
+    
     async def process_document(
         self,
-        text: str,
+        text: Union[str, Iterable[str]],
         chatbot_id: str,
         source_id: str,
         source_type: str,
         filename: str = None,
-        use_paragraph_chunking: bool = True
+        use_paragraph_chunking: bool = True,
+        pages: Optional[Iterable[Tuple[int, str]]] = None,
+        rows: Optional[Iterable[Tuple[str, str, str]]] = None,
+        file_content: Optional[bytes] = None
     ) -> Dict:
         """
-        Process a document: chunk and store (no embeddings in basic RAG)
+        Process a document: chunk, embed (hybrid chatbots only) and store
+        
+        Chunks are produced lazily and stored in batches of ingest_batch_size,
+        so memory stays bounded for very large documents. Text documents are
+        chunked in shards on the ingestion pool's worker processes; text
+        pieces are chunked in-process by a generator. Chunks the chatbot
+        already stores (same text, any source) are shared instead of being
+        embedded and stored again. If storing fails part-way, the chunks
+        already stored are removed.
         
         Args:
-            text: Document text content
+            text: Document text content (or an iterable of consecutive text pieces)
             chatbot_id: Chatbot identifier
             source_id: Source document identifier
             source_type: Type of source (file, website, text)
             filename: Optional filename
             use_paragraph_chunking: Whether to use paragraph-aware chunking
+            pages: Optional (page number, text) pairs of a paginated document;
+                when given, chunks are built page by page from them instead of
+                from text and carry their page number
+            rows: Optional (table name, header row, row) triples of tabular
+                data; when given, chunks are row groups built from them
+                instead of from text, each repeating its table's header
+            file_content: Optional raw bytes of a paginated or tabular file
+                (see DocumentProcessor.has_pages and is_tabular, filename
+                selects the parser); when given, the file is extracted and
+                chunked page by page or in row groups as a stream on the
+                ingestion pool instead of from text
             
         Returns:
             Dictionary with processing statistics
@@ -52,7 +97,7 @@ class RAGService:
         try:
             logger.info(f"Processing document for chatbot {chatbot_id}, source {source_id}")
             
-            # Step 1: Chunk the document
+            # Step 1: Chunk the document lazily
             metadata = {
                 "source_id": source_id,
                 "source_type": source_type
@@ -60,12 +105,58 @@ class RAGService:
             if filename:
                 metadata["filename"] = filename
             
-            if use_paragraph_chunking:
-                chunks = self.chunking_service.chunk_by_paragraphs(text, metadata)
-            else:
-                chunks = self.chunking_service.chunk_text(text, metadata)
+            structured = pages is not None or rows is not None or file_content is not None
+            if not structured and not use_paragraph_chunking and not isinstance(text, str):
+                text = "".join(text)
+            chunk_batches = self._iter_chunk_batches(
+                text, metadata, use_paragraph_chunking, pages, rows, filename, file_content
+            )
             
-            if not chunks:
+            # Step 2: Embed (hybrid chatbots) and store each batch as it is produced
+            hybrid = await self.vector_store.get_retrieval_mode(chatbot_id) == "hybrid"
+            chunks_created = 0
+            chunks_stored = 0
+            chunks_deduplicated = 0
+            bytes_saved = 0
+            total_tokens = 0
+            embedded = False
+            store_result = {}
+            
+            try:
+                async for batch in chunk_batches:
+                    chunks_created += len(batch)
+                    total_tokens += sum(chunk.get("token_count", 0) for chunk in batch)
+                    
+                    # Chunks the chatbot already stores are shared, not embedded or stored again
+                    batch, dedup_stats = await self.vector_store.deduplicate_chunks(chatbot_id, source_id, batch)
+                    chunks_deduplicated += dedup_stats["chunks_deduplicated"]
+                    bytes_saved += dedup_stats["bytes_saved"]
+                    if not batch:
+                        continue
+                    
+                    embeddings = None
+                    if hybrid:
+                        embeddings = await self.embedding_service.generate_embeddings_batch(
+                            [chunk["text"] for chunk in batch]
+                        )
+                        embedded = embedded or bool(embeddings)
+                    
+                    store_result = await self.vector_store.add_chunks(
+                        chatbot_id=chatbot_id,
+                        chunks=batch,
+                        embeddings=embeddings,
+                        source_id=source_id,
+                        source_type=source_type,
+                        filename=filename,
+                        update_ann=False
+                    )
+                    chunks_stored += store_result.get("chunks_added", 0)
+            except Exception:
+                if chunks_stored or chunks_deduplicated:
+                    await self.vector_store.delete_source(chatbot_id, source_id)
+                raise
+            
+            if not chunks_created:
                 logger.warning("No chunks created from document")
                 return {
                     "success": False,
@@ -73,26 +164,22 @@ class RAGService:
                     "chunks_created": 0
                 }
             
-            chunk_stats = self.chunking_service.get_stats(chunks)
-            logger.info(f"Created {len(chunks)} chunks: {chunk_stats}")
+            # Step 3: Add the new embeddings to the ANN index once per document
+            if embedded:
+                await self.vector_store.update_ann_index(chatbot_id, source_id=source_id)
             
-            # Step 2: Store chunks directly in MongoDB (no embeddings needed)
-            store_result = await self.vector_store.add_chunks(
-                chatbot_id=chatbot_id,
-                chunks=chunks,
-                embeddings=None,  # No embeddings in basic RAG
-                source_id=source_id,
-                source_type=source_type,
-                filename=filename
-            )
+            chunk_stats = self.chunking_service.build_stats(chunks_created, total_tokens)
+            logger.info(f"Created {chunks_created} chunks ({chunks_deduplicated} already stored): {chunk_stats}")
             
             return {
                 "success": True,
-                "chunks_created": len(chunks),
-                "chunks_stored": store_result.get("chunks_added", 0),
+                "chunks_created": chunks_created,
+                "chunks_stored": chunks_stored,
+                "chunks_deduplicated": chunks_deduplicated,
+                "bytes_saved": bytes_saved,
                 "total_chunks_in_store": store_result.get("collection_size", 0),
                 "chunk_stats": chunk_stats,
-                "method": "basic_rag_no_embeddings"
+                "method": "hybrid_rag" if embedded else "basic_rag_no_embeddings"
             }
             
         except Exception as e:
@@ -103,6 +190,172 @@ class RAGService:
                 "chunks_created": 0
             }
     
+    async def _iter_chunk_batches(
+        self,
+        text: Union[str, Iterable[str]],
+        metadata: Dict,
+        use_paragraph_chunking: bool,
+        pages: Optional[Iterable[Tuple[int, str]]] = None,
+        rows: Optional[Iterable[Tuple[str, str, str]]] = None,
+        filename: Optional[str] = None,
+        file_content: Optional[bytes] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Yield batches of ingest_batch_size chunks in document order
+        
+        Files given as raw bytes are always extracted and chunked as a stream
+        on the ingestion pool. Text, page lists and row lists are chunked on
+        the pool when it is enabled (chunks then carry precomputed
+        term_freqs); text pieces, iterators and a disabled pool use the
+        in-process chunker. Throughput of the run is left on chunking_service
+        for build_stats.
+        """
+        chunk_size = self.chunking_service.chunk_size
+        chunk_overlap = self.chunking_service.chunk_overlap
+        
+        shards = None
+        if file_content is not None:
+            shards = self.ingestion_pool.iter_file_chunk_shards(
+                filename, file_content, metadata, chunk_size, chunk_overlap, self.ingest_batch_size
+            )
+        elif self.ingestion_pool.enabled:
+            if isinstance(pages, list):
+                shards = self.ingestion_pool.iter_page_chunk_shards(pages, metadata, chunk_size, chunk_overlap)
+            elif isinstance(rows, list):
+                shards = self.ingestion_pool.iter_row_chunk_shards(rows, metadata, chunk_size, chunk_overlap)
+            elif pages is None and rows is None and isinstance(text, str):
+                shards = self.ingestion_pool.iter_chunk_shards(
+                    text, metadata, chunk_size, chunk_overlap, use_paragraph_chunking
+                )
+        
+        if shards is None:
+            if pages is not None:
+                chunk_stream = self.chunking_service.iter_chunks_by_pages(pages, metadata)
+            elif rows is not None:
+                chunk_stream = self.chunking_service.iter_chunks_by_rows(rows, metadata)
+            elif use_paragraph_chunking:
+                chunk_stream = self.chunking_service.iter_chunks_by_paragraphs(text, metadata)
+            else:
+                chunk_stream = iter(self.chunking_service.chunk_text(text, metadata))
+            
+            for batch in self.chunking_service.batched(chunk_stream, self.ingest_batch_size):
+                yield batch
+            return
+        
+        pending = []
+        total_tokens = 0
+        total_seconds = 0.0
+        
+        async for shard in shards:
+            total_tokens += shard["tokens"]
+            total_seconds += shard["seconds"]
+            pending.extend(shard["chunks"])
+            
+            while len(pending) >= self.ingest_batch_size:
+                yield pending[:self.ingest_batch_size]
+                pending = pending[self.ingest_batch_size:]
+        
+        if pending:
+            yield pending
+        
+        # Worker CPU time summed over shards
+        self.chunking_service.last_run_tokens = total_tokens
+        self.chunking_service.last_run_seconds = total_seconds
+    
+    async def refresh_document(
+        self,
+        text: Union[str, Iterable[str]],
+        chatbot_id: str,
+        source_id: str,
+        source_type: str,
+        filename: str = None,
+        use_paragraph_chunking: bool = True,
+        pages: Optional[Iterable[Tuple[int, str]]] = None,
+        rows: Optional[Iterable[Tuple[str, str, str]]] = None
+    ) -> Dict:
+        """
+        Re-ingest a changed source, rewriting only the chunks that changed
+        
+        The new content is chunked as in process_document and diffed against
+        the source's stored chunks by content hash; unchanged chunks are not
+        embedded or written again, and the old chunks stay searchable until
+        the new ones are stored. The update is not atomic, so a failed attempt
+        is retried once; the retry repairs the partial writes first.
+        
+        Args:
+            text: New document text (or an iterable of consecutive text pieces)
+            chatbot_id: Chatbot identifier
+            source_id: Source document identifier
+            source_type: Type of source (file, website, text)
+            filename: Optional filename
+            use_paragraph_chunking: Whether to use paragraph-aware chunking
+            pages: Optional (page number, text) pairs, as in process_document
+            rows: Optional table rows, as in process_document
+            
+        Returns:
+            Dictionary with chunks added, kept and removed
+        """
+        try:
+            logger.info(f"Refreshing document for chatbot {chatbot_id}, source {source_id}")
+            
+            metadata = {
+                "source_id": source_id,
+                "source_type": source_type
+            }
+            if filename:
+                metadata["filename"] = filename
+            
+            structured = pages is not None or rows is not None
+            if not structured and not use_paragraph_chunking and not isinstance(text, str):
+                text = "".join(text)
+            
+            chunks = []
+            async for batch in self._iter_chunk_batches(text, metadata, use_paragraph_chunking, pages, rows):
+                chunks.extend(batch)
+            
+            if not chunks:
+                logger.warning("No chunks created from refreshed document")
+                return {
+                    "success": False,
+                    "error": "No chunks created",
+                    "chunks_created": 0
+                }
+            
+            hybrid = await self.vector_store.get_retrieval_mode(chatbot_id) == "hybrid"
+            
+            async def update() -> Dict:
+                return await self.vector_store.update_source_chunks(
+                    chatbot_id=chatbot_id,
+                    source_id=source_id,
+                    chunks=chunks,
+                    source_type=source_type,
+                    filename=filename,
+                    embed=self.embedding_service.generate_embeddings_batch if hybrid else None
+                )
+            
+            try:
+                update_result = await update()
+            except Exception as e:
+                # The retry first repairs what the failed attempt wrote
+                logger.warning(f"Refresh of source {source_id} failed part-way, retrying: {str(e)}")
+                update_result = await update()
+            
+            return {
+                **update_result,
+                "chunks_created": len(chunks),
+                "chunk_stats": self.chunking_service.build_stats(
+                    len(chunks), sum(chunk.get("token_count", 0) for chunk in chunks)
+                )
+            }
+            
+        except Exception as e:
+            logger.error(f"Error refreshing document: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "chunks_created": 0
+            }
+    
     async def retrieve_relevant_context(
         self,
         query: str,
@@ -113,6 +366,9 @@ class RAGService:
         """
         Retrieve relevant context for a query using text-based search
         
+        Results are cached per normalized query and corpus version, so repeated
+        questions skip retrieval until the chatbot's sources change.
+        
         Args:
             query: User query
             chatbot_id: Chatbot identifier
@@ -128,69 +384,250 @@ class RAGService:
             
             logger.info(f"Retrieving context for query (chatbot: {chatbot_id}, top_k: {top_k})")
             
-            # Search using text-based retrieval (no embeddings needed)
+            corpus_version = await self.vector_store.get_corpus_version(chatbot_id)
+            cache_key = self._query_cache_key(chatbot_id, corpus_version, top_k, min_similarity, query)
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Query cache hit for chatbot {chatbot_id}")
+                return dict(cached)
+            
+            # Hybrid chatbots also rank by embedding similarity
+            query_embedding = None
+            if await self.vector_store.get_retrieval_mode(chatbot_id) == "hybrid":
+                try:
+                    query_embedding = await self.embedding_service.generate_embedding(query)
+                except Exception as e:
+                    logger.warning(f"Query embedding failed, using lexical retrieval: {str(e)}")
+                    # Degraded results are not cached
+                    cache_key = None
+            
             matches = await self.vector_store.search(
                 chatbot_id=chatbot_id,
-                query_embedding=None,  # Not used in basic RAG
-                query=query,  # Pass the query text instead
+                query_embedding=query_embedding,
+                query=query,
                 top_k=top_k,
                 min_similarity=min_similarity
             )
             
-            if not matches:
-                logger.info("No relevant context found")
-                return self._empty_context()
+            result = self._build_context(matches)
+            if cache_key:
+                query_cache.set(cache_key, result, self._context_size(result))
+            return dict(result)
             
-            # Step 3: Format context and citations
-            context_parts = []
-            citations = []
+        except Exception as e:
+            logger.error(f"Error retrieving context: {str(e)}")
+            return self._empty_context()
+    
+    async def retrieve_relevant_context_batch(
+        self,
+        queries: List[str],
+        chatbot_id: str,
+        top_k: int = None,
+        min_similarity: float = None
+    ) -> List[Dict]:
+        """
+        Retrieve relevant context for many queries against one chatbot
+        
+        Cached queries are answered from the query cache; the rest are
+        embedded in one batch (hybrid chatbots) and searched together, so
+        postings are fetched and scored once for all of them.
+        
+        Args:
+            queries: User queries
+            chatbot_id: Chatbot identifier
+            top_k: Number of results per query (default: 5)
+            min_similarity: Minimum similarity threshold (default: 0.3)
+            
+        Returns:
+            One context dictionary per query, in the same order and format as
+            retrieve_relevant_context
+        """
+        try:
+            top_k = top_k or self.top_k_results
+            min_similarity = min_similarity or self.similarity_threshold
+            
+            logger.info(f"Retrieving context for {len(queries)} queries (chatbot: {chatbot_id}, top_k: {top_k})")
             
-            for i, match in enumerate(matches):
-                text = match["text"]
-                metadata = match["metadata"]
-                similarity = match["similarity"]
+            corpus_version = await self.vector_store.get_corpus_version(chatbot_id)
+            cache_keys = [
+                self._query_cache_key(chatbot_id, corpus_version, top_k, min_similarity, query)
+                for query in queries
+            ]
+            
+            results: List[Optional[Dict]] = [query_cache.get(cache_key) for cache_key in cache_keys]
+            pending = [i for i, result in enumerate(results) if result is None]
+            
+            if pending:
+                pending_queries = [queries[i] for i in pending]
+                
+                query_embeddings = None
+                if await self.vector_store.get_retrieval_mode(chatbot_id) == "hybrid":
+                    try:
+                        query_embeddings = await self.embedding_service.generate_embeddings_batch(pending_queries)
+                    except Exception as e:
+                        logger.warning(f"Query embedding failed, using lexical retrieval: {str(e)}")
+                        # Degraded results are not cached
+                        cache_keys = [None] * len(queries)
                 
-                # Build citation
-                citation = self._build_citation(metadata, similarity, i + 1)
-                citations.append(citation)
+                batch_matches = await self.vector_store.search_batch(
+                    chatbot_id=chatbot_id,
+                    queries=pending_queries,
+                    query_embeddings=query_embeddings,
+                    top_k=top_k,
+                    min_similarity=min_similarity
+                )
                 
-                # Add to context with citation marker
-                context_parts.append(f"[Source {i + 1}]: {text}")
+                for i, matches in zip(pending, batch_matches):
+                    results[i] = self._build_context(matches)
+                    if cache_keys[i]:
+                        query_cache.set(cache_keys[i], results[i], self._context_size(results[i]))
             
-            # Combine context
-            combined_context = "\n\n".join(context_parts)
+            logger.info(f"Retrieved context for {len(queries)} queries ({len(queries) - len(pending)} cached)")
+            return [dict(result) for result in results]
             
-            # Build citation footer
-            citation_footer = "\n\n" + "\n".join([
-                f"[Source {c['source_number']}]: {c['display_name']} (confidence: {c['confidence']}%)"
-                for c in citations
-            ])
+        except Exception as e:
+            logger.error(f"Error retrieving batch context: {str(e)}")
+            return [self._empty_context() for _ in queries]
+    
+    @staticmethod
+    def _query_cache_key(
+        chatbot_id: str,
+        corpus_version: int,
+        top_k: int,
+        min_similarity: float,
+        query: str
+    ) -> str:
+        """
+        Build the query cache key of a retrieval request
+        
+        The query is normalized for case, whitespace and trailing punctuation
+        so trivially different phrasings of the same question share an entry.
+        The key starts with the chatbot id so a chatbot's entries can be
+        invalidated together.
+        """
+        normalized_query = " ".join(query.lower().split()).rstrip("?!. ")
+        return f"{chatbot_id}:{corpus_version}:{top_k}:{min_similarity}:{normalized_query}"
+    
+    async def set_retrieval_mode(self, chatbot_id: str, mode: str) -> Dict:
+        """
+        Switch a chatbot between lexical and hybrid retrieval
+        
+        Enabling hybrid mode embeds every existing chunk that has no
+        embedding yet and trains the ANN index of large chatbots. The mode
+        is only switched once the backfill succeeded, so a failed switch
+        leaves the chatbot on its previous mode.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            mode: "lexical" or "hybrid"
             
-            logger.info(f"Retrieved {len(matches)} relevant chunks")
+        Returns:
+            Dictionary with the new mode and number of chunks embedded
+        """
+        if mode not in self.RETRIEVAL_MODES:
+            raise ValueError(f"Unsupported retrieval mode: {mode}")
+        
+        embedded = 0
+        if mode == "hybrid":
+            embedded = await self._embed_missing_chunks(chatbot_id)
+        
+        await self.vector_store.set_retrieval_mode(chatbot_id, mode)
+        
+        if mode == "hybrid":
+            # Chunks ingested during the backfill were stored without embeddings
+            embedded += await self._embed_missing_chunks(chatbot_id)
+            if embedded:
+                # Train the ANN index once instead of after every backfill batch
+                await self.vector_store.rebuild_ann_index(chatbot_id)
+        
+        logger.info(f"Retrieval mode for chatbot {chatbot_id} set to {mode} ({embedded} chunks embedded)")
+        return {"retrieval_mode": mode, "chunks_embedded": embedded}
+    
+    async def _embed_missing_chunks(self, chatbot_id: str, batch_size: int = 100) -> int:
+        """Embed stored chunks of a chatbot that have no embedding"""
+        embedded = 0
+        while True:
+            chunks = await self.vector_store.get_chunks_without_embeddings(chatbot_id, limit=batch_size)
+            if not chunks:
+                return embedded
             
-            return {
-                "has_context": True,
-                "context": combined_context,
-                "citations": citations,
-                "citation_footer": citation_footer,
-                "num_sources": len(matches),
-                "avg_similarity": round(sum(m["similarity"] for m in matches) / len(matches), 4),
-                "matches": matches  # Full match data for advanced use
-            }
+            embeddings = await self.embedding_service.generate_embeddings_batch(
+                [chunk["text"] for chunk in chunks]
+            )
+            if len(embeddings) != len(chunks):
+                logger.error(f"Embedding count mismatch for chatbot {chatbot_id}, stopping backfill")
+                return embedded
             
-        except Exception as e:
-            logger.error(f"Error retrieving context: {str(e)}")
+            await self.vector_store.set_chunk_embeddings(
+                chatbot_id,
+                {chunk["chunk_id"]: embedding for chunk, embedding in zip(chunks, embeddings)}
+            )
+            embedded += len(chunks)
+    
+    def _build_context(self, matches: List[Dict]) -> Dict:
+        """
+        Format search matches into context with citation markers
+        
+        Args:
+            matches: Matches returned by the vector store
+            
+        Returns:
+            Dictionary with context, citations, and metadata
+        """
+        if not matches:
+            logger.info("No relevant context found")
             return self._empty_context()
+        
+        context_parts = []
+        citations = []
+        
+        for i, match in enumerate(matches):
+            text = match["text"]
+            metadata = match["metadata"]
+            similarity = match["similarity"]
+            
+            # Build citation
+            citation = self._build_citation(metadata, similarity, i + 1)
+            citations.append(citation)
+            
+            # Add to context with citation marker
+            context_parts.append(f"[Source {i + 1}]: {text}")
+        
+        # Combine context
+        combined_context = "\n\n".join(context_parts)
+        
+        # Build citation footer
+        citation_footer = "\n\n" + "\n".join([
+            f"[Source {c['source_number']}]: {c['display_name']} (confidence: {c['confidence']}%)"
+            for c in citations
+        ])
+        
+        logger.info(f"Retrieved {len(matches)} relevant chunks")
+        
+        return {
+            "has_context": True,
+            "context": combined_context,
+            "citations": citations,
+            "citation_footer": citation_footer,
+            "num_sources": len(matches),
+            "avg_similarity": round(sum(m["similarity"] for m in matches) / len(matches), 4),
+            "matches": matches  # Full match data for advanced use
+        }
+    
+    def _context_size(self, result: Dict) -> int:
+        """Approximate memory used by a retrieval result (text is held in both context and matches)"""
+        return 2 * len(result["context"]) + len(result["citation_footer"]) + self.QUERY_CACHE_ENTRY_OVERHEAD_BYTES
     
     def _build_citation(self, metadata: Dict, similarity: float, source_num: int) -> Dict:
         """Build citation information from metadata"""
         filename = metadata.get("filename", "Unknown source")
         source_type = metadata.get("source_type", "unknown")
         chunk_index = metadata.get("chunk_index", 0)
+        page = metadata.get("page")
         
         # Build display name
         if source_type == "file":
-            display_name = filename
+            display_name = f"{filename}, page {page}" if page is not None else filename
         elif source_type == "website":
             display_name = "Website content"
         else:
@@ -201,6 +638,7 @@ class RAGService:
             "filename": filename,
             "source_type": source_type,
             "chunk_index": chunk_index,
+            "page": page,
             "similarity": similarity,
             "confidence": round(similarity * 100, 1),
             "display_name": display_name
@@ -218,6 +656,30 @@ class RAGService:
             "matches": []
         }
     
+    async def link_duplicate_source(self, chatbot_id: str, stored_source_id: str, source_id: str) -> Dict:
+        """
+        Ingest a source by sharing the chunks of an identical stored source
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            stored_source_id: Source with the same content hash whose chunks are stored
+            source_id: New source identifier
+            
+        Returns:
+            Dictionary with the number of chunks reused (0 if the stored
+            source has no chunks and the content must be processed)
+        """
+        try:
+            chunks_reused = await self.vector_store.add_source_reference(chatbot_id, stored_source_id, source_id)
+            return {
+                "success": True,
+                "duplicate_of": stored_source_id,
+                "chunks_reused": chunks_reused
+            }
+        except Exception as e:
+            logger.error(f"Error linking duplicate source: {str(e)}")
+            return {"success": False, "error": str(e), "chunks_reused": 0}
+    
     async def delete_source(self, chatbot_id: str, source_id: str) -> Dict:
         """
         Delete all data for a source
@@ -276,3 +738,19 @@ class RAGService:
         except Exception as e:
             logger.error(f"Error getting RAG stats: {str(e)}")
             return {"error": str(e)}
+
+
+_rag_service = None
+
+
+def get_rag_service() -> RAGService:
+    """
+    Get the process-wide RAG service
+
+    Routers and the ingestion service share one instance, so a process
+    keeps a single MongoDB client and one set of in-memory caches.
+    """
+    global _rag_service
+    if _rag_service is None:
+        _rag_service = RAGService()
+    return _rag_service
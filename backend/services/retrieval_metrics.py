@@ -0,0 +1,60 @@
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalMetrics:
+    """
+    Process-wide counters for the two retrieval phases
+
+    Phase one scores lightweight candidates (ids and term statistics); phase
+    two fetches text and citation metadata for the winners only, with one
+    query per search. Tracking the bytes and BSON decode time of phase two
+    shows what a chat message costs on the wire.
+    """
+
+    def __init__(self):
+        """Initialize counters"""
+        self.reset()
+
+    def reset(self):
+        """Reset all counters"""
+        self.fetches = 0
+        self.winners_fetched = 0
+        self.winner_bytes = 0
+        self.fetch_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def record_winner_fetch(self, documents: int, wire_bytes: int, fetch_seconds: float, decode_seconds: float):
+        """
+        Record a phase-two fetch
+
+        Args:
+            documents: Number of chunk documents fetched
+            wire_bytes: Raw BSON size of the fetched documents
+            fetch_seconds: Time spent waiting for MongoDB
+            decode_seconds: Time spent decoding the projected fields
+        """
+        self.fetches += 1
+        self.winners_fetched += documents
+        self.winner_bytes += wire_bytes
+        self.fetch_seconds += fetch_seconds
+        self.decode_seconds += decode_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get totals and per-fetch averages"""
+        fetches = max(self.fetches, 1)
+
+        return {
+            "fetches": self.fetches,
+            "winners_fetched": self.winners_fetched,
+            "winner_bytes": self.winner_bytes,
+            "avg_bytes_per_fetch": round(self.winner_bytes / fetches, 1),
+            "avg_fetch_ms": round(self.fetch_seconds * 1000 / fetches, 3),
+            "avg_decode_ms": round(self.decode_seconds * 1000 / fetches, 3)
+        }
+
+
+# Global retrieval metrics instance
+retrieval_metrics = RetrievalMetrics()
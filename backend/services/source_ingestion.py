@@ -0,0 +1,425 @@
+import asyncio
+import hashlib
+import io
+import logging
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument
+
+from .document_processor import DocumentProcessor
+from .ingestion_pool import ingestion_pool
+from .rag_service import RAGService, get_rag_service
+from .website_crawler import website_crawler
+
+logger = logging.getLogger(__name__)
+
+
+class SourceIngestionService:
+    """
+    Ingest training sources into the RAG store and record their status
+
+    Shared by the API (ingestion in the server process) and the Celery
+    workers (distributed ingestion), so both run the same pipeline into
+    document_chunks. Uploads handed to workers are staged in GridFS.
+    """
+
+    # Characters of a streamed file's text kept on its source (for display)
+    CONTENT_PREVIEW_CHARS = 20000
+    # Bytes read from an upload per GridFS write
+    UPLOAD_BLOCK_BYTES = 1024 * 1024
+
+    def __init__(self, db: AsyncIOMotorDatabase, rag_service: Optional[RAGService] = None):
+        """
+        Initialize with the application database
+
+        Args:
+            db: Motor database holding sources, chatbots and ingestion jobs
+            rag_service: RAG pipeline to use (the shared one if not given)
+        """
+        self.db = db
+        self.rag_service = rag_service or get_rag_service()
+        self.uploads = AsyncIOMotorGridFSBucket(db, bucket_name="source_uploads")
+
+    async def reuse_duplicate_source(
+        self,
+        chatbot_id: str,
+        source_id: str,
+        content_hash: str,
+        size: Optional[int] = None
+    ) -> bool:
+        """
+        Complete a source by sharing the chunks of an identical completed source
+        instead of ingesting its content again
+
+        Args:
+            size: Bytes of the source's content (the stored content when not given;
+                streamed files only keep a preview of theirs)
+
+        Returns:
+            True if the source was completed from a duplicate
+        """
+        duplicate = await self.db.sources.find_one({
+            "chatbot_id": chatbot_id,
+            "content_hash": content_hash,
+            "status": "completed",
+            "id": {"$ne": source_id}
+        })
+        if not duplicate:
+            return False
+
+        link_result = await self.rag_service.link_duplicate_source(chatbot_id, duplicate["id"], source_id)
+        if not link_result.get("chunks_reused"):
+            return False
+
+        content = duplicate.get("content") or ""
+        await self.db.sources.update_one(
+            {"id": source_id},
+            {"$set": {
+                "content": content,
+                "status": "completed",
+                "duplicate_of": duplicate["id"],
+                "chunks_saved": link_result["chunks_reused"],
+                "bytes_saved": size if size is not None else len(content.encode("utf-8"))
+            }}
+        )
+        logger.info(f"Source {source_id} duplicates source {duplicate['id']}: reused {link_result['chunks_reused']} chunks")
+        return True
+
+    async def save_dedup_stats(self, source_id: str, rag_result: Dict):
+        """Record the chunks and bytes chunk deduplication saved for a source"""
+        if rag_result.get("success") and rag_result.get("chunks_deduplicated"):
+            await self.db.sources.update_one(
+                {"id": source_id},
+                {"$set": {
+                    "chunks_saved": rag_result["chunks_deduplicated"],
+                    "bytes_saved": rag_result.get("bytes_saved", 0)
+                }}
+            )
+
+    async def mark_failed(self, source_id: str, error: str):
+        """Mark a source as failed with its error"""
+        await self.db.sources.update_one(
+            {"id": source_id},
+            {"$set": {
+                "status": "failed",
+                "error_message": error
+            }}
+        )
+
+    async def touch_chatbot(self, chatbot_id: str):
+        """Update the chatbot's last_trained timestamp"""
+        await self.db.chatbots.update_one(
+            {"id": chatbot_id},
+            {"$set": {"last_trained": datetime.now(timezone.utc)}}
+        )
+
+    async def mark_completed(self, source_id: str):
+        """Mark a source as completed once its chunks are stored (it can then be a dedup target)"""
+        await self.db.sources.update_one(
+            {"id": source_id},
+            {"$set": {"status": "completed"}}
+        )
+
+    async def finish_ingestion(self, source_id: str, rag_result: Dict) -> bool:
+        """
+        Record the outcome of a source's RAG processing
+
+        A source is only marked completed after all of its chunks were stored;
+        a failed one is marked failed so it is never reused as a duplicate.
+
+        Returns:
+            True if RAG processing succeeded
+        """
+        if not rag_result.get("success"):
+            logger.error(f"RAG processing failed: {rag_result.get('error')}")
+            await self.mark_failed(source_id, f"RAG processing failed: {rag_result.get('error')}")
+            return False
+
+        logger.info(f"RAG processing successful: {rag_result.get('chunks_created')} chunks created")
+        await self.save_dedup_stats(source_id, rag_result)
+        await self.mark_completed(source_id)
+        return True
+
+    async def ingest_file(
+        self,
+        chatbot_id: str,
+        source_id: str,
+        filename: str,
+        file_content: bytes,
+        content_hash: str
+    ) -> bool:
+        """
+        Extract, chunk and store an uploaded file
+
+        Returns:
+            True if the source was completed, False if it failed
+        """
+        try:
+            # An identical upload is not parsed or chunked again
+            if not await self.reuse_duplicate_source(chatbot_id, source_id, content_hash, len(file_content)):
+                # Parsing is CPU-bound: run it on the ingestion pool, off the event loop
+                streamed = None
+                if DocumentProcessor.has_pages(filename) or DocumentProcessor.is_tabular(filename):
+                    # Paginated files are chunked page by page (citations carry page numbers) and
+                    # spreadsheets in row groups, both streamed from the pool; the source only
+                    # keeps a preview of their text
+                    streamed = file_content
+                    content = await ingestion_pool.extract_preview(filename, file_content, self.CONTENT_PREVIEW_CHARS)
+                else:
+                    content = await ingestion_pool.extract_text(filename, file_content)
+
+                await self.db.sources.update_one(
+                    {"id": source_id},
+                    {"$set": {"content": content}}
+                )
+
+                # Process with RAG (chunking + embeddings + vector storage)
+                logger.info(f"Processing document with RAG for source {source_id}")
+                rag_result = await self.rag_service.process_document(
+                    text=content,
+                    chatbot_id=chatbot_id,
+                    source_id=source_id,
+                    source_type="file",
+                    filename=filename,
+                    use_paragraph_chunking=True,
+                    file_content=streamed
+                )
+                if not await self.finish_ingestion(source_id, rag_result):
+                    return False
+
+            await self.touch_chatbot(chatbot_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error processing file: {str(e)}")
+            await self.mark_failed(source_id, str(e))
+            return False
+
+    @staticmethod
+    def previous_crawl(source: Dict) -> List[Dict]:
+        """
+        Pages of a website source's last crawl, with each page's text cut back
+        out of the stored content (empty if the content does not match the pages)
+        """
+        content = source.get("content") or ""
+        pages = []
+        position = 0
+        for page in source.get("crawled_pages", []):
+            if "length" not in page:
+                return []
+            pages.append({**page, "text": content[position:position + page["length"]]})
+            position += page["length"] + 2
+
+        if position - 2 != len(content):
+            return []
+        return pages
+
+    async def crawl_website(self, source: Dict, conditional: bool = False) -> Tuple[str, List[Tuple[int, str]], List[Dict]]:
+        """
+        Crawl a website source with its stored page budget
+
+        Args:
+            source: Source document
+            conditional: Re-crawl conditionally against the last crawl (refresh)
+
+        Returns:
+            (content, pages, crawled_pages): the joined page text, (page number,
+            text) pairs for page-aware chunking and the per-page metadata to store
+        """
+        previous_pages = self.previous_crawl(source) if conditional else []
+        crawled = await website_crawler.crawl(
+            source["url"],
+            max_pages=source.get("crawl_max_pages"),
+            max_depth=source.get("crawl_max_depth"),
+            use_sitemap=source.get("crawl_use_sitemap", False),
+            previous_pages=previous_pages
+        )
+        pages = [(page_no, page["text"]) for page_no, page in enumerate(crawled, start=1)]
+        content = "\n\n".join(page["text"] for page in crawled)
+        crawled_pages = [
+            {
+                "url": page["url"],
+                "etag": page["etag"],
+                "last_modified": page["last_modified"],
+                "content_hash": page["content_hash"],
+                "depth": page["depth"],
+                "length": len(page["text"])
+            }
+            for page in crawled
+        ]
+        return content, pages, crawled_pages
+
+    async def ingest_website(self, chatbot_id: str, source: Dict) -> bool:
+        """
+        Crawl, chunk and store a website source
+
+        Returns:
+            True if the source was completed, False if it failed
+        """
+        try:
+            # Pages are fetched concurrently and parsed off the event loop
+            content, pages, crawled_pages = await self.crawl_website(source)
+            content_hash = DocumentProcessor.content_hash(content.encode("utf-8"))
+
+            await self.db.sources.update_one(
+                {"id": source["id"]},
+                {"$set": {
+                    "content": content,
+                    "content_hash": content_hash,
+                    "crawled_pages": crawled_pages
+                }}
+            )
+
+            # Identical page content is not chunked again
+            if not await self.reuse_duplicate_source(chatbot_id, source["id"], content_hash):
+                logger.info(f"Processing website with RAG for source {source['id']}")
+                rag_result = await self.rag_service.process_document(
+                    text=content,
+                    chatbot_id=chatbot_id,
+                    source_id=source["id"],
+                    source_type="website",
+                    filename=source["url"],
+                    use_paragraph_chunking=True,
+                    pages=pages
+                )
+                if not await self.finish_ingestion(source["id"], rag_result):
+                    return False
+
+            await self.touch_chatbot(chatbot_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error scraping website: {str(e)}")
+            await self.mark_failed(source["id"], str(e))
+            return False
+
+    async def ingest_text(self, chatbot_id: str, source_id: str, name: str, content: str, content_hash: str) -> bool:
+        """
+        Chunk and store a text source (its content is already on the source)
+
+        Returns:
+            True if the text was ingested or shared with a duplicate
+        """
+        try:
+            # Identical text is not chunked again
+            if await self.reuse_duplicate_source(chatbot_id, source_id, content_hash):
+                return True
+
+            logger.info(f"Processing text content with RAG for source {source_id}")
+            rag_result = await self.rag_service.process_document(
+                text=content,
+                chatbot_id=chatbot_id,
+                source_id=source_id,
+                source_type="text",
+                filename=name,
+                use_paragraph_chunking=True
+            )
+            return await self.finish_ingestion(source_id, rag_result)
+        except Exception as e:
+            logger.error(f"Error in RAG processing for text: {str(e)}")
+            await self.mark_failed(source_id, str(e))
+            return False
+
+    async def record_job_progress(self, job_id: str, succeeded: bool):
+        """Count a processed source on its bulk ingestion job, completing the job after the last one"""
+        job = await self.db.ingestion_jobs.find_one_and_update(
+            {"id": job_id},
+            {
+                "$inc": {"completed" if succeeded else "failed": 1},
+                "$set": {"updated_at": datetime.now(timezone.utc)}
+            },
+            projection={"_id": 0, "total": 1, "completed": 1, "failed": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if job and job["completed"] + job["failed"] >= job["total"]:
+            # A job that already failed keeps its status
+            await self.db.ingestion_jobs.update_one(
+                {"id": job_id, "status": "processing"},
+                {"$set": {"status": "completed", "updated_at": datetime.now(timezone.utc)}}
+            )
+            logger.info(f"Ingestion job {job_id} finished: {job['completed']} completed, {job['failed']} failed")
+
+    async def fail_job(self, job_id: str, error: str, source_ids: List[str] = ()):
+        """
+        Mark a bulk ingestion job as failed
+
+        Args:
+            source_ids: Sources of the job to mark failed if they are still processing
+        """
+        await self.db.ingestion_jobs.update_one(
+            {"id": job_id},
+            {"$set": {
+                "status": "failed",
+                "error_message": error,
+                "updated_at": datetime.now(timezone.utc)
+            }}
+        )
+        if source_ids:
+            await self.db.sources.update_many(
+                {"id": {"$in": list(source_ids)}, "status": "processing"},
+                {"$set": {"status": "failed", "error_message": f"Ingestion job failed: {error}"}}
+            )
+        logger.error(f"Ingestion job {job_id} failed: {error}")
+
+    async def stage_upload(
+        self,
+        filename: str,
+        stream: BinaryIO,
+        metadata: Optional[Dict] = None,
+        max_bytes: Optional[int] = None
+    ) -> Optional[Tuple[str, str, int]]:
+        """
+        Stream a file into GridFS block by block, hashing it on the way
+
+        Args:
+            filename: File name
+            stream: Readable binary file (read off the event loop)
+            metadata: GridFS metadata of the file
+            max_bytes: Discard the file once it grows beyond this size
+
+        Returns:
+            (GridFS file id, SHA-256 of the content, size in bytes), or None
+            if the file exceeded max_bytes
+        """
+        digest = hashlib.sha256()
+        size = 0
+        grid_in = self.uploads.open_upload_stream(filename, metadata=metadata or {})
+        try:
+            while True:
+                block = await asyncio.to_thread(stream.read, self.UPLOAD_BLOCK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    await grid_in.abort()
+                    return None
+                digest.update(block)
+                await grid_in.write(block)
+            await grid_in.close()
+        except Exception:
+            await grid_in.abort()
+            raise
+        return str(grid_in._id), digest.hexdigest(), size
+
+    async def store_upload(self, source_id: str, filename: str, file_content: bytes) -> str:
+        """
+        Stage an uploaded file in GridFS for a worker to ingest
+
+        Returns:
+            GridFS file id
+        """
+        file_id, _, _ = await self.stage_upload(filename, io.BytesIO(file_content), {"source_id": source_id})
+        return file_id
+
+    async def load_upload(self, file_id: str) -> bytes:
+        """Read a staged upload"""
+        stream = await self.uploads.open_download_stream(ObjectId(file_id))
+        return await stream.read()
+
+    async def delete_upload(self, file_id: str):
+        """Remove a staged upload once it was ingested"""
+        try:
+            await self.uploads.delete(ObjectId(file_id))
+        except Exception as e:
+            logger.warning(f"Failed to delete staged upload {file_id}: {str(e)}")
@@ -1,11 +1,26 @@
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Callable, Awaitable
 import os
+import hashlib
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import TEXT
-import re
+from pymongo import TEXT, UpdateOne, InsertOne, DeleteMany
 from collections import Counter
-import math
+import asyncio
+import heapq
+import re
+import numpy as np
+from .inverted_index import InvertedIndex, tokenize
+from .bm25_scorer import SparseTermMatrix, CorpusIndex, bm25_idf, bm25_contribution, bm25_max_contribution
+from .dense_index import DenseIndex, IVFIndex, encode_embedding, decode_embedding, reciprocal_rank_fusion
+from .ann_index import AnnIndexStore
+from .cache_service import cache_service, corpus_cache, query_cache
+from bson import Binary
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from .retrieval_metrics import retrieval_metrics
+from utils.database_indexes import index_registry
+from utils.background_tasks import spawn
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +28,11 @@ logger = logging.getLogger(__name__)
 class VectorStore:
     """Service for managing document chunks using MongoDB with basic text search"""
     
+    # Fields read for the winning chunks of a search (text and citation metadata)
+    RESULT_FIELDS = (
+        "chunk_id", "text", "source_id", "source_type", "chunk_index", "token_count", "filename", "page"
+    )
+    
     def __init__(self):
         """Initialize MongoDB connection for chunk storage"""
         try:
@@ -24,6 +44,36 @@ class VectorStore:
             self.client = AsyncIOMotorClient(mongo_url)
             self.db = self.client[db_name]
             self.chunks_collection = self.db['document_chunks']
+            # Same collection returning undecoded BSON (fields are decoded on access)
+            self.raw_chunks_collection = self.chunks_collection.with_options(
+                codec_options=CodecOptions(document_class=RawBSONDocument)
+            )
+            self.inverted_index = InvertedIndex(self.db)
+            # Chunks touched by source refreshes in progress (see update_source_chunks)
+            self.refreshes_collection = self.db['chunk_refreshes']
+            self.ann_store = AnnIndexStore(self.db)
+            # Indexes are created once per process (at startup), not per write
+            index_registry.register("document_chunks", self.ensure_indexes)
+            self._build_locks: Dict[str, asyncio.Lock] = {}
+            self._build_tasks: Dict[str, asyncio.Task] = {}
+            # A build claim without a heartbeat for this long is taken over
+            self.index_build_stale_seconds = float(os.environ.get('RAG_INDEX_BUILD_STALE_SECONDS', '120'))
+            # How often callers check on a build running in another process
+            self.index_build_poll_seconds = 0.5
+            self._load_locks: Dict[str, asyncio.Lock] = {}
+            
+            # Chunks scored per query while a chatbot's index is still being built
+            self.unindexed_candidates = 200
+            # Chatbots up to this many chunks are searched from an in-memory index
+            self.hot_corpus_max_chunks = int(os.environ.get('RAG_HOT_CORPUS_MAX_CHUNKS', '5000'))
+            # How long a cached index is trusted before its version is rechecked
+            self.corpus_revalidate_seconds = float(os.environ.get('RAG_CORPUS_REVALIDATE_SECONDS', '5'))
+            # Candidates taken from each ranking before hybrid fusion (x top_k)
+            self.hybrid_candidate_multiplier = 4
+            # Chatbots with at least this many embedded chunks use an ANN (IVF) index
+            self.ann_min_vectors = int(os.environ.get('RAG_ANN_MIN_VECTORS', '10000'))
+            # Default clusters probed per query (per-chatbot ann_nprobe overrides it)
+            self.ann_default_nprobe = int(os.environ.get('RAG_ANN_NPROBE', '8'))
             
             logger.info(f"MongoDB VectorStore initialized with database: {db_name}")
             
@@ -33,17 +83,26 @@ class VectorStore:
     
     async def ensure_text_index(self, chatbot_id: str):
         """
-        Ensure text index exists for efficient text search
+        Ensure the chunk indexes exist (once per process, see index_registry)
         
         Args:
             chatbot_id: Chatbot identifier
         """
+        await index_registry.ensure("document_chunks")
+    
+    async def ensure_indexes(self):
+        """Create the indexes of document_chunks and the inverted index"""
         try:
             # Create text index on 'text' field if it doesn't exist
             await self.chunks_collection.create_index([("text", TEXT)])
             await self.chunks_collection.create_index([("chatbot_id", 1)])
             await self.chunks_collection.create_index([("source_id", 1)])
-            logger.info(f"Text indexes ensured for chatbot {chatbot_id}")
+            await self.chunks_collection.create_index([("chatbot_id", 1), ("chunk_id", 1)])
+            await self.chunks_collection.create_index([("chatbot_id", 1), ("content_hash", 1)])
+            await self.chunks_collection.create_index([("chatbot_id", 1), ("source_ids", 1)])
+            await self.refreshes_collection.create_index([("chatbot_id", 1), ("source_id", 1)], unique=True)
+            await self.inverted_index.ensure_indexes()
+            logger.info("Text indexes ensured for document chunks")
         except Exception as e:
             logger.warning(f"Index may already exist: {str(e)}")
     
@@ -70,56 +129,43 @@ class VectorStore:
         self,
         chatbot_id: str,
         chunks: List[Dict],
-        embeddings: List[List[float]] = None,  # Kept for compatibility but not used
+        embeddings: List[List[float]] = None,
         source_id: str = None,
         source_type: str = None,
-        filename: str = None
+        filename: str = None,
+        update_ann: bool = True
     ) -> Dict:
         """
-        Add document chunks to MongoDB (basic RAG - no embeddings)
+        Add document chunks to MongoDB
+        
+        A document may be added in several calls (one per batch of chunks);
+        chunk ids derive from chunk_index so they stay unique across calls.
         
         Args:
             chatbot_id: Chatbot identifier
             chunks: List of chunk dictionaries with text and metadata
-            embeddings: Not used in basic RAG (kept for compatibility)
+            embeddings: Optional embedding per chunk (hybrid retrieval), stored as float32 bytes
             source_id: Source document identifier
             source_type: Type of source (file, website, text)
             filename: Optional filename for file sources
+            update_ann: Add the embeddings to the ANN index now (batch writers
+                call update_ann_index once per source instead)
             
         Returns:
             Dictionary with operation statistics
         """
         try:
             await self.ensure_text_index(chatbot_id)
+            await self._ensure_index_built(chatbot_id)
             
-            # Prepare documents for MongoDB
-            documents = []
+            # Embeddings are only stored when there is exactly one per chunk
+            if embeddings and len(embeddings) != len(chunks):
+                logger.warning(f"Ignoring {len(embeddings)} embeddings for {len(chunks)} chunks")
+                embeddings = None
             
-            for i, chunk in enumerate(chunks):
-                # Create unique ID for chunk
-                chunk_id = f"{source_id}_chunk_{i}"
-                
-                # Prepare document
-                doc = {
-                    "chunk_id": chunk_id,
-                    "chatbot_id": chatbot_id,
-                    "source_id": source_id,
-                    "source_type": source_type,
-                    "text": chunk["text"],
-                    "chunk_index": chunk.get("chunk_index", i),
-                    "token_count": chunk.get("token_count", 0),
-                    # Add keywords for better retrieval
-                    "keywords": self._extract_keywords(chunk["text"])
-                }
-                
-                if filename:
-                    doc["filename"] = filename
-                
-                # Add any additional metadata from chunk
-                if "page" in chunk:
-                    doc["page"] = chunk["page"]
-                
-                documents.append(doc)
+            documents, postings = self._build_chunk_documents(
+                chatbot_id, chunks, embeddings, source_id, source_type, filename
+            )
             
             # Insert into MongoDB
             if documents:
@@ -128,8 +174,17 @@ class VectorStore:
             else:
                 inserted_count = 0
             
-            # Get total count for this chatbot
-            total_count = await self.chunks_collection.count_documents({"chatbot_id": chatbot_id})
+            # Update the inverted index so the new chunks are searchable
+            await self.inverted_index.add_postings(chatbot_id, postings)
+            
+            if embeddings and update_ann:
+                await self.update_ann_index(
+                    chatbot_id,
+                    {doc["chunk_id"]: embedding for doc, embedding in zip(documents, embeddings)}
+                )
+            self._invalidate_cache(chatbot_id)
+            
+            total_count = await self._update_chunk_count(chatbot_id, inserted_count)
             
             logger.info(f"Added {inserted_count} chunks to MongoDB for chatbot {chatbot_id}")
             
@@ -143,6 +198,69 @@ class VectorStore:
             logger.error(f"Error adding chunks to MongoDB: {str(e)}")
             raise Exception(f"Failed to add chunks: {str(e)}")
     
+    def _build_chunk_documents(
+        self,
+        chatbot_id: str,
+        chunks: List[Dict],
+        embeddings: Optional[List[List[float]]],
+        source_id: str,
+        source_type: str,
+        filename: Optional[str]
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Build the MongoDB documents and inverted index postings of new chunks
+        
+        Returns:
+            Tuple of (chunk documents, postings)
+        """
+        documents = []
+        postings = []
+        
+        for i, chunk in enumerate(chunks):
+            # Create unique ID for chunk (unless the caller chose one)
+            chunk_id = chunk.get("chunk_id") or f"{source_id}_chunk_{chunk.get('chunk_index', i)}"
+            
+            # Tokenize once: the same counts feed postings, stats and keywords
+            # (chunks from the ingestion pool arrive with their counts)
+            term_freqs = chunk.get("term_freqs")
+            if term_freqs is None:
+                term_freqs = InvertedIndex.count_terms(chunk["text"])
+            postings.extend(InvertedIndex.build_postings(chatbot_id, source_id, chunk_id, term_freqs))
+            
+            # Prepare document
+            doc = {
+                "chunk_id": chunk_id,
+                "chatbot_id": chatbot_id,
+                "source_id": source_id,
+                # Every source whose content includes this chunk (see deduplicate_chunks)
+                "source_ids": [source_id],
+                "content_hash": chunk.get("content_hash") or self.content_hash(chunk["text"]),
+                "source_type": source_type,
+                "text": chunk["text"],
+                "chunk_index": chunk.get("chunk_index", i),
+                "token_count": chunk.get("token_count", 0),
+                # Per-term counts and number of index terms, so retrieval never
+                # re-tokenizes stored text (doc_length also marks the chunk as indexed)
+                "term_freqs": term_freqs,
+                "doc_length": sum(term_freqs.values()),
+                # Add keywords for better retrieval
+                "keywords": [term for term, _ in Counter(term_freqs).most_common(20)]
+            }
+            
+            if filename:
+                doc["filename"] = filename
+            
+            if embeddings:
+                doc["embedding"] = Binary(encode_embedding(embeddings[i]))
+            
+            # Add any additional metadata from chunk
+            if "page" in chunk:
+                doc["page"] = chunk["page"]
+            
+            documents.append(doc)
+        
+        return documents, postings
+    
     def _extract_keywords(self, text: str, max_keywords: int = 20) -> List[str]:
         """
         Extract important keywords from text for indexing
@@ -154,86 +272,149 @@ class VectorStore:
         Returns:
             List of keywords
         """
-        # Convert to lowercase and remove special characters
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # Split into words
-        words = text.split()
-        
-        # Remove common stop words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
-            'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-            'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that',
-            'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'
-        }
-        
-        # Filter out stop words and short words
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
+        # Lowercase, strip punctuation, drop stop words and short words
+        keywords = tokenize(text)
         
         # Get most common keywords
         word_counts = Counter(keywords)
         return [word for word, count in word_counts.most_common(max_keywords)]
     
-    def _calculate_bm25_score(self, query_terms: List[str], doc_text: str, 
-                             doc_keywords: List[str], avg_doc_length: float,
-                             k1: float = 1.5, b: float = 0.75) -> float:
+    async def _ensure_index_built(self, chatbot_id: str):
         """
-        Calculate BM25 relevance score for document
+        Make sure the inverted index of a chatbot exists
+        
+        Chunks stored before the index was introduced have no postings; the
+        caller that claims the chatbot's build backfills them. Until the
+        backfill finished the index stays in the "building" state and other
+        callers wait for it instead of searching a partial index. A build that
+        failed or whose builder died is resumed by the next caller.
         
         Args:
-            query_terms: List of query terms
-            doc_text: Document text
-            doc_keywords: Document keywords
-            avg_doc_length: Average document length in collection
-            k1: BM25 parameter (term frequency saturation)
-            b: BM25 parameter (length normalization)
+            chatbot_id: Chatbot identifier
+        """
+        stats = await self.inverted_index.get_stats(chatbot_id)
+        if stats and not InvertedIndex.is_building(stats):
+            return
+        
+        lock = self._build_locks.setdefault(chatbot_id, asyncio.Lock())
+        async with lock:
+            while True:
+                if await self.inverted_index.claim_build(chatbot_id, self.index_build_stale_seconds):
+                    # A resumed build may have stored postings for its last batch
+                    await self._backfill_legacy_chunks(chatbot_id, resumed=stats is not None)
+                    return
+                
+                stats = await self.inverted_index.get_stats(chatbot_id)
+                if not InvertedIndex.is_building(stats):
+                    return
+                
+                # Another process is backfilling; wait until it finishes or its claim goes stale
+                await asyncio.sleep(self.index_build_poll_seconds)
+    
+    def _schedule_index_build(self, chatbot_id: str):
+        """Build the inverted index of a chatbot in the background (once per process at a time)"""
+        task = self._build_tasks.get(chatbot_id)
+        if task is None or task.done():
+            self._build_tasks[chatbot_id] = spawn(
+                self._ensure_index_built(chatbot_id), f"index-build:{chatbot_id}"
+            )
+    
+    async def _backfill_legacy_chunks(self, chatbot_id: str, resumed: bool):
+        """Index the chunks stored before indexing existed (caller holds the build claim)"""
+        try:
+            # Only chunks without doc_length were stored before indexing existed
+            cursor = self.chunks_collection.find(
+                {"chatbot_id": chatbot_id, "doc_length": {"$exists": False}},
+                {"_id": 1, "chunk_id": 1, "source_id": 1, "text": 1}
+            )
+            
+            indexed = 0
+            batch = []
+            async for chunk in cursor:
+                batch.append(chunk)
+                if len(batch) >= 500:
+                    indexed += await self._backfill_batch(chatbot_id, batch, resumed)
+                    batch = []
+            if batch:
+                indexed += await self._backfill_batch(chatbot_id, batch, resumed)
             
+            await self.inverted_index.finish_build(chatbot_id)
+            if indexed:
+                logger.info(f"Backfilled inverted index with {indexed} chunks for chatbot {chatbot_id}")
+        except Exception as e:
+            logger.error(f"Error backfilling inverted index for chatbot {chatbot_id}: {str(e)}")
+            await self.inverted_index.release_build(chatbot_id)
+            raise
+    
+    async def _update_chunk_count(self, chatbot_id: str, delta: int) -> int:
+        """
+        Apply a delta to the stored chunk count of a chatbot
+        
+        Chatbots indexed before the counter existed are counted once to seed it.
+        
         Returns:
-            BM25 score
+            Number of chunks the chatbot has
         """
-        doc_length = len(doc_text.split())
-        score = 0.0
+        count = await self.inverted_index.update_chunk_count(chatbot_id, delta)
+        if count is None:
+            count = await self.chunks_collection.count_documents({"chatbot_id": chatbot_id})
+            await self.inverted_index.seed_chunk_count(chatbot_id, count)
+        return count
+    
+    async def _backfill_batch(self, chatbot_id: str, chunks: List[Dict], resumed: bool = False) -> int:
+        """
+        Index a batch of legacy chunks and mark them as indexed
         
-        # Convert doc text and keywords to lowercase for matching
-        doc_text_lower = doc_text.lower()
-        doc_keywords_lower = [kw.lower() for kw in doc_keywords]
+        Chunks are marked only after their postings are stored, so a batch
+        interrupted part-way is picked up again by a resumed build, which
+        first drops the postings the interrupted attempt left behind.
+        """
+        if resumed:
+            await self.inverted_index.remove_chunks(chatbot_id, [chunk["chunk_id"] for chunk in chunks])
         
-        for term in query_terms:
-            term_lower = term.lower()
-            
-            # Count term frequency in document
-            tf = doc_text_lower.count(term_lower)
-            
-            # Boost if term is in keywords
-            if term_lower in doc_keywords_lower:
-                tf += 2
-            
-            if tf > 0:
-                # Simplified BM25 formula (without IDF component for efficiency)
-                numerator = tf * (k1 + 1)
-                denominator = tf + k1 * (1 - b + b * (doc_length / max(avg_doc_length, 1)))
-                score += numerator / denominator
+        postings = []
+        operations = []
+        for chunk in chunks:
+            term_freqs = InvertedIndex.count_terms(chunk["text"])
+            postings.extend(InvertedIndex.build_postings(
+                chatbot_id, chunk["source_id"], chunk["chunk_id"], term_freqs
+            ))
+            operations.append(UpdateOne(
+                {"_id": chunk["_id"]},
+                {"$set": {"term_freqs": term_freqs, "doc_length": sum(term_freqs.values())}}
+            ))
         
-        return score
+        await self.inverted_index.add_postings(chatbot_id, postings)
+        await self.chunks_collection.bulk_write(operations, ordered=False)
+        await self.inverted_index.update_chunk_count(chatbot_id, len(chunks))
+        await self.inverted_index.heartbeat_build(chatbot_id)
+        return len(chunks)
     
     async def search(
         self,
         chatbot_id: str,
-        query_embedding: List[float] = None,  # Kept for compatibility but not used
+        query_embedding: List[float] = None,
         query: str = None,
         top_k: int = 5,
         min_similarity: float = 0.0
     ) -> List[Dict]:
         """
-        Search for relevant chunks using text-based search (BM25-like scoring) - OPTIMIZED
+        Search for relevant chunks using the inverted index and BM25 scoring
+        
+        Only the postings of the query terms are read, so the cost depends on
+        the number of query terms rather than on the size of the knowledge base.
+        IDF and average document length come from the corpus statistics kept at
+        ingest time; chunk text is never re-tokenized at query time and is only
+        read for the final top-k.
+        
+        When a query embedding is given (hybrid retrieval), the BM25 ranking is
+        fused with a cosine-similarity ranking over the stored chunk embeddings
+        using reciprocal rank fusion.
         
         Args:
             chatbot_id: Chatbot identifier
-            query_embedding: Not used in basic RAG (kept for compatibility)
-            query: Query text (required for basic RAG)
+            query_embedding: Optional query vector for hybrid retrieval
+            query: Query text (required)
             top_k: Number of results to return
             min_similarity: Minimum similarity threshold (0-1)
             
@@ -247,79 +428,47 @@ class VectorStore:
             
             # Extract query terms first
             query_terms = self._extract_keywords(query, max_keywords=10)
-            query_terms_lower = [term.lower() for term in query_terms]
+            hybrid = query_embedding is not None and len(query_embedding) > 0
+            if not query_terms and not hybrid:
+                return []
             
-            # OPTIMIZATION: Use MongoDB text search with $regex for initial filtering
-            # This reduces the number of chunks we need to score in Python
-            regex_filters = [{"text": {"$regex": term, "$options": "i"}} for term in query_terms]
+            # Hybrid search fuses deeper candidate lists from both rankings
+            depth = top_k * self.hybrid_candidate_multiplier if hybrid else top_k
             
-            # Get only chunks that match at least one query term (much faster than loading all)
-            cursor = self.chunks_collection.find({
-                "chatbot_id": chatbot_id,
-                "$or": regex_filters
-            }).limit(top_k * 3)  # Get 3x more for better scoring, but not all chunks
-            
-            matched_chunks = await cursor.to_list(length=top_k * 3)
-            
-            if not matched_chunks:
-                # Fallback: if no matches with keywords, get most recent chunks
-                logger.info(f"No keyword matches for chatbot {chatbot_id}, using recent chunks")
-                cursor = self.chunks_collection.find(
-                    {"chatbot_id": chatbot_id}
-                ).sort("_id", -1).limit(top_k)
-                matched_chunks = await cursor.to_list(length=top_k)
-                
-                if not matched_chunks:
-                    return []
+            corpus, stats = await self._get_hot_corpus(chatbot_id)
             
-            # Calculate average document length from matched chunks only
-            avg_doc_length = sum(len(chunk["text"].split()) for chunk in matched_chunks) / len(matched_chunks)
-            
-            # Score matched documents
-            scored_chunks = []
-            for chunk in matched_chunks:
-                score = self._calculate_bm25_score(
-                    query_terms=query_terms,
-                    doc_text=chunk["text"],
-                    doc_keywords=chunk.get("keywords", []),
-                    avg_doc_length=avg_doc_length
+            if corpus is not None:
+                # Hot knowledge base: rank entirely from RAM
+                top_scored = corpus.search(query_terms, depth) if query_terms else []
+            elif stats is None or InvertedIndex.is_building(stats):
+                # Legacy chatbot whose index is being built in the background
+                top_scored = (
+                    await self._search_unindexed(chatbot_id, query_terms, depth)
+                    if query_terms else []
                 )
+            else:
+                if stats.get("total_docs", 0) <= 0:
+                    return []
                 
-                if score > 0:
-                    scored_chunks.append({
-                        "chunk": chunk,
-                        "score": score
-                    })
-            
-            # Sort by score descending
-            scored_chunks.sort(key=lambda x: x["score"], reverse=True)
-            
-            # Take top k results
-            top_chunks = scored_chunks[:top_k]
-            
-            # Normalize scores to 0-1 range
-            max_score = top_chunks[0]["score"] if top_chunks else 1.0
-            
-            # Format results
-            matches = []
-            for i, item in enumerate(top_chunks):
-                chunk = item["chunk"]
-                normalized_score = item["score"] / max_score if max_score > 0 else 0
-                
-                # Filter by minimum similarity
-                if normalized_score >= min_similarity:
-                    matches.append({
-                        "text": chunk["text"],
-                        "metadata": {
-                            "source_id": chunk["source_id"],
-                            "source_type": chunk["source_type"],
-                            "chunk_index": chunk["chunk_index"],
-                            "token_count": chunk.get("token_count", 0),
-                            "filename": chunk.get("filename")
-                        },
-                        "similarity": round(normalized_score, 4),
-                        "rank": i + 1
-                    })
+                top_scored = (
+                    await self._search_postings(chatbot_id, query_terms, stats, depth)
+                    if query_terms else []
+                )
+            
+            if hybrid:
+                dense_scored = await self._search_dense(chatbot_id, query_embedding, depth)
+                if dense_scored:
+                    top_scored = reciprocal_rank_fusion([top_scored, dense_scored], top_k)
+            
+            top_scored = top_scored[:top_k]
+            if not top_scored:
+                logger.info(f"No keyword matches for chatbot {chatbot_id}")
+                return []
+            
+            # Full text is only read for the winning chunks
+            chunks_by_id = await self._fetch_chunks(chatbot_id, [chunk_id for _, chunk_id in top_scored])
+            
+            matches = self._format_matches(top_scored, chunks_by_id, min_similarity)
             
             logger.info(f"Found {len(matches)} matches above {min_similarity} similarity for chatbot {chatbot_id}")
             return matches
@@ -328,10 +477,1201 @@ class VectorStore:
             logger.error(f"Error searching MongoDB: {str(e)}")
             return []
     
+    async def search_batch(
+        self,
+        chatbot_id: str,
+        queries: List[str],
+        query_embeddings: List[List[float]] = None,
+        top_k: int = 5,
+        min_similarity: float = 0.0
+    ) -> List[List[Dict]]:
+        """
+        Search many queries against one chatbot
+        
+        Postings and document frequencies are fetched once for the union of
+        all query terms and every query is scored in a single vectorized pass;
+        the winning chunks of all queries are fetched with one query.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            queries: Query texts
+            query_embeddings: Optional query vector per query for hybrid retrieval
+            top_k: Number of results per query
+            min_similarity: Minimum similarity threshold (0-1)
+            
+        Returns:
+            One list of matches per query, in the same format as search
+        """
+        try:
+            if not queries:
+                return []
+            
+            queries_terms = [self._extract_keywords(query or "", max_keywords=10) for query in queries]
+            hybrid = bool(query_embeddings) and len(query_embeddings) == len(queries)
+            depth = top_k * self.hybrid_candidate_multiplier if hybrid else top_k
+            
+            corpus, stats = await self._get_hot_corpus(chatbot_id)
+            
+            if corpus is not None:
+                rankings = corpus.search_batch(queries_terms, depth)
+            elif stats is None or InvertedIndex.is_building(stats):
+                rankings = [
+                    await self._search_unindexed(chatbot_id, query_terms, depth)
+                    for query_terms in queries_terms
+                ]
+            else:
+                if stats.get("total_docs", 0) <= 0:
+                    return [[] for _ in queries]
+                
+                rankings = await self._search_postings_batch(chatbot_id, queries_terms, stats, depth)
+            
+            if hybrid:
+                for i, query_embedding in enumerate(query_embeddings):
+                    if not query_embedding:
+                        continue
+                    dense_scored = await self._search_dense(chatbot_id, query_embedding, depth)
+                    if dense_scored:
+                        rankings[i] = reciprocal_rank_fusion([rankings[i], dense_scored], top_k)
+            
+            rankings = [ranking[:top_k] for ranking in rankings]
+            
+            # One round-trip for the winners of every query
+            winners = list(dict.fromkeys(chunk_id for ranking in rankings for _, chunk_id in ranking))
+            chunks_by_id = await self._fetch_chunks(chatbot_id, winners) if winners else {}
+            
+            results = [self._format_matches(ranking, chunks_by_id, min_similarity) for ranking in rankings]
+            
+            logger.info(f"Batch searched {len(queries)} queries for chatbot {chatbot_id}")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error batch searching MongoDB: {str(e)}")
+            return [[] for _ in queries]
+    
+    async def _get_cached_index(
+        self,
+        cache_key: str,
+        chatbot_id: str,
+        loader: Callable[[str, int], Awaitable],
+        max_docs: Optional[int] = None
+    ) -> Tuple[Optional[object], Optional[Dict]]:
+        """
+        Get an in-memory index of a chatbot from the corpus cache, loading it if needed
+        
+        A cached index is trusted for corpus_revalidate_seconds; after that its
+        version is compared with the corpus statistics in MongoDB. Writes made
+        by this process invalidate the cache immediately. Nothing is loaded
+        while the chatbot's inverted index is missing or being built; its
+        backfill is started in the background instead.
+        
+        Args:
+            cache_key: Key of the index in the corpus cache
+            chatbot_id: Chatbot identifier
+            loader: Coroutine function building the index from (chatbot_id, version)
+            max_docs: Do not load corpora larger than this
+            
+        Returns:
+            Tuple of (index or None, corpus statistics if they were read)
+        """
+        index = corpus_cache.get(cache_key)
+        now = time.monotonic()
+        if index is not None and now - index.checked_at < self.corpus_revalidate_seconds:
+            return index, None
+        
+        stats = await self.inverted_index.get_stats(chatbot_id)
+        if stats is None or InvertedIndex.is_building(stats):
+            # Searches use the unindexed path until the backfill finished
+            self._schedule_index_build(chatbot_id)
+            return None, stats
+        version = stats.get("version", 0)
+        
+        if index is not None:
+            if index.version == version:
+                index.checked_at = now
+                return index, stats
+            corpus_cache.delete(cache_key)
+        
+        total_docs = stats.get("total_docs", 0) if stats else 0
+        if total_docs <= 0 or (max_docs is not None and total_docs > max_docs):
+            return None, stats
+        
+        lock = self._load_locks.setdefault(cache_key, asyncio.Lock())
+        async with lock:
+            # Another request may have loaded it while we waited
+            index = corpus_cache.peek(cache_key)
+            if index is not None and index.version == version:
+                return index, stats
+            
+            index = await loader(chatbot_id, version)
+            index.checked_at = time.monotonic()
+            if not corpus_cache.set(cache_key, index, index.nbytes):
+                logger.info(f"Index {cache_key} exceeds the corpus cache budget, not cached")
+            return index, stats
+    
+    def _invalidate_cache(self, chatbot_id: str):
+        """Drop every in-memory index and cached result of a chatbot after a write"""
+        corpus_cache.delete(chatbot_id)
+        corpus_cache.delete(f"{chatbot_id}:dense")
+        cache_service.delete(f"corpus_version:{chatbot_id}")
+        query_cache.delete_prefix(f"{chatbot_id}:")
+    
+    async def get_corpus_version(self, chatbot_id: str) -> int:
+        """
+        Get the corpus version of a chatbot
+        
+        The version changes on every write to the chatbot's chunks. It is
+        re-read from MongoDB at most every corpus_revalidate_seconds; writes
+        made by this process drop it immediately.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            
+        Returns:
+            Corpus version (0 if the chatbot has no index yet)
+        """
+        cache_key = f"corpus_version:{chatbot_id}"
+        version = cache_service.get(cache_key)
+        if version is None:
+            stats = await self.inverted_index.get_stats(chatbot_id)
+            version = stats.get("version", 0) if stats else 0
+            cache_service.set(cache_key, version, ttl_seconds=self.corpus_revalidate_seconds)
+        return version
+    
+    async def _get_hot_corpus(self, chatbot_id: str) -> Tuple[Optional[CorpusIndex], Optional[Dict]]:
+        """
+        Get the in-memory BM25 index of a chatbot if its corpus is small enough
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            
+        Returns:
+            Tuple of (corpus index or None, corpus statistics if they were read)
+        """
+        return await self._get_cached_index(
+            chatbot_id, chatbot_id, self._load_corpus, max_docs=self.hot_corpus_max_chunks
+        )
+    
+    async def _search_dense(
+        self,
+        chatbot_id: str,
+        query_embedding: List[float],
+        top_k: int
+    ) -> List[Tuple[float, str]]:
+        """
+        Rank chunks by cosine similarity to the query embedding
+        
+        Large chatbots with an ANN index only scan the ann_nprobe closest
+        clusters; smaller ones are searched exhaustively.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            query_embedding: Query vector
+            top_k: Number of results
+            
+        Returns:
+            List of (similarity, chunk_id) sorted by descending similarity
+        """
+        dimensions = len(query_embedding)
+        
+        settings = await self.get_retrieval_settings(chatbot_id)
+        if settings.get("ann_index"):
+            ann_index = await self._get_ann_index(chatbot_id)
+            if ann_index is not None and ann_index.dimensions == dimensions:
+                nprobe = settings.get("ann_nprobe") or self.ann_default_nprobe
+                return ann_index.search(query_embedding, top_k, nprobe=nprobe)
+        
+        async def load(chatbot_id: str, version: int) -> DenseIndex:
+            return await self._load_dense_index(chatbot_id, dimensions, version)
+        
+        index, _ = await self._get_cached_index(f"{chatbot_id}:dense", chatbot_id, load)
+        if index is None or index.dimensions != dimensions:
+            return []
+        
+        return index.search(query_embedding, top_k)
+    
+    async def _load_dense_index(self, chatbot_id: str, dimensions: int, version: int) -> DenseIndex:
+        """Build a brute-force index from every stored embedding of a chatbot"""
+        cursor = self.chunks_collection.find(
+            {"chatbot_id": chatbot_id, "embedding": {"$exists": True}},
+            {"_id": 0, "chunk_id": 1, "embedding": 1}
+        )
+        documents = await cursor.to_list(length=None)
+        return DenseIndex.from_documents(documents, dimensions, version)
+    
+    async def _get_ann_index(self, chatbot_id: str) -> Optional[IVFIndex]:
+        """
+        Get the ANN index of a chatbot from the corpus cache, loading it from GridFS if needed
+        
+        Like the other cached indexes it is trusted for corpus_revalidate_seconds,
+        after which its revision is compared with the newest stored one.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            
+        Returns:
+            IVFIndex or None if the chatbot has no ANN index
+        """
+        cache_key = f"{chatbot_id}:ann"
+        index = corpus_cache.get(cache_key)
+        now = time.monotonic()
+        if index is not None and now - index.checked_at < self.corpus_revalidate_seconds:
+            return index
+        
+        revision = await self.ann_store.get_revision(chatbot_id)
+        if index is not None and index.revision == revision:
+            index.checked_at = now
+            return index
+        
+        lock = self._load_locks.setdefault(cache_key, asyncio.Lock())
+        async with lock:
+            index = corpus_cache.peek(cache_key)
+            if index is not None and index.revision == revision:
+                return index
+            
+            index = await self.ann_store.load(chatbot_id) if revision else None
+            if index is None:
+                corpus_cache.delete(cache_key)
+                return None
+            
+            self._cache_ann_index(chatbot_id, index)
+            return index
+    
+    def _cache_ann_index(self, chatbot_id: str, index: IVFIndex):
+        """Put an ANN index in the corpus cache"""
+        index.checked_at = time.monotonic()
+        if not corpus_cache.set(f"{chatbot_id}:ann", index, index.nbytes):
+            logger.info(f"ANN index of chatbot {chatbot_id} exceeds the corpus cache budget, not cached")
+    
+    async def update_ann_index(
+        self,
+        chatbot_id: str,
+        embeddings: Dict[str, List[float]] = None,
+        source_id: str = None
+    ) -> Dict:
+        """
+        Add newly stored embeddings to the ANN index of a chatbot
+        
+        New vectors are assigned to the existing clusters. The index is
+        retrained from all stored embeddings when it does not exist yet, when
+        it is out of sync with MongoDB or when the corpus has grown enough for
+        the centroids to drift. Chatbots below ann_min_vectors keep using
+        exhaustive search.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            embeddings: Embeddings just stored, by chunk_id
+            source_id: Read the embeddings of this source from MongoDB instead
+            
+        Returns:
+            Dictionary with the action taken and the index size
+        """
+        if embeddings is None and source_id is not None:
+            cursor = self.chunks_collection.find(
+                {"chatbot_id": chatbot_id, "source_id": source_id, "embedding": {"$exists": True}},
+                {"_id": 0, "chunk_id": 1, "embedding": 1}
+            )
+            embeddings = {chunk["chunk_id"]: decode_embedding(chunk["embedding"]) async for chunk in cursor}
+        
+        if not embeddings:
+            return {"action": "none"}
+        
+        try:
+            lock = self._build_locks.setdefault(f"{chatbot_id}:ann", asyncio.Lock())
+            async with lock:
+                settings = await self.get_retrieval_settings(chatbot_id)
+                index = await self._get_ann_index(chatbot_id) if settings.get("ann_index") else None
+                dimensions = len(next(iter(embeddings.values())))
+                
+                embedded = await self.chunks_collection.count_documents(
+                    {"chatbot_id": chatbot_id, "embedding": {"$exists": True}}
+                )
+                if index is None:
+                    if embedded < self.ann_min_vectors:
+                        return {"action": "none", "vectors": embedded}
+                    return await self._rebuild_ann_index(chatbot_id, dimensions)
+                
+                if index.dimensions != dimensions or index.needs_retraining():
+                    return await self._rebuild_ann_index(chatbot_id, dimensions)
+                
+                if index.count + len(embeddings) != embedded:
+                    logger.info(f"ANN index of chatbot {chatbot_id} out of sync, rebuilding")
+                    return await self._rebuild_ann_index(chatbot_id, dimensions)
+                
+                index.add(list(embeddings.keys()), np.asarray(list(embeddings.values()), dtype=np.float32))
+                await self.ann_store.save(chatbot_id, index)
+                self._cache_ann_index(chatbot_id, index)
+                return {"action": "updated", "vectors": index.count}
+                
+        except Exception as e:
+            # Exhaustive search still works, so a failed update must not fail ingestion
+            logger.error(f"Error updating ANN index for chatbot {chatbot_id}: {str(e)}")
+            return {"action": "failed", "error": str(e)}
+    
+    async def rebuild_ann_index(self, chatbot_id: str) -> Dict:
+        """
+        Retrain the ANN index of a chatbot from all stored embeddings
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            
+        Returns:
+            Dictionary with the action taken and the index size
+        """
+        sample = await self.chunks_collection.find_one(
+            {"chatbot_id": chatbot_id, "embedding": {"$exists": True}},
+            {"_id": 0, "embedding": 1}
+        )
+        if not sample:
+            return {"action": "none"}
+        
+        lock = self._build_locks.setdefault(f"{chatbot_id}:ann", asyncio.Lock())
+        async with lock:
+            return await self._rebuild_ann_index(chatbot_id, len(sample["embedding"]) // 4)
+    
+    async def _rebuild_ann_index(self, chatbot_id: str, dimensions: int) -> Dict:
+        """Train and store a new ANN index (caller holds the chatbot's ANN lock)"""
+        dense = await self._load_dense_index(chatbot_id, dimensions, 0)
+        
+        if len(dense.chunk_ids) < self.ann_min_vectors:
+            if (await self.get_retrieval_settings(chatbot_id)).get("ann_index"):
+                await self._drop_ann_index(chatbot_id)
+            return {"action": "none", "vectors": len(dense.chunk_ids)}
+        
+        # k-means is CPU bound; keep the event loop responsive
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, IVFIndex.train, dense.chunk_ids, dense.vectors)
+        
+        await self.ann_store.save(chatbot_id, index)
+        self._cache_ann_index(chatbot_id, index)
+        await self.update_retrieval_settings(chatbot_id, {"ann_index": True})
+        
+        logger.info(f"Trained ANN index for chatbot {chatbot_id}: {index.count} vectors, {index.nlist} clusters")
+        return {"action": "rebuilt", "vectors": index.count, "clusters": index.nlist}
+    
+    async def _remove_from_ann_index(self, chatbot_id: str, chunk_ids: List[str]):
+        """Drop deleted chunks from the ANN index of a chatbot"""
+        if not chunk_ids or not (await self.get_retrieval_settings(chatbot_id)).get("ann_index"):
+            return
+        
+        try:
+            lock = self._build_locks.setdefault(f"{chatbot_id}:ann", asyncio.Lock())
+            async with lock:
+                index = await self._get_ann_index(chatbot_id)
+                if index is None:
+                    return
+                
+                index.remove(chunk_ids)
+                if index.count < self.ann_min_vectors:
+                    await self._drop_ann_index(chatbot_id)
+                    return
+                
+                await self.ann_store.save(chatbot_id, index)
+                self._cache_ann_index(chatbot_id, index)
+                
+        except Exception as e:
+            logger.error(f"Error removing chunks from ANN index for chatbot {chatbot_id}: {str(e)}")
+    
+    async def _drop_ann_index(self, chatbot_id: str):
+        """Delete the ANN index of a chatbot and fall back to exhaustive search"""
+        await self.update_retrieval_settings(chatbot_id, {"ann_index": False})
+        await self.ann_store.delete(chatbot_id)
+        corpus_cache.delete(f"{chatbot_id}:ann")
+    
+    async def get_retrieval_settings(self, chatbot_id: str) -> Dict:
+        """
+        Get the retrieval settings of a chatbot
+        
+        Settings changes bump the corpus version, so cached settings are
+        only trusted while the version they were read at is current.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            
+        Returns:
+            Dictionary with retrieval_mode, ann_index and ann_nprobe
+        """
+        cache_key = f"retrieval_settings:{chatbot_id}"
+        version = await self.get_corpus_version(chatbot_id)
+        cached = cache_service.get(cache_key)
+        if cached is not None and cached["version"] == version:
+            return cached["settings"]
+        
+        stats = await self.inverted_index.get_stats(chatbot_id) or {}
+        settings = {
+            "retrieval_mode": stats.get("retrieval_mode", "lexical"),
+            "ann_index": stats.get("ann_index", False),
+            "ann_nprobe": stats.get("ann_nprobe")
+        }
+        cache_service.set(cache_key, {"version": stats.get("version", 0), "settings": settings})
+        return settings
+    
+    async def update_retrieval_settings(self, chatbot_id: str, settings: Dict):
+        """
+        Update retrieval settings of a chatbot
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            settings: Fields to set (retrieval_mode, ann_index, ann_nprobe)
+        """
+        await self._ensure_index_built(chatbot_id)
+        await self.inverted_index.update_settings(chatbot_id, settings)
+        cache_service.delete(f"retrieval_settings:{chatbot_id}")
+        self._invalidate_cache(chatbot_id)
+    
+    async def get_retrieval_mode(self, chatbot_id: str) -> str:
+        """
+        Get the retrieval mode of a chatbot ("lexical" or "hybrid")
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            
+        Returns:
+            Retrieval mode (defaults to "lexical")
+        """
+        return (await self.get_retrieval_settings(chatbot_id))["retrieval_mode"]
+    
+    async def set_retrieval_mode(self, chatbot_id: str, mode: str):
+        """
+        Set the retrieval mode of a chatbot
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            mode: "lexical" or "hybrid"
+        """
+        await self.update_retrieval_settings(chatbot_id, {"retrieval_mode": mode})
+    
+    async def get_chunks_without_embeddings(self, chatbot_id: str, limit: int = 100) -> List[Dict]:
+        """
+        Get chunks that have no stored embedding yet
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            limit: Maximum number of chunks to return
+            
+        Returns:
+            List of chunk documents with chunk_id and text
+        """
+        cursor = self.chunks_collection.find(
+            {"chatbot_id": chatbot_id, "embedding": {"$exists": False}},
+            {"_id": 0, "chunk_id": 1, "text": 1}
+        ).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    async def set_chunk_embeddings(self, chatbot_id: str, embeddings: Dict[str, List[float]]):
+        """
+        Store embeddings for existing chunks
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            embeddings: Embedding by chunk_id
+        """
+        if not embeddings:
+            return
+        
+        operations = [
+            UpdateOne(
+                {"chatbot_id": chatbot_id, "chunk_id": chunk_id},
+                {"$set": {"embedding": Binary(encode_embedding(embedding))}}
+            )
+            for chunk_id, embedding in embeddings.items()
+        ]
+        await self.chunks_collection.bulk_write(operations, ordered=False)
+        
+        # New embeddings change the dense index
+        await self.inverted_index.touch(chatbot_id)
+        self._invalidate_cache(chatbot_id)
+    
+    async def _load_corpus(self, chatbot_id: str, version: int) -> CorpusIndex:
+        """
+        Build an in-memory index from all chunks of a chatbot
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            version: Corpus version read before loading the chunks
+            
+        Returns:
+            CorpusIndex over every chunk of the chatbot
+        """
+        # Only the stored term counts are read; text is fetched for the winners
+        cursor = self.chunks_collection.find(
+            {"chatbot_id": chatbot_id},
+            {"_id": 0, "chunk_id": 1, "term_freqs": 1}
+        )
+        chunks = await cursor.to_list(length=None)
+        
+        # Chunks stored before term counts were persisted are counted once
+        legacy_ids = [chunk["chunk_id"] for chunk in chunks if "term_freqs" not in chunk]
+        if legacy_ids:
+            await self._store_term_freqs(chatbot_id, legacy_ids, chunks)
+        
+        corpus = CorpusIndex.from_term_counts(
+            [chunk["chunk_id"] for chunk in chunks],
+            [chunk["term_freqs"] for chunk in chunks],
+            version
+        )
+        logger.info(f"Loaded {len(chunks)} chunks into memory for chatbot {chatbot_id} ({corpus.nbytes} bytes)")
+        return corpus
+    
+    async def _store_term_freqs(self, chatbot_id: str, chunk_ids: List[str], chunks: List[Dict]):
+        """Count and persist the term frequencies of chunks that have none"""
+        cursor = self.chunks_collection.find(
+            {"chatbot_id": chatbot_id, "chunk_id": {"$in": chunk_ids}},
+            {"_id": 0, "chunk_id": 1, "text": 1}
+        )
+        term_freqs = {
+            chunk["chunk_id"]: InvertedIndex.count_terms(chunk.get("text", ""))
+            async for chunk in cursor
+        }
+        
+        for chunk in chunks:
+            if "term_freqs" not in chunk:
+                chunk["term_freqs"] = term_freqs.get(chunk["chunk_id"], {})
+        
+        # Same counts as before, so the corpus version does not change
+        await self.chunks_collection.bulk_write([
+            UpdateOne(
+                {"chatbot_id": chatbot_id, "chunk_id": chunk_id},
+                {"$set": {"term_freqs": counts}}
+            )
+            for chunk_id, counts in term_freqs.items()
+        ], ordered=False)
+        logger.info(f"Stored term counts for {len(term_freqs)} legacy chunks of chatbot {chatbot_id}")
+    
+    async def _search_postings(
+        self,
+        chatbot_id: str,
+        query_terms: List[str],
+        stats: Dict,
+        top_k: int
+    ) -> List[Tuple[float, str]]:
+        """
+        Rank chunks using the MongoDB inverted index
+        
+        Scoring is exact BM25 over the complete postings, pruned with MaxScore:
+        terms are read in order of their largest possible contribution, and
+        once the k-th best partial score beats the sum of the bounds of the
+        terms not read yet, no chunk outside the current candidates can reach
+        the top k. The remaining (usually common) terms are then only read
+        for the surviving candidates.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            query_terms: Normalized query terms
+            stats: Corpus statistics of the chatbot
+            top_k: Number of results
+            
+        Returns:
+            List of (score, chunk_id) sorted by descending score
+        """
+        total_docs = stats["total_docs"]
+        avg_doc_length = stats["total_length"] / total_docs
+        query_terms = list(dict.fromkeys(query_terms))
+        
+        doc_freqs, max_tfs = await asyncio.gather(
+            self.inverted_index.get_document_frequencies(chatbot_id, query_terms),
+            self.inverted_index.get_max_term_frequencies(chatbot_id, query_terms)
+        )
+        terms = [term for term in query_terms if term in max_tfs]
+        if not terms:
+            return []
+        
+        # Terms without a stored document frequency are read in full and counted
+        postings = {}
+        missing = [term for term in terms if not doc_freqs.get(term)]
+        if missing:
+            postings = await self.inverted_index.get_postings(chatbot_id, missing)
+            doc_freqs.update({term: len(postings[term]) for term in missing})
+        
+        idf = dict(zip(terms, bm25_idf([doc_freqs[term] for term in terms], total_docs).tolist()))
+        bounds = {term: bm25_max_contribution(idf[term], max_tfs[term], avg_doc_length) for term in terms}
+        
+        # Partial scores are lower bounds of the final scores
+        partial: Dict[str, float] = {}
+        remaining = sorted(terms, key=bounds.get, reverse=True)
+        remaining_bound = sum(bounds.values())
+        threshold = 0.0
+        while remaining and (len(partial) < top_k or threshold <= remaining_bound):
+            term = remaining.pop(0)
+            remaining_bound -= bounds[term]
+            if term not in postings:
+                postings.update(await self.inverted_index.get_postings(chatbot_id, [term]))
+            for posting in postings[term]:
+                chunk_id = posting["chunk_id"]
+                partial[chunk_id] = partial.get(chunk_id, 0.0) + bm25_contribution(
+                    idf[term], posting["tf"], posting["doc_length"], avg_doc_length
+                )
+            if len(partial) >= top_k:
+                threshold = heapq.nlargest(top_k, partial.values())[-1]
+        
+        if remaining:
+            # Only chunks that can still reach the k-th best score are completed
+            candidates = [chunk_id for chunk_id, score in partial.items() if score + remaining_bound >= threshold]
+            candidate_set = set(candidates)
+            postings = {
+                term: [posting for posting in term_postings if posting["chunk_id"] in candidate_set]
+                for term, term_postings in postings.items()
+                if term not in remaining
+            }
+            postings.update(await self.inverted_index.get_postings(chatbot_id, remaining, chunk_ids=candidates))
+        
+        # Score every candidate for every query term in one vectorized pass
+        matrix = SparseTermMatrix.from_postings(postings)
+        scores = matrix.bm25_scores(
+            term_weights={term: idf[term] for term in postings},
+            avg_doc_length=avg_doc_length
+        )
+        return matrix.top_k(scores, top_k)
+    
+    async def _search_postings_batch(
+        self,
+        chatbot_id: str,
+        queries_terms: List[List[str]],
+        stats: Dict,
+        top_k: int
+    ) -> List[List[Tuple[float, str]]]:
+        """
+        Rank chunks for many queries using the MongoDB inverted index
+        
+        The complete postings of the union of all query terms are read once
+        and scored exactly; they are shared by every query, so they are not
+        pruned per query like in _search_postings.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            queries_terms: Normalized terms of each query
+            stats: Corpus statistics of the chatbot
+            top_k: Number of results per query
+            
+        Returns:
+            One list of (score, chunk_id) per query, sorted by descending score
+        """
+        all_terms = list(dict.fromkeys(term for query_terms in queries_terms for term in query_terms))
+        if not all_terms:
+            return [[] for _ in queries_terms]
+        
+        total_docs = stats["total_docs"]
+        avg_doc_length = stats["total_length"] / total_docs
+        
+        postings, doc_freqs = await asyncio.gather(
+            self.inverted_index.get_postings(chatbot_id, all_terms),
+            self.inverted_index.get_document_frequencies(chatbot_id, all_terms)
+        )
+        
+        # Postings are complete, so their count stands in for a missing document frequency
+        terms = list(postings.keys())
+        idf = dict(zip(terms, bm25_idf(
+            [doc_freqs.get(term) or len(postings[term]) for term in terms],
+            total_docs
+        ).tolist()))
+        
+        matrix = SparseTermMatrix.from_postings(postings)
+        rows, scores = matrix.bm25_scores_batch(
+            [{term: idf[term] for term in query_terms if term in idf} for query_terms in queries_terms],
+            avg_doc_length
+        )
+        return [matrix.top_k(query_scores, top_k, rows) for query_scores in scores]
+    
+    async def _search_unindexed(
+        self,
+        chatbot_id: str,
+        query_terms: List[str],
+        top_k: int
+    ) -> List[Tuple[float, str]]:
+        """
+        Rank chunks of a chatbot whose inverted index is not built yet
+        
+        Up to unindexed_candidates chunks containing a query term are matched
+        by regex and ranked with BM25 over those candidates, so searches keep
+        working (approximately) while the backfill runs.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            query_terms: Normalized query terms
+            top_k: Number of results
+            
+        Returns:
+            List of (score, chunk_id) sorted by descending score
+        """
+        cursor = self.chunks_collection.find(
+            {
+                "chatbot_id": chatbot_id,
+                "$or": [{"text": {"$regex": re.escape(term), "$options": "i"}} for term in query_terms]
+            },
+            {"_id": 0, "chunk_id": 1, "text": 1, "term_freqs": 1}
+        ).limit(self.unindexed_candidates)
+        chunks = await cursor.to_list(length=self.unindexed_candidates)
+        if not chunks:
+            return []
+        
+        candidates = CorpusIndex.from_term_counts(
+            [chunk["chunk_id"] for chunk in chunks],
+            [chunk.get("term_freqs") or InvertedIndex.count_terms(chunk["text"]) for chunk in chunks],
+            version=0
+        )
+        return candidates.search(query_terms, top_k)
+    
+    async def _fetch_chunks(self, chatbot_id: str, chunk_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch text and citation metadata of the winning chunks
+        
+        Documents are read as raw BSON with a projection, so only the fields
+        used to format results cross the wire and get decoded.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            chunk_ids: Chunks to fetch
+            
+        Returns:
+            Dictionary mapping chunk_id to its projected fields
+        """
+        started = time.perf_counter()
+        cursor = self.raw_chunks_collection.find(
+            {"chatbot_id": chatbot_id, "chunk_id": {"$in": chunk_ids}},
+            {"_id": 0, **{field: 1 for field in self.RESULT_FIELDS}}
+        )
+        raw_chunks = await cursor.to_list(length=len(chunk_ids))
+        fetched = time.perf_counter()
+        
+        chunks = {}
+        for raw_chunk in raw_chunks:
+            chunk = {field: raw_chunk[field] for field in self.RESULT_FIELDS if field in raw_chunk}
+            chunks[chunk["chunk_id"]] = chunk
+        
+        retrieval_metrics.record_winner_fetch(
+            documents=len(raw_chunks),
+            wire_bytes=sum(len(raw_chunk.raw) for raw_chunk in raw_chunks),
+            fetch_seconds=fetched - started,
+            decode_seconds=time.perf_counter() - fetched
+        )
+        return chunks
+    
+    def _format_matches(
+        self,
+        top_scored: List[Tuple[float, str]],
+        chunks_by_id: Dict[str, Dict],
+        min_similarity: float
+    ) -> List[Dict]:
+        """
+        Build search results from ranked chunk ids
+        
+        Args:
+            top_scored: List of (score, chunk_id) sorted by descending score
+            chunks_by_id: Chunk documents by chunk_id
+            min_similarity: Minimum similarity threshold (0-1)
+            
+        Returns:
+            List of dictionaries with matched chunks and metadata
+        """
+        if not top_scored:
+            return []
+        
+        # Normalize scores to 0-1 range
+        max_score = top_scored[0][0]
+        
+        matches = []
+        for i, (score, chunk_id) in enumerate(top_scored):
+            chunk = chunks_by_id.get(chunk_id)
+            if not chunk:
+                continue
+            
+            normalized_score = score / max_score if max_score > 0 else 0
+            
+            # Filter by minimum similarity
+            if normalized_score >= min_similarity:
+                matches.append({
+                    "text": chunk["text"],
+                    "metadata": {
+                        "source_id": chunk["source_id"],
+                        "source_type": chunk["source_type"],
+                        "chunk_index": chunk["chunk_index"],
+                        "token_count": chunk.get("token_count", 0),
+                        "filename": chunk.get("filename"),
+                        "page": chunk.get("page")
+                    },
+                    "similarity": round(normalized_score, 4),
+                    "rank": i + 1
+                })
+        
+        return matches
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """SHA-256 hex digest identifying a chunk's text"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    async def deduplicate_chunks(self, chatbot_id: str, source_id: str, chunks: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """
+        Split chunks into new ones and ones the chatbot already stores
+        
+        Chunks whose text is already stored for the chatbot (by any source)
+        are not stored again: the stored chunk gets source_id added to its
+        source_ids instead. Repeats within the batch are dropped. New chunks
+        come back with content_hash set, ready for add_chunks.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            source_id: Source the chunks belong to
+            chunks: Chunk dictionaries with text
+            
+        Returns:
+            Tuple of (new chunks, statistics with chunks_deduplicated and bytes_saved)
+        """
+        try:
+            for chunk in chunks:
+                chunk.setdefault("content_hash", self.content_hash(chunk["text"]))
+            
+            hashes = list({chunk["content_hash"] for chunk in chunks})
+            stored = {
+                doc["content_hash"]: doc["chunk_id"]
+                async for doc in self.chunks_collection.find(
+                    {"chatbot_id": chatbot_id, "content_hash": {"$in": hashes}},
+                    {"_id": 0, "chunk_id": 1, "content_hash": 1}
+                )
+            }
+            
+            new_chunks = []
+            seen = set()
+            references = []
+            bytes_saved = 0
+            
+            for chunk in chunks:
+                content_hash = chunk["content_hash"]
+                if content_hash in stored or content_hash in seen:
+                    bytes_saved += len(chunk["text"].encode("utf-8"))
+                    if content_hash in stored:
+                        references.append(UpdateOne(
+                            {"chatbot_id": chatbot_id, "chunk_id": stored[content_hash]},
+                            {"$addToSet": {"source_ids": source_id}}
+                        ))
+                    continue
+                
+                seen.add(content_hash)
+                new_chunks.append(chunk)
+            
+            if references:
+                await self.chunks_collection.bulk_write(references, ordered=False)
+            
+            return new_chunks, {
+                "chunks_deduplicated": len(chunks) - len(new_chunks),
+                "bytes_saved": bytes_saved
+            }
+            
+        except Exception as e:
+            logger.error(f"Error deduplicating chunks: {str(e)}")
+            raise Exception(f"Failed to deduplicate chunks: {str(e)}")
+    
+    async def add_source_reference(self, chatbot_id: str, stored_source_id: str, source_id: str) -> int:
+        """
+        Make a source share every chunk of an identical, already stored source
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            stored_source_id: Source whose chunks are stored
+            source_id: New source with the same content
+            
+        Returns:
+            Number of chunks now shared with source_id
+        """
+        try:
+            # Chunks stored before deduplication have no source_ids yet
+            result = await self.chunks_collection.update_many(
+                {
+                    "chatbot_id": chatbot_id,
+                    "$or": [{"source_ids": stored_source_id}, {"source_id": stored_source_id}]
+                },
+                {"$addToSet": {"source_ids": {"$each": [stored_source_id, source_id]}}}
+            )
+            logger.info(f"Source {source_id} shares {result.matched_count} chunks of source {stored_source_id}")
+            return result.matched_count
+            
+        except Exception as e:
+            logger.error(f"Error adding source reference: {str(e)}")
+            raise Exception(f"Failed to add source reference: {str(e)}")
+    
+    def _plan_release(self, chatbot_id: str, source_id: str, chunks: List[Dict]) -> Tuple[List[UpdateOne], Dict[str, List[str]], List[str]]:
+        """
+        Plan removing a source from chunks
+        
+        Chunks no other source references are to be deleted. Shared chunks
+        keep their other references; those owned by the source (source_id
+        field, also used by their postings) are handed over to one of them.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            source_id: Source being removed
+            chunks: Chunk documents with chunk_id, source_id and source_ids
+            
+        Returns:
+            Tuple of (updates for shared chunks, chunk ids by new owner,
+            chunk ids to delete)
+        """
+        updates = []
+        new_owners: Dict[str, List[str]] = {}
+        exclusive_ids = []
+        
+        for chunk in chunks:
+            remaining = [ref for ref in chunk.get("source_ids", []) if ref != source_id]
+            owner = chunk["source_id"]
+            if owner == source_id:
+                if not remaining:
+                    exclusive_ids.append(chunk["chunk_id"])
+                    continue
+                owner = remaining[0]
+                new_owners.setdefault(owner, []).append(chunk["chunk_id"])
+            
+            updates.append(UpdateOne(
+                {"chatbot_id": chatbot_id, "chunk_id": chunk["chunk_id"]},
+                {"$set": {"source_ids": remaining, "source_id": owner}}
+            ))
+        
+        return updates, new_owners, exclusive_ids
+    
+    async def _transfer_postings(self, chatbot_id: str, new_owners: Dict[str, List[str]]):
+        """Point the postings of handed-over chunks at their new owner"""
+        for owner, chunk_ids in new_owners.items():
+            await self.inverted_index.postings_collection.update_many(
+                {"chatbot_id": chatbot_id, "chunk_id": {"$in": chunk_ids}},
+                {"$set": {"source_id": owner}}
+            )
+    
+    async def _release_shared_chunks(self, chatbot_id: str, source_id: str) -> int:
+        """
+        Remove a source from chunks other sources still reference, so deleting
+        the source's own chunks afterwards leaves them in place
+        
+        Returns:
+            Number of shared chunks kept
+        """
+        shared = await self.chunks_collection.find(
+            {"chatbot_id": chatbot_id, "source_ids": source_id, "source_ids.1": {"$exists": True}},
+            {"_id": 0, "chunk_id": 1, "source_id": 1, "source_ids": 1}
+        ).to_list(length=None)
+        
+        updates, new_owners, _ = self._plan_release(chatbot_id, source_id, shared)
+        if updates:
+            await self.chunks_collection.bulk_write(updates, ordered=False)
+        await self._transfer_postings(chatbot_id, new_owners)
+        
+        return len(updates)
+    
+    async def _repair_refresh(self, chatbot_id: str, source_id: str):
+        """
+        Repair the chunks of a source refresh that stopped part-way
+        
+        The postings of every chunk the refresh touched are dropped and rebuilt
+        from the chunks that are stored now, and the chunk count is recounted.
+        Leftover old chunks stay stored until the next diff removes them.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            source_id: Source identifier
+        """
+        journal = await self.refreshes_collection.find_one({"chatbot_id": chatbot_id, "source_id": source_id})
+        if journal is None:
+            return
+        
+        chunk_ids = journal["chunk_ids"]
+        logger.warning(f"Repairing interrupted refresh of source {source_id} ({len(chunk_ids)} chunks)")
+        
+        await self.inverted_index.remove_chunks(chatbot_id, chunk_ids)
+        postings = []
+        async for chunk in self.chunks_collection.find(
+            {"chatbot_id": chatbot_id, "chunk_id": {"$in": chunk_ids}},
+            {"_id": 0, "chunk_id": 1, "source_id": 1, "term_freqs": 1, "text": 1}
+        ):
+            term_freqs = chunk.get("term_freqs")
+            if term_freqs is None:
+                term_freqs = InvertedIndex.count_terms(chunk["text"])
+            postings.extend(InvertedIndex.build_postings(chatbot_id, chunk["source_id"], chunk["chunk_id"], term_freqs))
+        await self.inverted_index.add_postings(chatbot_id, postings)
+        
+        await self.inverted_index.set_chunk_count(
+            chatbot_id, await self.chunks_collection.count_documents({"chatbot_id": chatbot_id})
+        )
+        if (await self.get_retrieval_settings(chatbot_id)).get("ann_index"):
+            await self.rebuild_ann_index(chatbot_id)
+        
+        await self.refreshes_collection.delete_one({"_id": journal["_id"]})
+        self._invalidate_cache(chatbot_id)
+    
+    async def update_source_chunks(
+        self,
+        chatbot_id: str,
+        source_id: str,
+        chunks: List[Dict],
+        source_type: str = None,
+        filename: str = None,
+        embed: Optional[Callable[[List[str]], Awaitable[Optional[List[List[float]]]]]] = None
+    ) -> Dict:
+        """
+        Replace the stored chunks of a source with a new chunk sequence, writing
+        only what changed
+        
+        New chunks are matched to stored ones by content hash. Unchanged chunks
+        stay in place (their chunk_index is updated if it moved); only new
+        chunks are stored (and embedded) and only vanished ones are removed.
+        The changes go to MongoDB in one ordered bulk write, inserts before
+        deletes, so retrieval never sees the source partially empty.
+        
+        The writes are not atomic: a refresh that stops part-way can leave old
+        and new chunks side by side, with postings and the chunk count out of
+        step. The chunks a refresh touches are therefore recorded before
+        writing, and the next refresh (or deletion) of the source first
+        repairs them (see _repair_refresh); its diff then removes the leftover
+        old chunks.
+        
+        Args:
+            chatbot_id: Chatbot identifier
+            source_id: Source identifier
+            chunks: Complete new chunk sequence of the source
+            source_type: Type of source (file, website, text)
+            filename: Optional filename
+            embed: Optional coroutine embedding a list of texts (hybrid chatbots)
+            
+        Returns:
+            Dictionary with chunks added, kept, removed and deduplicated
+        """
+        try:
+            await self.ensure_text_index(chatbot_id)
+            await self._ensure_index_built(chatbot_id)
+            await self._repair_refresh(chatbot_id, source_id)
+            
+            for chunk in chunks:
+                chunk.setdefault("content_hash", self.content_hash(chunk["text"]))
+            
+            stored = await self.chunks_collection.find(
+                {"chatbot_id": chatbot_id, "$or": [{"source_id": source_id}, {"source_ids": source_id}]},
+                {"_id": 0, "chunk_id": 1, "source_id": 1, "source_ids": 1, "content_hash": 1, "text": 1, "chunk_index": 1}
+            ).to_list(length=None)
+            
+            # Chunks stored before deduplication have no hash or references yet
+            stored_by_hash = {}
+            vanished = []
+            for doc in stored:
+                doc["legacy"] = "source_ids" not in doc
+                doc.setdefault("source_ids", [doc["source_id"]])
+                content_hash = doc.get("content_hash") or self.content_hash(doc["text"])
+                if content_hash in stored_by_hash:
+                    vanished.append(doc)
+                else:
+                    stored_by_hash[content_hash] = doc
+            
+            operations = []
+            added = []
+            seen = set()
+            kept = 0
+            
+            for chunk in chunks:
+                content_hash = chunk["content_hash"]
+                if content_hash in seen:
+                    continue
+                seen.add(content_hash)
+                
+                doc = stored_by_hash.pop(content_hash, None)
+                if doc is None:
+                    added.append(chunk)
+                    continue
+                
+                kept += 1
+                changes = {}
+                if doc.get("content_hash") != content_hash:
+                    changes["content_hash"] = content_hash
+                if doc["legacy"]:
+                    changes["source_ids"] = doc["source_ids"]
+                if doc["source_id"] == source_id and doc.get("chunk_index") != chunk["chunk_index"]:
+                    changes["chunk_index"] = chunk["chunk_index"]
+                if changes:
+                    operations.append(UpdateOne(
+                        {"chatbot_id": chatbot_id, "chunk_id": doc["chunk_id"]},
+                        {"$set": changes}
+                    ))
+            
+            vanished.extend(stored_by_hash.values())
+            
+            # Chunks other sources of the chatbot already store are shared
+            added, dedup_stats = await self.deduplicate_chunks(chatbot_id, source_id, added)
+            
+            embeddings = None
+            if embed and added:
+                embeddings = await embed([chunk["text"] for chunk in added])
+            
+            # Ids carry the content hash so they never collide with kept chunks
+            for chunk in added:
+                chunk["chunk_id"] = f"{source_id}_chunk_{chunk['chunk_index']}_{chunk['content_hash'][:12]}"
+            documents, postings = self._build_chunk_documents(
+                chatbot_id, added, embeddings, source_id, source_type, filename
+            )
+            
+            releases, new_owners, removed_ids = self._plan_release(chatbot_id, source_id, vanished)
+            
+            ann_chunk_ids = []
+            if removed_ids and (await self.get_retrieval_settings(chatbot_id)).get("ann_index"):
+                ann_chunk_ids = [
+                    chunk["chunk_id"]
+                    async for chunk in self.chunks_collection.find(
+                        {"chatbot_id": chatbot_id, "chunk_id": {"$in": removed_ids}, "embedding": {"$exists": True}},
+                        {"_id": 0, "chunk_id": 1}
+                    )
+                ]
+            
+            touched_ids = (
+                [doc["chunk_id"] for doc in documents]
+                + removed_ids
+                + [chunk_id for chunk_ids in new_owners.values() for chunk_id in chunk_ids]
+            )
+            journal = {"chatbot_id": chatbot_id, "source_id": source_id}
+            if touched_ids:
+                await self.refreshes_collection.replace_one(
+                    journal, {**journal, "chunk_ids": touched_ids}, upsert=True
+                )
+            
+            # New postings first: a posting without its chunk is skipped by search
+            await self.inverted_index.add_postings(chatbot_id, postings)
+            
+            operations = [InsertOne(doc) for doc in documents] + operations + releases
+            if removed_ids:
+                operations.append(DeleteMany({"chatbot_id": chatbot_id, "chunk_id": {"$in": removed_ids}}))
+            if operations:
+                result = await self.chunks_collection.bulk_write(operations, ordered=True)
+                await self._update_chunk_count(chatbot_id, result.inserted_count - result.deleted_count)
+            
+            await self.inverted_index.remove_chunks(chatbot_id, removed_ids)
+            await self._transfer_postings(chatbot_id, new_owners)
+            
+            await self._remove_from_ann_index(chatbot_id, ann_chunk_ids)
+            if embeddings and len(embeddings) == len(documents):
+                await self.update_ann_index(
+                    chatbot_id,
+                    {doc["chunk_id"]: embedding for doc, embedding in zip(documents, embeddings)}
+                )
+            if touched_ids:
+                await self.refreshes_collection.delete_one(journal)
+            self._invalidate_cache(chatbot_id)
+            
+            logger.info(
+                f"Updated source {source_id}: {len(documents)} chunks added, {kept} kept, "
+                f"{len(removed_ids)} removed, {len(releases)} released"
+            )
+            
+            return {
+                "success": True,
+                "chunks_added": len(documents),
+                "chunks_kept": kept,
+                "chunks_removed": len(removed_ids),
+                "chunks_released": len(releases),
+                **dedup_stats
+            }
+            
+        except Exception as e:
+            logger.error(f"Error updating source chunks: {str(e)}")
+            raise Exception(f"Failed to update source chunks: {str(e)}")
+    
     async def delete_source(self, chatbot_id: str, source_id: str) -> Dict:
         """
         Delete all chunks associated with a source
         
+        Chunks that other sources also reference are kept for them.
+        
         Args:
             chatbot_id: Chatbot identifier
             source_id: Source identifier
@@ -340,6 +1680,20 @@ class VectorStore:
             Dictionary with deletion statistics
         """
         try:
+            await self._repair_refresh(chatbot_id, source_id)
+            shared_count = await self._release_shared_chunks(chatbot_id, source_id)
+            
+            # Remember embedded chunks so they can be dropped from the ANN index
+            ann_chunk_ids = []
+            if (await self.get_retrieval_settings(chatbot_id)).get("ann_index"):
+                ann_chunk_ids = [
+                    chunk["chunk_id"]
+                    async for chunk in self.chunks_collection.find(
+                        {"chatbot_id": chatbot_id, "source_id": source_id, "embedding": {"$exists": True}},
+                        {"_id": 0, "chunk_id": 1}
+                    )
+                ]
+            
             # Delete all chunks for this source
             result = await self.chunks_collection.delete_many({
                 "chatbot_id": chatbot_id,
@@ -348,14 +1702,19 @@ class VectorStore:
             
             deleted_count = result.deleted_count
             
-            # Get remaining count for this chatbot
-            total_count = await self.chunks_collection.count_documents({"chatbot_id": chatbot_id})
+            # Drop the source from the inverted index
+            await self.inverted_index.remove_source(chatbot_id, source_id)
+            await self._remove_from_ann_index(chatbot_id, ann_chunk_ids)
+            self._invalidate_cache(chatbot_id)
+            
+            total_count = await self._update_chunk_count(chatbot_id, -deleted_count)
             
-            logger.info(f"Deleted {deleted_count} chunks for source {source_id}")
+            logger.info(f"Deleted {deleted_count} chunks for source {source_id} ({shared_count} shared chunks kept)")
             
             return {
                 "success": True,
                 "chunks_deleted": deleted_count,
+                "shared_chunks_kept": shared_count,
                 "collection_size": total_count
             }
                 
@@ -375,6 +1734,12 @@ class VectorStore:
         """
         try:
             result = await self.chunks_collection.delete_many({"chatbot_id": chatbot_id})
+            await self.inverted_index.remove_chatbot(chatbot_id)
+            await self.refreshes_collection.delete_many({"chatbot_id": chatbot_id})
+            self._invalidate_cache(chatbot_id)
+            await self.ann_store.delete(chatbot_id)
+            corpus_cache.delete(f"{chatbot_id}:ann")
+            cache_service.delete(f"retrieval_settings:{chatbot_id}")
             logger.info(f"Deleted {result.deleted_count} chunks for chatbot {chatbot_id}")
             return True
             
@@ -385,7 +1750,7 @@ class VectorStore:
     async def get_collection_stats(self, chatbot_id: str) -> Dict:
         """Get statistics about a chatbot's chunks"""
         try:
-            total_chunks = await self.chunks_collection.count_documents({"chatbot_id": chatbot_id})
+            total_chunks = await self._update_chunk_count(chatbot_id, 0)
             
             return {
                 "total_chunks": total_chunks,
@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import logging
+import os
+import xml.etree.ElementTree as ElementTree
+from typing import Dict, List, Optional, Set
+from urllib.parse import urldefrag, urlparse
+
+import httpx
+
+from .ingestion_pool import ingestion_pool
+from .website_scraper import WebsiteScraper
+
+logger = logging.getLogger(__name__)
+
+
+# Links to these files are never crawled as pages
+SKIPPED_EXTENSIONS = (
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.exe', '.dmg', '.jpg', '.jpeg', '.png', '.gif',
+    '.svg', '.webp', '.ico', '.mp3', '.mp4', '.avi', '.mov', '.css', '.js', '.json', '.xml',
+    '.woff', '.woff2', '.ttf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'
+)
+
+
+class WebsiteCrawler:
+    """
+    Asynchronous multi-page website crawler
+
+    Pages are fetched over one shared, pooled httpx.AsyncClient with at most
+    per_host_limit requests in flight per host, and parsed on the ingestion
+    pool, so crawling never blocks the event loop. A crawl follows same-host
+    links breadth-first up to a depth and page budget, or takes its pages from
+    the site's sitemap.xml.
+
+    Re-crawls are conditional: given the pages of the previous crawl, each
+    page is requested with If-None-Match/If-Modified-Since, and a 304 or an
+    unchanged body hash reuses the previous text without parsing.
+    """
+
+    def __init__(
+        self,
+        max_pages: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        timeout: float = 30.0
+    ):
+        """
+        Initialize crawler limits (the HTTP client is created on first use)
+
+        Args:
+            max_pages: Default page budget of a crawl (RAG_CRAWL_MAX_PAGES, default 20)
+            max_depth: Default link depth from the start page (RAG_CRAWL_MAX_DEPTH, default 2)
+            per_host_limit: Concurrent requests per host (RAG_CRAWL_PER_HOST, default 4)
+            timeout: Request timeout in seconds
+        """
+        self.max_pages = max_pages or int(os.environ.get('RAG_CRAWL_MAX_PAGES', '20'))
+        self.max_depth = max_depth if max_depth is not None else int(os.environ.get('RAG_CRAWL_MAX_DEPTH', '2'))
+        self.per_host_limit = per_host_limit or int(os.environ.get('RAG_CRAWL_PER_HOST', '4'))
+        # Upper bound for budgets requested per source
+        self.page_limit = int(os.environ.get('RAG_CRAWL_PAGE_LIMIT', '500'))
+        self.max_connections = int(os.environ.get('RAG_CRAWL_MAX_CONNECTIONS', '50'))
+        self.timeout = timeout
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared client: connections are pooled and kept alive across crawls"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=WebsiteScraper.HEADERS,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    def _get_host_slots(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_slots[host]
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """
+        GET a URL through the shared client, within the host's concurrency limit
+
+        Args:
+            url: Absolute URL
+            headers: Extra request headers (e.g. conditional request headers)
+
+        Returns:
+            The response (raises for HTTP errors; 304 Not Modified is returned)
+        """
+        async with self._get_host_slots(urlparse(url).netloc):
+            response = await self._get_client().get(url, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    async def crawl(
+        self,
+        url: str,
+        max_pages: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        use_sitemap: bool = False,
+        previous_pages: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Crawl a website starting from a URL
+
+        Args:
+            url: Start page
+            max_pages: Most pages to fetch (default self.max_pages)
+            max_depth: Most links followed from the start page (default self.max_depth)
+            use_sitemap: Take the pages from the site's sitemap.xml when it has any
+            previous_pages: Pages of the previous crawl (with their text) to
+                request conditionally
+
+        Returns:
+            Pages with text, in crawl order; the start page comes first. Each
+            page is {"url", "text", "etag", "last_modified", "content_hash",
+            "depth", "unchanged"}
+        """
+        max_pages = min(max(1, max_pages or self.max_pages), self.page_limit)
+        max_depth = max(0, self.max_depth if max_depth is None else max_depth)
+        url = urldefrag(url)[0]
+        host = urlparse(url).netloc
+        previous = {page["url"]: page for page in previous_pages or []}
+
+        pages: List[Dict] = []
+        seen: Set[str] = {url}
+        frontier = [url]
+
+        if use_sitemap and max_pages > 1:
+            sitemap_urls = await self._read_sitemap(url, max_pages)
+            frontier += [link for link in sitemap_urls if link not in seen][:max_pages - 1]
+            seen.update(frontier)
+            # Sitemap pages are crawled as one level; their links are not followed
+            if len(frontier) > 1:
+                max_depth = 0
+
+        depth = 0
+        while frontier and len(pages) < max_pages:
+            level = frontier[:max_pages - len(pages)]
+            results = await asyncio.gather(*(self._crawl_page(link, previous.get(link)) for link in level))
+
+            frontier = []
+            found_unchanged = False
+            for link, page in zip(level, results):
+                if page is None:
+                    continue
+                links = page.pop("links")
+                if page["text"]:
+                    pages.append({"url": link, "depth": depth, **page})
+                found_unchanged = found_unchanged or page["unchanged"]
+                if depth >= max_depth:
+                    continue
+                for found in links:
+                    if found not in seen and self._is_crawlable(found, host):
+                        seen.add(found)
+                        frontier.append(found)
+
+            # Unchanged pages were not parsed, so their links are unknown: follow
+            # the pages the previous crawl found one level deeper instead
+            if found_unchanged and depth < max_depth:
+                for link, page in previous.items():
+                    if page.get("depth") == depth + 1 and link not in seen:
+                        seen.add(link)
+                        frontier.append(link)
+            depth += 1
+
+        if not pages:
+            raise Exception(f"No content extracted from {url}")
+
+        unchanged = sum(1 for page in pages if page["unchanged"])
+        logger.info(f"Crawled {len(pages)} pages from {url} ({unchanged} unchanged, {len(seen)} URLs discovered)")
+        return pages
+
+    async def _crawl_page(self, url: str, previous: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Fetch and parse one page, conditionally if it was crawled before
+
+        Returns:
+            {"text", "links", "etag", "last_modified", "content_hash", "unchanged"},
+            or None if the page is not HTML or fails
+        """
+        try:
+            headers = {}
+            if previous:
+                if previous.get("etag"):
+                    headers["If-None-Match"] = previous["etag"]
+                if previous.get("last_modified"):
+                    headers["If-Modified-Since"] = previous["last_modified"]
+
+            response = await self.fetch(url, headers)
+            page = {
+                "etag": response.headers.get("etag") or (previous or {}).get("etag"),
+                "last_modified": response.headers.get("last-modified") or (previous or {}).get("last_modified")
+            }
+
+            if response.status_code == 304:
+                if not previous:
+                    return None
+                return {**page, "text": previous["text"], "links": [], "content_hash": previous["content_hash"], "unchanged": True}
+
+            content_type = response.headers.get("content-type", "text/html")
+            if "html" not in content_type:
+                return None
+
+            content_hash = hashlib.sha256(response.content).hexdigest()
+            if previous and previous.get("content_hash") == content_hash:
+                return {**page, "text": previous["text"], "links": [], "content_hash": content_hash, "unchanged": True}
+
+            text, links = await ingestion_pool.extract_html(response.text, str(response.url))
+            return {**page, "text": text, "links": links, "content_hash": content_hash, "unchanged": False}
+        except Exception as e:
+            logger.warning(f"Skipping page {url}: {str(e)}")
+            return None
+
+    async def _read_sitemap(self, url: str, max_urls: int) -> List[str]:
+        """Same-host page URLs listed by the site's sitemap.xml (follows one level of sitemap index)"""
+        parsed = urlparse(url)
+        host = parsed.netloc
+        sitemaps = [f"{parsed.scheme}://{host}/sitemap.xml"]
+        urls: List[str] = []
+
+        while sitemaps and len(urls) < max_urls:
+            sitemap_url = sitemaps.pop(0)
+            try:
+                root = ElementTree.fromstring((await self.fetch(sitemap_url)).content)
+            except Exception as e:
+                logger.info(f"No usable sitemap at {sitemap_url}: {str(e)}")
+                continue
+
+            is_index = root.tag.endswith("sitemapindex")
+            for element in root.iter():
+                if not element.tag.endswith("loc") or not element.text:
+                    continue
+                link = urldefrag(element.text.strip())[0]
+                if urlparse(link).netloc != host:
+                    continue
+                if is_index:
+                    if sitemap_url == f"{parsed.scheme}://{host}/sitemap.xml":
+                        sitemaps.append(link)
+                elif self._is_crawlable(link, host):
+                    urls.append(link)
+
+        return urls[:max_urls]
+
+    @staticmethod
+    def _is_crawlable(url: str, host: str) -> bool:
+        """Whether a link is an http(s) page on the crawled host"""
+        parsed = urlparse(url)
+        return (
+            parsed.scheme in ("http", "https")
+            and parsed.netloc == host
+            and not parsed.path.lower().endswith(SKIPPED_EXTENSIONS)
+        )
+
+    async def close(self):
+        """Close the shared HTTP client and its pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+website_crawler = WebsiteCrawler()
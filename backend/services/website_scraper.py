@@ -1,6 +1,6 @@
 import requests
-from bs4 import BeautifulSoup
-from typing import Optional
+from typing import List, Tuple
+from .html_extractor import get_html_extractor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,6 +9,11 @@ logger = logging.getLogger(__name__)
 class WebsiteScraper:
     """Scrape and extract text content from websites"""
     
+    # Add headers to avoid being blocked
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    
     @staticmethod
     def scrape_url(url: str, timeout: int = 30) -> str:
         """
@@ -22,28 +27,10 @@ class WebsiteScraper:
             Extracted text content
         """
         try:
-            # Add headers to avoid being blocked
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=timeout)
+            response = requests.get(url, headers=WebsiteScraper.HEADERS, timeout=timeout)
             response.raise_for_status()
             
-            # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "header", "footer"]):
-                script.decompose()
-            
-            # Get text
-            text = soup.get_text(separator='\n', strip=True)
-            
-            # Clean up extra whitespace
-            lines = [line.strip() for line in text.splitlines()]
-            lines = [line for line in lines if line]
-            text = '\n'.join(lines)
+            text = WebsiteScraper.extract_text(response.content)
             
             if not text:
                 raise Exception("No content extracted from URL")
@@ -57,6 +44,33 @@ class WebsiteScraper:
             logger.error(f"Error processing website content: {str(e)}")
             raise Exception(f"Failed to process website content: {str(e)}")
     
+    @staticmethod
+    def extract_text(html) -> str:
+        """
+        Extract readable text from an HTML document
+        
+        Args:
+            html: HTML as bytes or str
+            
+        Returns:
+            Text with one line per block and empty lines removed
+        """
+        return get_html_extractor().extract_text(html)
+    
+    @staticmethod
+    def extract_page(html: str, base_url: str) -> Tuple[str, List[str]]:
+        """
+        Extract the text and outgoing links of a crawled page
+        
+        Args:
+            html: HTML document
+            base_url: URL the page was fetched from (resolves relative links)
+            
+        Returns:
+            (text, links): links are absolute http(s) URLs without fragments
+        """
+        return get_html_extractor().extract_page(html, base_url)
+    
     @staticmethod
     def validate_url(url: str) -> bool:
         """Validate if URL is accessible"""
@@ -5,11 +5,21 @@ from typing import Dict, Any, Optional
 import logging
 import hashlib
 import json
-import redis
+import os
+import sys
 import time
+import redis
 
 logger = logging.getLogger(__name__)
 
+# Workers import this module as backend.tasks, while the services import each
+# other (and models) as top-level modules, as they do under the API server
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Prefork worker processes are daemonic and cannot start an ingestion process
+# pool; the workers themselves are the unit of parallelism
+os.environ.setdefault('RAG_INGEST_WORKERS', '0')
+
 # Initialize Redis client for task deduplication
 redis_client = redis.Redis.from_url(
     celery_app.conf.broker_url,
@@ -21,8 +31,23 @@ class IdempotentTask(Task):
     """
     Base task class with idempotency support
     Prevents duplicate task execution using Redis locks
+    
+    A duplicate of a task that is still running is re-scheduled with a
+    countdown instead of waiting for the result, so it holds no worker slot.
+    Duplicates are deferred for as long as the running task may hold its lock
+    (task_time_limit plus a margin) and then pick up the task's recorded
+    outcome, failures included, rather than running it again.
     """
     
+    # Seconds before a deferred duplicate first checks again for the running
+    # task's result; the delay doubles on every deferral up to the maximum
+    duplicate_retry_delay = 5
+    duplicate_max_retry_delay = 60
+    # The lock outlives the hard time limit, so it expires soon after a killed task
+    lock_timeout = celery_app.conf.task_time_limit + 60
+    # Outcomes recorded for duplicates (a retry raises instead of returning)
+    recorded_statuses = ('success', 'failed')
+    
     def generate_task_id(self, *args, **kwargs):
         """Generate unique task ID based on task name and arguments"""
         task_data = {
@@ -41,14 +66,14 @@ class IdempotentTask(Task):
         """Get Redis result key for task"""
         return f"task_result:{self.name}:{task_id}"
     
-    def acquire_lock(self, task_id: str, timeout: int = 3600) -> bool:
+    def acquire_lock(self, task_id: str, timeout: Optional[int] = None) -> bool:
         """
         Acquire distributed lock for task execution
         Returns True if lock acquired, False if task already running
         """
         lock_key = self.get_lock_key(task_id)
         # Use SET NX EX for atomic lock acquisition
-        return redis_client.set(lock_key, '1', nx=True, ex=timeout)
+        return redis_client.set(lock_key, '1', nx=True, ex=timeout or self.lock_timeout)
     
     def release_lock(self, task_id: str):
         """Release distributed lock"""
@@ -69,50 +94,94 @@ class IdempotentTask(Task):
     def cache_result(self, task_id: str, result: Dict[str, Any], ttl: int = 3600):
         """Cache task result for deduplication"""
         result_key = self.get_result_key(task_id)
-        redis_client.setex(result_key, ttl, json.dumps(result))
+        redis_client.set(result_key, json.dumps(result), ex=ttl)
+    
+    def get_deferral_key(self, task_id: str) -> str:
+        """Get Redis key tracking deferred duplicates of a task"""
+        return f"task_deferrals:{self.name}:{task_id}"
+    
+    def defer_duplicate(self, task_id: str, args: tuple, kwargs: dict) -> Optional[int]:
+        """
+        Re-schedule a duplicate of a running task to check for its result later
+        
+        Returns:
+            Countdown of the re-scheduled duplicate, or None once duplicates
+            were deferred for longer than the running task can hold its lock
+        """
+        deferral_key = self.get_deferral_key(task_id)
+        now = time.time()
+        redis_client.hsetnx(deferral_key, 'since', now)
+        deferrals = redis_client.hincrby(deferral_key, 'count', 1)
+        redis_client.expire(deferral_key, self.lock_timeout * 2)
+        
+        waited = now - float(redis_client.hget(deferral_key, 'since') or now)
+        if waited > self.lock_timeout:
+            return None
+        
+        countdown = min(self.duplicate_retry_delay * 2 ** (deferrals - 1), self.duplicate_max_retry_delay)
+        self.apply_async(args=args, kwargs=kwargs, countdown=countdown)
+        return countdown
+    
+    def drop_duplicate(self, task_id: str) -> Dict[str, Any]:
+        """Record that a duplicate gave up waiting for the running task"""
+        deferral_key = self.get_deferral_key(task_id)
+        deferrals = redis_client.hgetall(deferral_key)
+        since = float(deferrals.get('since') or time.time())
+        outcome = {
+            'status': 'skipped',
+            'reason': 'duplicate_timeout',
+            'message': 'Task still running after its lock timeout, duplicate dropped',
+            'deferrals': int(deferrals.get('count') or 0),
+            'waited_seconds': round(time.time() - since)
+        }
+        redis_client.set(f"task_dropped:{self.name}:{task_id}", json.dumps(outcome), ex=self.lock_timeout * 2)
+        return outcome
     
     def __call__(self, *args, **kwargs):
         """Override to add idempotency check"""
         # Generate unique task ID
         task_id = self.generate_task_id(*args, **kwargs)
         
-        # Check if result already cached (task completed recently)
+        # Check if result already cached (task finished recently)
         cached_result = self.get_cached_result(task_id)
         if cached_result:
-            logger.info(f"Task {self.name} with ID {task_id} already completed, returning cached result")
+            logger.info(f"Task {self.name} with ID {task_id} already finished, returning cached result")
             return cached_result
         
         # Try to acquire lock
         if not self.acquire_lock(task_id):
-            logger.warning(f"Task {self.name} with ID {task_id} already running, skipping duplicate execution")
-            # Wait and check for result
-            max_wait = 30  # Wait max 30 seconds
-            waited = 0
-            while waited < max_wait:
-                time.sleep(2)
-                waited += 2
-                cached_result = self.get_cached_result(task_id)
-                if cached_result:
-                    return cached_result
+            # Check again later (the cached result is returned then) instead of
+            # holding this worker slot while the original runs
+            countdown = self.defer_duplicate(task_id, args, kwargs)
+            if countdown is not None:
+                logger.info(f"Task {self.name} with ID {task_id} already running, duplicate re-scheduled in {countdown}s")
+                return {
+                    'status': 'deferred',
+                    'reason': 'duplicate_task',
+                    'message': 'Task already running, duplicate re-scheduled'
+                }
             
-            return {
-                'status': 'skipped',
-                'reason': 'duplicate_task',
-                'message': 'Task already running or completed'
-            }
+            outcome = self.drop_duplicate(task_id)
+            logger.error(
+                f"Task {self.name} with ID {task_id} still running after {outcome['waited_seconds']}s "
+                f"({outcome['deferrals']} deferrals), dropping duplicate"
+            )
+            return outcome
         
         try:
             # Execute task
             result = super().__call__(*args, **kwargs)
             
-            # Cache successful result
-            if result and isinstance(result, dict) and result.get('status') == 'success':
+            # Record the outcome, so duplicates deferred meanwhile return it
+            # instead of running the task again
+            if isinstance(result, dict) and result.get('status') in self.recorded_statuses:
                 self.cache_result(task_id, result)
             
             return result
         finally:
             # Always release lock
             self.release_lock(task_id)
+            redis_client.delete(self.get_deferral_key(task_id))
 
 
 class AsyncTask(Task):
@@ -130,84 +199,95 @@ class AsyncTask(Task):
         return await self.run(*args, **kwargs)
 
 
+# Event loop of this worker process, reused across tasks so the Motor clients
+# of the ingestion service stay bound to one loop
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_ingestion_service = None
+
+
+def run_async(coro):
+    """Run a coroutine to completion on this worker process's event loop"""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+
+def get_ingestion_service():
+    """Source ingestion service of this worker process (the same pipeline the API runs)"""
+    global _ingestion_service
+    if _ingestion_service is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from services.source_ingestion import SourceIngestionService
+        
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        _ingestion_service = SourceIngestionService(client[os.environ.get('DB_NAME', 'chatbase_db')])
+    return _ingestion_service
+
+
 @celery_app.task(name='backend.tasks.process_document', bind=True, base=IdempotentTask, max_retries=3, default_retry_delay=60)
-def process_document(self, source_id: str, file_path: str, chatbot_id: str) -> Dict[str, Any]:
+def process_document(
+    self,
+    source_id: str,
+    chatbot_id: str,
+    filename: str,
+    file_id: str,
+    content_hash: str,
+    job_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Background task to process uploaded documents
+    Background task to ingest an uploaded document into document_chunks
     
     Args:
         source_id: Source document ID
-        file_path: Path to uploaded file
         chatbot_id: Associated chatbot ID
+        filename: Uploaded file name (its extension selects the parser)
+        file_id: GridFS id of the staged upload (bucket source_uploads)
+        content_hash: SHA-256 of the upload (duplicate detection)
+        job_id: Bulk ingestion job counting the outcome
     
     Returns:
         Dict with processing results
     """
+    async def ingest() -> bool:
+        service = get_ingestion_service()
+        file_content = await service.load_upload(file_id)
+        succeeded = await service.ingest_file(chatbot_id, source_id, filename, file_content, content_hash)
+        if job_id:
+            await service.record_job_progress(job_id, succeeded)
+        await service.delete_upload(file_id)
+        return succeeded
+    
+    async def give_up(error: str):
+        service = get_ingestion_service()
+        await service.mark_failed(source_id, error)
+        if job_id:
+            await service.record_job_progress(job_id, False)
+        await service.delete_upload(file_id)
+    
     try:
         logger.info(f"Processing document: {source_id}")
+        succeeded = run_async(ingest())
         
-        # Import here to avoid circular imports
-        from services.document_processor import DocumentProcessor
-        from services.chunking_service import ChunkingService
-        from models import get_database
-        
-        # Get database
-        db = get_database()
-        
-        # Process the document
-        processor = DocumentProcessor()
-        text_content = processor.process_file(file_path)
-        
-        # Chunk the content
-        chunking_service = ChunkingService()
-        chunks = chunking_service.chunk_text(text_content)
-        
-        # Store chunks in database
-        chunk_docs = []
-        for i, chunk in enumerate(chunks):
-            chunk_doc = {
-                'chatbot_id': chatbot_id,
-                'source_id': source_id,
-                'content': chunk,
-                'chunk_index': i,
-                'metadata': {'total_chunks': len(chunks)}
-            }
-            chunk_docs.append(chunk_doc)
-        
-        if chunk_docs:
-            db.chunks.insert_many(chunk_docs)
-        
-        # Update source status
-        db.sources.update_one(
-            {'_id': source_id},
-            {'$set': {'status': 'completed', 'chunk_count': len(chunks)}}
-        )
-        
-        logger.info(f"Document processed successfully: {source_id} ({len(chunks)} chunks)")
+        logger.info(f"Document processed: {source_id} ({'completed' if succeeded else 'failed'})")
         return {
-            'status': 'success',
-            'source_id': source_id,
-            'chunks_created': len(chunks)
+            'status': 'success' if succeeded else 'failed',
+            'source_id': source_id
         }
         
     except Exception as e:
         logger.error(f"Error processing document {source_id}: {str(e)}")
-        # Update source with error status
-        try:
-            from models import get_database
-            db = get_database()
-            db.sources.update_one(
-                {'_id': source_id},
-                {'$set': {'status': 'failed', 'error': str(e)}}
-            )
-        except:
-            pass
         
         # Retry with exponential backoff
         try:
             raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
         except self.MaxRetriesExceededError:
             logger.error(f"Max retries exceeded for document {source_id}")
+            try:
+                run_async(give_up(str(e)))
+            except Exception as cleanup_error:
+                logger.error(f"Error marking document {source_id} as failed: {str(cleanup_error)}")
             return {
                 'status': 'failed',
                 'source_id': source_id,
@@ -216,88 +296,53 @@ def process_document(self, source_id: str, file_path: str, chatbot_id: str) -> D
 
 
 @celery_app.task(name='backend.tasks.scrape_website', bind=True, base=IdempotentTask, max_retries=3, default_retry_delay=60)
-def scrape_website(self, source_id: str, url: str, chatbot_id: str) -> Dict[str, Any]:
+def scrape_website(self, source_id: str, chatbot_id: str) -> Dict[str, Any]:
     """
-    Background task to scrape website content
+    Background task to crawl a website source into document_chunks
     
     Args:
-        source_id: Source ID
-        url: Website URL to scrape
+        source_id: Source ID (the URL and crawl budget are read from the source)
         chatbot_id: Associated chatbot ID
     
     Returns:
         Dict with scraping results
     """
+    async def ingest() -> Optional[bool]:
+        service = get_ingestion_service()
+        source = await service.db.sources.find_one({"id": source_id}, {"_id": 0})
+        if not source:
+            return None
+        return await service.ingest_website(chatbot_id, source)
+    
     try:
-        logger.info(f"Scraping website: {url}")
+        logger.info(f"Scraping website source: {source_id}")
+        succeeded = run_async(ingest())
         
-        # Import here to avoid circular imports
-        from services.website_scraper import WebsiteScraper
-        from services.chunking_service import ChunkingService
-        from models import get_database
+        if succeeded is None:
+            logger.warning(f"Website source {source_id} no longer exists")
+            return {'status': 'skipped', 'source_id': source_id, 'reason': 'source_deleted'}
         
-        # Get database
-        db = get_database()
-        
-        # Scrape the website
-        scraper = WebsiteScraper()
-        content = scraper.scrape(url)
-        
-        # Chunk the content
-        chunking_service = ChunkingService()
-        chunks = chunking_service.chunk_text(content)
-        
-        # Store chunks in database
-        chunk_docs = []
-        for i, chunk in enumerate(chunks):
-            chunk_doc = {
-                'chatbot_id': chatbot_id,
-                'source_id': source_id,
-                'content': chunk,
-                'chunk_index': i,
-                'metadata': {'url': url, 'total_chunks': len(chunks)}
-            }
-            chunk_docs.append(chunk_doc)
-        
-        if chunk_docs:
-            db.chunks.insert_many(chunk_docs)
-        
-        # Update source status
-        db.sources.update_one(
-            {'_id': source_id},
-            {'$set': {'status': 'completed', 'chunk_count': len(chunks)}}
-        )
-        
-        logger.info(f"Website scraped successfully: {url} ({len(chunks)} chunks)")
+        logger.info(f"Website source processed: {source_id} ({'completed' if succeeded else 'failed'})")
         return {
-            'status': 'success',
-            'source_id': source_id,
-            'url': url,
-            'chunks_created': len(chunks)
+            'status': 'success' if succeeded else 'failed',
+            'source_id': source_id
         }
         
     except Exception as e:
-        logger.error(f"Error scraping website {url}: {str(e)}")
-        # Update source with error status
-        try:
-            from models import get_database
-            db = get_database()
-            db.sources.update_one(
-                {'_id': source_id},
-                {'$set': {'status': 'failed', 'error': str(e)}}
-            )
-        except:
-            pass
+        logger.error(f"Error scraping website source {source_id}: {str(e)}")
         
         # Retry with exponential backoff
         try:
             raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
         except self.MaxRetriesExceededError:
-            logger.error(f"Max retries exceeded for website {url}")
+            logger.error(f"Max retries exceeded for website source {source_id}")
+            try:
+                run_async(get_ingestion_service().mark_failed(source_id, str(e)))
+            except Exception as cleanup_error:
+                logger.error(f"Error marking website source {source_id} as failed: {str(cleanup_error)}")
             return {
                 'status': 'failed',
                 'source_id': source_id,
-                'url': url,
                 'error': str(e)
             }
 
@@ -0,0 +1,53 @@
+"""Fire-and-forget background work started from request handlers
+
+asyncio only keeps weak references to tasks, so a task nobody holds can be
+garbage-collected before it finishes, and an exception it raises is never
+retrieved. Tasks started here are referenced until they finish and their
+failures are logged (and optionally handled).
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Coroutine, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def spawn(
+    coro: Coroutine,
+    name: str,
+    on_error: Optional[Callable[[BaseException], Awaitable]] = None
+) -> asyncio.Task:
+    """
+    Run a coroutine in the background, keeping a reference until it finishes
+
+    Args:
+        coro: Coroutine to run
+        name: Task name used in logs
+        on_error: Coroutine function called with the exception if the task fails
+
+    Returns:
+        The started task
+    """
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+
+    def finished(task: asyncio.Task):
+        _tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            return
+        logger.error(f"Background task {name} failed: {error!r}", exc_info=error)
+        if on_error is not None:
+            spawn(on_error(error), f"{name}:on_error")
+
+    task.add_done_callback(finished)
+    return task
+
+
+def pending() -> int:
+    """Number of background tasks still running"""
+    return len(_tasks)
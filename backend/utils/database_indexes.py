@@ -3,13 +3,62 @@
 This module creates indexes on frequently queried fields to ensure
 fast response times even with 1000+ concurrent users.
 """
+import asyncio
 import logging
+from typing import Awaitable, Callable, Dict, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pymongo import ASCENDING, DESCENDING, TEXT
 
 logger = logging.getLogger(__name__)
 
 
+class IndexRegistry:
+    """Process-wide registry of index bootstraps owned by services
+    
+    Services that manage their own collections (e.g. the vector store's
+    document_chunks) register a coroutine creating their indexes. Each
+    bootstrap runs once per process - at startup, next to
+    create_performance_indexes - so request paths never issue
+    create_index commands.
+    """
+    
+    def __init__(self):
+        self._bootstraps: Dict[str, Callable[[], Awaitable]] = {}
+        self._ready: set = set()
+        self._lock: Optional[asyncio.Lock] = None
+    
+    def register(self, name: str, bootstrap: Callable[[], Awaitable]):
+        """Register the coroutine function creating a service's indexes"""
+        self._bootstraps.setdefault(name, bootstrap)
+    
+    def is_ready(self, name: str) -> bool:
+        """Whether a bootstrap has already run in this process"""
+        return name in self._ready
+    
+    async def ensure(self, name: Optional[str] = None):
+        """Run pending bootstraps (only `name` if given); a no-op once they ran"""
+        names = [name] if name else list(self._bootstraps)
+        if all(n in self._ready for n in names):
+            return
+        
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for n in names:
+                if n in self._ready or n not in self._bootstraps:
+                    continue
+                try:
+                    await self._bootstraps[n]()
+                    logger.info(f"✅ Index bootstrap '{n}' completed")
+                except Exception as e:
+                    # Don't retry on every request - indexes might already exist
+                    logger.warning(f"Index bootstrap '{n}' failed: {e}")
+                self._ready.add(n)
+
+
+index_registry = IndexRegistry()
+
+
 async def create_performance_indexes(db: AsyncIOMotorDatabase):
     """Create database indexes for optimal performance
     
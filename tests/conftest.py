@@ -0,0 +1,155 @@
+"""
+Shared fixtures for the RAG pipeline tests
+
+The services run against an in-memory MongoDB (mongomock_motor), the local
+hashing embedder and a thread-backed ingestion pool, so the tests need no
+database server, API key or network access.
+"""
+import os
+import re
+import sys
+
+import bson
+import mongomock.collection
+import pytest
+import tiktoken
+from bson.raw_bson import RawBSONDocument
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("RAG_EMBEDDING_PROVIDER", "local")
+os.environ.setdefault("RAG_INGEST_WORKERS", "0")
+
+
+class WordTokenizer:
+    """Offline stand-in for the cl100k_base encoding: one token per word or whitespace run"""
+
+    _TOKEN_RE = re.compile(r"\s+|\S+")
+
+    def __init__(self):
+        self.ids = {}
+        self.tokens = []
+
+    def _token_id(self, token):
+        if token not in self.ids:
+            self.ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return self.ids[token]
+
+    def encode(self, text, **kwargs):
+        return [self._token_id(token) for token in self._TOKEN_RE.findall(text)]
+
+    def encode_ordinary(self, text):
+        return self.encode(text)
+
+    def encode_ordinary_batch(self, texts, **kwargs):
+        return [self.encode(text) for text in texts]
+
+    def decode(self, ids):
+        return "".join(self.tokens[i] for i in ids)
+
+    def decode_tokens_bytes(self, ids):
+        return [self.tokens[i].encode("utf-8") for i in ids]
+
+
+# The BPE files are downloaded on first use; without network access chunking
+# runs on word tokens instead
+try:
+    tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _tokenizer = WordTokenizer()
+    tiktoken.get_encoding = lambda name: _tokenizer
+
+from services import vector_store as vector_store_module  # noqa: E402
+from services.cache_service import cache_service, corpus_cache, query_cache  # noqa: E402
+from services.dense_index import IVFIndex  # noqa: E402
+from services.ingestion_pool import IngestionPool  # noqa: E402
+from services.rag_service import RAGService  # noqa: E402
+from services.vector_store import VectorStore  # noqa: E402
+
+
+class MemoryAnnIndexStore:
+    """AnnIndexStore keeping serialized indexes in a dict instead of GridFS"""
+
+    def __init__(self, db):
+        self.indexes = {}
+
+    async def get_revision(self, chatbot_id):
+        return self.indexes[chatbot_id][0] if chatbot_id in self.indexes else 0
+
+    async def load(self, chatbot_id):
+        if chatbot_id not in self.indexes:
+            return None
+        revision, data = self.indexes[chatbot_id]
+        return IVFIndex.from_bytes(data, revision)
+
+    async def save(self, chatbot_id, index):
+        revision = max(index.revision, await self.get_revision(chatbot_id)) + 1
+        self.indexes[chatbot_id] = (revision, index.to_bytes())
+        index.revision = revision
+        return revision
+
+    async def delete(self, chatbot_id):
+        self.indexes.pop(chatbot_id, None)
+
+
+class RawBSONCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def to_list(self, length=None):
+        return [RawBSONDocument(bson.encode(doc)) for doc in await self._cursor.to_list(length)]
+
+
+class RawBSONCollection:
+    """Read-only view of a collection returning RawBSONDocument (unsupported by mongomock)"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return RawBSONCursor(self._collection.find(*args, **kwargs))
+
+
+@pytest.fixture(autouse=True)
+def offline_services(monkeypatch):
+    """Point the services at in-memory backends and start every test with empty caches"""
+    monkeypatch.setattr(vector_store_module, "AsyncIOMotorClient", lambda url: AsyncMongoMockClient())
+    monkeypatch.setattr(vector_store_module, "AnnIndexStore", MemoryAnnIndexStore)
+    # The raw chunk view is replaced by RawBSONCollection once the store exists
+    monkeypatch.setattr(mongomock.collection.Collection, "with_options", lambda self, **kwargs: self)
+
+    for cache in (cache_service, corpus_cache, query_cache):
+        cache.clear()
+    yield
+    for cache in (cache_service, corpus_cache, query_cache):
+        cache.clear()
+
+
+def make_vector_store() -> VectorStore:
+    store = VectorStore()
+    store.raw_chunks_collection = RawBSONCollection(store.chunks_collection)
+    return store
+
+
+@pytest.fixture
+def vector_store():
+    return make_vector_store()
+
+
+@pytest.fixture
+def ingestion_pool():
+    # The pool's task slots belong to one event loop, so every test gets its own pool
+    pool = IngestionPool(max_workers=0)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def rag_service(ingestion_pool):
+    service = RAGService()
+    service.vector_store = make_vector_store()
+    service.ingestion_pool = ingestion_pool
+    return service
@@ -0,0 +1,117 @@
+import asyncio
+import math
+
+import numpy as np
+import pytest
+
+from services.bm25_scorer import CorpusIndex, SparseTermMatrix, bm25_idf
+from services.inverted_index import InvertedIndex, tokenize
+
+DOCUMENTS = {
+    "pricing": "Pricing starts at ten dollars per month for the starter plan.",
+    "refunds": "Refunds are issued within thirty days. Refunds go back to the original card.",
+    "support": "Contact support by email for help with integrations and billing.",
+    "billing": "Billing happens monthly; invoices list every plan and every refund.",
+}
+
+
+def reference_bm25(query_terms, documents, k1=1.5, b=0.75):
+    """Textbook BM25 over tokenized documents"""
+    tokenized = {chunk_id: tokenize(text) for chunk_id, text in documents.items()}
+    avg_length = sum(len(terms) for terms in tokenized.values()) / len(tokenized)
+    scores = {}
+    for chunk_id, terms in tokenized.items():
+        score = 0.0
+        for term in query_terms:
+            tf = terms.count(term)
+            if not tf:
+                continue
+            df = sum(1 for other in tokenized.values() if term in other)
+            idf = math.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(terms) / avg_length))
+        scores[chunk_id] = score
+    return scores
+
+
+def build_corpus():
+    chunk_ids = list(DOCUMENTS)
+    return CorpusIndex.from_term_counts(
+        chunk_ids, [InvertedIndex.count_terms(DOCUMENTS[chunk_id]) for chunk_id in chunk_ids], version=1
+    )
+
+
+def test_idf_is_positive_and_decreases_with_document_frequency():
+    idf = bm25_idf(np.array([1, 2, 4]), total_docs=4)
+    assert (idf > 0).all()
+    assert idf[0] > idf[1] > idf[2]
+
+
+def test_corpus_index_matches_reference_bm25():
+    corpus = build_corpus()
+    query_terms = tokenize("refund refunds billing")
+
+    results = corpus.search(query_terms, top_k=len(DOCUMENTS))
+    expected = reference_bm25(query_terms, DOCUMENTS)
+
+    assert [chunk_id for _, chunk_id in results] == sorted(
+        (chunk_id for chunk_id, score in expected.items() if score > 0),
+        key=lambda chunk_id: -expected[chunk_id]
+    )
+    for score, chunk_id in results:
+        assert score == pytest.approx(expected[chunk_id], rel=1e-5)
+
+
+def test_postings_and_term_count_matrices_score_alike():
+    term_counts = {chunk_id: InvertedIndex.count_terms(text) for chunk_id, text in DOCUMENTS.items()}
+    postings = {}
+    for chunk_id, counts in term_counts.items():
+        for posting in InvertedIndex.build_postings("bot", "src", chunk_id, counts):
+            postings.setdefault(posting["term"], []).append(posting)
+
+    from_postings = SparseTermMatrix.from_postings(postings)
+    from_counts = SparseTermMatrix.from_term_counts(list(term_counts), list(term_counts.values()))
+    weights = {"refunds": 1.2, "billing": 0.7}
+    avg_length = float(from_counts.doc_lengths.mean())
+
+    by_postings = dict(zip(from_postings.chunk_ids, from_postings.bm25_scores(weights, avg_length)))
+    by_counts = dict(zip(from_counts.chunk_ids, from_counts.bm25_scores(weights, avg_length)))
+    for chunk_id, score in by_postings.items():
+        assert score == pytest.approx(by_counts[chunk_id])
+
+
+def test_batch_search_matches_single_queries():
+    corpus = build_corpus()
+    queries = [tokenize("refunds"), tokenize("billing plan"), tokenize("unknown words")]
+
+    batch = corpus.search_batch(queries, top_k=3)
+
+    assert len(batch) == len(queries)
+    for query_terms, results in zip(queries, batch):
+        single = corpus.search(query_terms, top_k=3)
+        assert [chunk_id for _, chunk_id in results] == [chunk_id for _, chunk_id in single]
+        assert [score for score, _ in results] == pytest.approx([score for score, _ in single])
+    assert batch[2] == []
+
+
+@pytest.mark.parametrize("hot_corpus_max_chunks", [5000, 0])
+def test_vector_store_ranks_with_bm25(vector_store, hot_corpus_max_chunks):
+    # 0 disables the in-memory corpus, so the postings collection is scored instead
+    vector_store.hot_corpus_max_chunks = hot_corpus_max_chunks
+
+    async def scenario():
+        await vector_store.add_chunks(
+            "bot", [{"text": text} for text in DOCUMENTS.values()], source_id="s1", source_type="text"
+        )
+        stats = await vector_store.inverted_index.get_stats("bot")
+        matches = await vector_store.search("bot", query="Refunds for the billing plan?", top_k=3)
+        return stats, matches
+
+    stats, matches = asyncio.run(scenario())
+
+    expected = reference_bm25(tokenize("Refunds for the billing plan?"), DOCUMENTS)
+    ranked = sorted((chunk_id for chunk_id in expected if expected[chunk_id] > 0), key=lambda c: -expected[c])[:3]
+    assert stats["total_docs"] == len(DOCUMENTS)
+    assert [match["text"] for match in matches] == [DOCUMENTS[chunk_id] for chunk_id in ranked]
+    assert matches[0]["similarity"] == 1.0
+    assert matches[1]["similarity"] == pytest.approx(expected[ranked[1]] / expected[ranked[0]], abs=1e-4)
+    assert all(match["metadata"]["source_id"] == "s1" for match in matches)
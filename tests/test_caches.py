@@ -0,0 +1,131 @@
+import asyncio
+
+from services.cache_service import LRUCache, corpus_cache
+
+
+def count_calls(monkeypatch, target, name):
+    """Wrap an async method, counting its calls"""
+    calls = []
+    original = getattr(target, name)
+
+    async def wrapper(*args, **kwargs):
+        calls.append(args)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(target, name, wrapper)
+    return calls
+
+
+def test_lru_cache_evicts_least_recently_used_within_budget():
+    cache = LRUCache(max_bytes=100)
+    cache.set("a", "A", 40)
+    cache.set("b", "B", 40)
+    cache.get("a")
+    cache.set("c", "C", 40)
+
+    assert cache.peek("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.current_bytes == 80
+    assert not cache.set("huge", "H", 101)
+
+
+def test_lru_cache_deletes_by_prefix_and_expires():
+    cache = LRUCache(max_bytes=100, ttl_seconds=0)
+    cache.set("bot:1", 1, 1)
+    cache.set("bot:2", 2, 1)
+    cache.set("other:1", 3, 1)
+
+    assert cache.delete_prefix("bot:") == 2
+    assert cache.peek("other:1") == 3
+    assert cache.get("other:1") is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_corpus_cache_serves_searches_until_the_corpus_changes(vector_store, monkeypatch):
+    loads = count_calls(monkeypatch, vector_store, "_load_corpus")
+
+    async def scenario():
+        await vector_store.add_chunks("bot", [{"text": "Refunds are issued within thirty days"}], source_id="s1")
+        first = await vector_store.search("bot", query="refunds", top_k=3)
+        second = await vector_store.search("bot", query="refunds", top_k=3)
+        cached_version = corpus_cache.peek("bot").version
+
+        await vector_store.add_chunks("bot", [{"text": "Refunds need the original receipt"}], source_id="s2")
+        third = await vector_store.search("bot", query="refunds", top_k=3)
+        return first, second, third, cached_version
+
+    first, second, third, cached_version = asyncio.run(scenario())
+
+    assert first == second and len(first) == 1
+    assert len(third) == 2
+    assert len(loads) == 2
+    assert corpus_cache.peek("bot").version > cached_version
+
+
+def test_large_corpora_are_not_cached(vector_store):
+    vector_store.hot_corpus_max_chunks = 1
+
+    async def scenario():
+        await vector_store.add_chunks(
+            "bot", [{"text": "Refunds within thirty days"}, {"text": "Refunds need a receipt"}], source_id="s1"
+        )
+        return await vector_store.search("bot", query="refunds", top_k=3)
+
+    assert len(asyncio.run(scenario())) == 2
+    assert corpus_cache.peek("bot") is None
+
+
+def test_query_cache_answers_repeated_questions(rag_service, monkeypatch):
+    searches = count_calls(monkeypatch, rag_service.vector_store, "search")
+
+    async def scenario():
+        await rag_service.process_document("Refunds are issued within thirty days.", "bot", "s1", "text")
+        first = await rag_service.retrieve_relevant_context("How do refunds work?", "bot")
+        # Case, spacing and trailing punctuation do not matter
+        second = await rag_service.retrieve_relevant_context("how do  REFUNDS work", "bot")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == second
+    assert "Refunds are issued" in first["context"]
+    assert len(searches) == 1
+
+
+def test_query_cache_is_invalidated_by_new_content(rag_service, monkeypatch):
+    searches = count_calls(monkeypatch, rag_service.vector_store, "search")
+
+    async def scenario():
+        await rag_service.process_document("Refunds are issued within thirty days.", "bot", "s1", "text")
+        before = await rag_service.retrieve_relevant_context("refunds receipt", "bot", top_k=3)
+        await rag_service.process_document("Refunds require the original receipt.", "bot", "s2", "text")
+        after = await rag_service.retrieve_relevant_context("refunds receipt", "bot", top_k=3)
+        return before, after
+
+    before, after = asyncio.run(scenario())
+
+    assert len(searches) == 2
+    assert "original receipt" not in before["context"]
+    assert "original receipt" in after["context"]
+
+
+def test_retrieval_settings_changes_bump_the_corpus_version(rag_service, monkeypatch):
+    store = rag_service.vector_store
+    searches = count_calls(monkeypatch, store, "search")
+
+    async def scenario():
+        await rag_service.process_document("Refunds are issued within thirty days.", "bot", "s1", "text")
+        await rag_service.retrieve_relevant_context("refunds", "bot")
+        version = await store.get_corpus_version("bot")
+        await store.update_retrieval_settings("bot", {"ann_nprobe": 4})
+        new_version = await store.get_corpus_version("bot")
+        settings = await store.get_retrieval_settings("bot")
+        # Results cached under the old settings are not served
+        await rag_service.retrieve_relevant_context("refunds", "bot")
+        return version, new_version, settings
+
+    version, new_version, settings = asyncio.run(scenario())
+
+    assert new_version > version
+    assert settings["ann_nprobe"] == 4
+    assert len(searches) == 2
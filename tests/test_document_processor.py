@@ -0,0 +1,35 @@
+import io
+
+import openpyxl
+
+from services.document_processor import DocumentProcessor
+
+
+def make_workbook(sheets):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_spreadsheet_rows_are_streamed_with_their_header():
+    content = make_workbook({
+        "Plans": [["Plan", "Price"], ["Starter", 10], [None, None], ["Pro", 30]],
+        "Notes": [["Refunds within thirty days"]],
+    })
+
+    rows = list(DocumentProcessor.process_file_rows("plans.xlsx", content))
+
+    assert rows == [
+        ("Plans", "Plan\tPrice", "Starter\t10"),
+        ("Plans", "Plan\tPrice", "Pro\t30"),
+        ("Notes", "", "Refunds within thirty days"),
+    ]
+    assert DocumentProcessor.process_file("plans.xlsx", content) == (
+        "Sheet: Plans\nPlan\tPrice\nStarter\t10\nPro\t30\n\nSheet: Notes\nRefunds within thirty days"
+    )
@@ -0,0 +1,59 @@
+import pytest
+
+from services import html_extractor
+from services.html_extractor import BeautifulSoupExtractor, StreamingHTMLExtractor, get_html_extractor
+
+PAGES = {
+    "document": (
+        "<!DOCTYPE html><html><head><title>Docs</title><style>.a { color: red; }</style>"
+        "<script>var x = '<p>not text</p>';</script></head><body>"
+        "<header><h1>Site</h1></header><nav><a href='/a'>A</a></nav>"
+        "<main><h2>Refunds</h2><p>Refunds take <b>thirty</b> days &amp; need a receipt.</p>"
+        "<ul><li>First</li><li>Second</li></ul><pre>line one\n   line two</pre></main>"
+        "<footer>Copyright</footer></body></html>"
+    ),
+    "nested skipped elements": (
+        "<body><nav><nav>inner</nav>still nav</nav><p>visible</p>"
+        "<header><footer>x</footer>y</header><p>after</p></body>"
+    ),
+    "entities and whitespace": "<p>  caf&eacute; &lt;tag&gt; &#169;  </p>\n\n<div>\n  two\n  lines\n</div>",
+    "comments and cdata": "<p>before<!-- hidden --> after</p><![CDATA[raw text]]><p>end</p>",
+    "links": (
+        "<a href='/docs#intro'>Docs</a><a href='https://other.example/x'>Other</a>"
+        "<a href='mailto:team@example.com'>Mail</a><a href=' page.html '>Page</a><a>No href</a>"
+    ),
+}
+
+
+@pytest.mark.parametrize("html", PAGES.values(), ids=PAGES.keys())
+def test_streaming_extractor_matches_beautifulsoup(html):
+    base_url = "https://example.com/guide/"
+
+    assert StreamingHTMLExtractor().extract_page(html, base_url) == BeautifulSoupExtractor().extract_page(html, base_url)
+    assert StreamingHTMLExtractor().extract_text(html) == BeautifulSoupExtractor().extract_text(html)
+
+
+def test_links_are_absolute_http_urls_without_fragments():
+    _, links = StreamingHTMLExtractor().extract_page(PAGES["links"], "https://example.com/guide/")
+
+    assert links == [
+        "https://example.com/docs", "https://other.example/x", "https://example.com/guide/page.html"
+    ]
+
+
+def test_bytes_are_decoded_with_the_declared_charset():
+    html = '<html><head><meta charset="iso-8859-1"></head><body><p>Caf\xe9</p></body></html>'.encode("latin-1")
+
+    assert StreamingHTMLExtractor().extract_text(html) == "Café"
+    assert StreamingHTMLExtractor().extract_text(html) == BeautifulSoupExtractor().extract_text(html)
+
+
+def test_extractor_is_selected_by_environment(monkeypatch):
+    monkeypatch.setattr(html_extractor, "_extractor", None)
+    monkeypatch.setenv("RAG_HTML_EXTRACTOR", "beautifulsoup")
+    assert isinstance(get_html_extractor(), BeautifulSoupExtractor)
+
+    monkeypatch.setattr(html_extractor, "_extractor", None)
+    monkeypatch.setenv("RAG_HTML_EXTRACTOR", "unknown")
+    assert isinstance(get_html_extractor(), StreamingHTMLExtractor)
+    assert isinstance(get_html_extractor("beautifulsoup"), BeautifulSoupExtractor)
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from services.bm25_scorer import CorpusIndex
+from services.inverted_index import InvertedIndex
+
+# Short chunks mentioning a rare term, and many long chunks repeating a common
+# one: ranking the common term's postings by tf alone favours the wrong chunks
+CHUNKS = [
+    "Chargeback disputes need the refund receipt.",
+    "A chargeback reverses the refund.",
+    "Report every chargeback to billing.",
+] + [
+    f"Refund policy {i}: refund requests, refund timing and refund exceptions for order number {i} "
+    "are described together with shipping, returns, warranty and store credit rules."
+    for i in range(30)
+]
+
+
+def reference_ranking(query_terms, top_k):
+    """Exhaustive BM25 over every chunk"""
+    corpus = CorpusIndex.from_term_counts(
+        [str(i) for i in range(len(CHUNKS))], [InvertedIndex.count_terms(text) for text in CHUNKS], version=1
+    )
+    return [(score, CHUNKS[int(i)]) for score, i in corpus.search(query_terms, top_k)]
+
+
+def record_postings_reads(monkeypatch, index):
+    reads = []
+    get_postings = index.get_postings
+
+    async def recording_get_postings(chatbot_id, terms, chunk_ids=None):
+        reads.append((tuple(terms), chunk_ids is None))
+        return await get_postings(chatbot_id, terms, chunk_ids)
+
+    monkeypatch.setattr(index, "get_postings", recording_get_postings)
+    return reads
+
+
+@pytest.mark.parametrize("query", ["chargeback refund", "refund", "refund policy shipping"])
+def test_postings_search_is_exact_bm25(vector_store, query):
+    vector_store.hot_corpus_max_chunks = 0
+
+    async def scenario():
+        await vector_store.add_chunks("bot", [{"text": text} for text in CHUNKS], source_id="s1")
+        return await vector_store._search_postings(
+            "bot", vector_store._extract_keywords(query), await vector_store.inverted_index.get_stats("bot"), 3
+        )
+
+    ranked = asyncio.run(scenario())
+
+    expected = reference_ranking(vector_store._extract_keywords(query), 3)
+    chunk_ids = [chunk_id for _, chunk_id in ranked]
+    assert [CHUNKS[int(chunk_id.rsplit("_", 1)[1])] for chunk_id in chunk_ids] == [text for _, text in expected]
+    assert [score for score, _ in ranked] == pytest.approx([score for score, _ in expected], rel=1e-5)
+
+
+def test_common_terms_are_only_read_for_candidates(vector_store, monkeypatch):
+    vector_store.hot_corpus_max_chunks = 0
+    reads = record_postings_reads(monkeypatch, vector_store.inverted_index)
+
+    async def scenario():
+        await vector_store.add_chunks("bot", [{"text": text} for text in CHUNKS], source_id="s1")
+        return await vector_store.search("bot", query="chargeback refund", top_k=2)
+
+    matches = asyncio.run(scenario())
+
+    assert [match["text"] for match in matches] == [text for _, text in reference_ranking(["chargeback", "refund"], 2)]
+    # The rare term is read in full; its chunks outscore anything "refund" alone can add
+    assert reads == [(("chargeback",), True), (("refund",), False)]
+
+
+def test_legacy_chatbots_are_indexed_in_the_background(vector_store, monkeypatch):
+    store = vector_store
+    backfill = store._backfill_legacy_chunks
+
+    async def scenario():
+        # Chunks stored before the inverted index existed
+        await store.chunks_collection.insert_many([
+            {"chatbot_id": "bot", "chunk_id": f"s1_chunk_{i}", "source_id": "s1", "source_type": "text",
+             "text": text, "chunk_index": i}
+            for i, text in enumerate(CHUNKS[:3])
+        ])
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_backfill(chatbot_id, resumed):
+            started.set()
+            await release.wait()
+            await backfill(chatbot_id, resumed)
+        monkeypatch.setattr(store, "_backfill_legacy_chunks", slow_backfill)
+
+        # The search does not wait for the backfill
+        during = await store.search("bot", query="billing chargeback", top_k=1)
+        await started.wait()
+        building = await store.inverted_index.get_stats("bot")
+
+        release.set()
+        await store._build_tasks["bot"]
+        after = await store.search("bot", query="billing chargeback", top_k=1)
+        return during, building, await store.inverted_index.get_stats("bot"), after
+
+    during, building, built, after = asyncio.run(scenario())
+
+    assert [match["text"] for match in during] == [CHUNKS[2]]
+    assert InvertedIndex.is_building(building)
+    assert not InvertedIndex.is_building(built) and built["total_docs"] == 3
+    assert after == during
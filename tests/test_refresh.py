@@ -0,0 +1,101 @@
+import asyncio
+
+from pymongo import InsertOne
+
+PAGES = [
+    (1, "Pricing starts at ten dollars per month for the starter plan."),
+    (2, "Refunds are issued within thirty days of the purchase date."),
+    (3, "Contact support by email for help with integrations."),
+]
+
+
+async def stored_texts(store, source_id="s1"):
+    chunks = await store.chunks_collection.find({"chatbot_id": "bot", "source_id": source_id}).to_list(None)
+    return sorted(chunk["text"] for chunk in chunks)
+
+
+def test_refresh_rewrites_only_changed_chunks(rag_service):
+    store = rag_service.vector_store
+    changed = [PAGES[0], (2, "Refunds are issued within sixty days of the purchase date."), PAGES[2]]
+
+    async def scenario():
+        await rag_service.process_document("", "bot", "s1", "website", pages=PAGES)
+        kept_before = await store.chunks_collection.find_one({"chatbot_id": "bot", "text": PAGES[0][1]})
+        result = await rag_service.refresh_document("", "bot", "s1", "website", pages=changed)
+        kept_after = await store.chunks_collection.find_one({"chatbot_id": "bot", "text": PAGES[0][1]})
+        matches = await store.search("bot", query="refunds days", top_k=3)
+        return result, kept_before, kept_after, await stored_texts(store), matches
+
+    result, kept_before, kept_after, texts, matches = asyncio.run(scenario())
+
+    assert (result["chunks_added"], result["chunks_kept"], result["chunks_removed"]) == (1, 2, 1)
+    # Unchanged chunks are left in place rather than rewritten
+    assert kept_after["chunk_id"] == kept_before["chunk_id"]
+    assert texts == sorted(text for _, text in changed)
+    assert [match["text"] for match in matches] == [changed[1][1]]
+
+
+def test_refresh_follows_moved_and_removed_chunks(rag_service):
+    store = rag_service.vector_store
+    reordered = [(1, PAGES[2][1]), (2, PAGES[0][1])]
+
+    async def scenario():
+        await rag_service.process_document("", "bot", "s1", "website", pages=PAGES)
+        result = await rag_service.refresh_document("", "bot", "s1", "website", pages=reordered)
+        chunks = await store.chunks_collection.find({"chatbot_id": "bot"}).to_list(None)
+        stats = await store.inverted_index.get_stats("bot")
+        matches = await store.search("bot", query="refunds", top_k=3)
+        return result, chunks, stats, matches
+
+    result, chunks, stats, matches = asyncio.run(scenario())
+
+    assert (result["chunks_added"], result["chunks_kept"], result["chunks_removed"]) == (0, 2, 1)
+    assert {chunk["text"]: chunk["chunk_index"] for chunk in chunks} == {PAGES[2][1]: 0, PAGES[0][1]: 1}
+    assert stats["total_docs"] == 2
+    assert matches == []
+
+
+def test_unchanged_refresh_writes_nothing(rag_service):
+    async def scenario():
+        await rag_service.process_document("", "bot", "s1", "website", pages=PAGES)
+        version = (await rag_service.vector_store.inverted_index.get_stats("bot"))["version"]
+        result = await rag_service.refresh_document("", "bot", "s1", "website", pages=PAGES)
+        return result, version, await rag_service.vector_store.inverted_index.get_stats("bot")
+
+    result, version, stats = asyncio.run(scenario())
+
+    assert (result["chunks_added"], result["chunks_kept"], result["chunks_removed"]) == (0, 3, 0)
+    assert stats["total_docs"] == 3
+    assert stats["version"] == version
+
+
+def test_refresh_interrupted_part_way_is_repaired_by_the_retry(rag_service, monkeypatch):
+    store = rag_service.vector_store
+    changed = [PAGES[0], (2, "Refunds are issued within sixty days of the purchase date."), PAGES[2]]
+    bulk_write = store.chunks_collection.bulk_write
+    crashes = [True]
+
+    async def crashing_bulk_write(operations, **kwargs):
+        if crashes and crashes.pop():
+            # Only the inserts reach MongoDB: old and new chunks are both stored
+            await bulk_write([op for op in operations if isinstance(op, InsertOne)], **kwargs)
+            raise ConnectionError("connection reset")
+        return await bulk_write(operations, **kwargs)
+
+    async def scenario():
+        await rag_service.process_document("", "bot", "s1", "website", pages=PAGES)
+        monkeypatch.setattr(store.chunks_collection, "bulk_write", crashing_bulk_write)
+        result = await rag_service.refresh_document("", "bot", "s1", "website", pages=changed)
+        chunks = await store.chunks_collection.find({"chatbot_id": "bot"}).to_list(None)
+        postings = await store.inverted_index.postings_collection.count_documents({"chatbot_id": "bot"})
+        journals = await store.refreshes_collection.count_documents({})
+        return result, chunks, postings, journals, await store.inverted_index.get_stats("bot")
+
+    result, chunks, postings, journals, stats = asyncio.run(scenario())
+
+    assert result["success"] and not crashes
+    assert sorted(chunk["text"] for chunk in chunks) == sorted(text for _, text in changed)
+    assert postings == sum(len(chunk["term_freqs"]) for chunk in chunks)
+    assert (stats["total_docs"], stats["chunk_count"]) == (3, 3)
+    assert stats["total_length"] == sum(chunk["doc_length"] for chunk in chunks)
+    assert journals == 0
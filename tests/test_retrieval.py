@@ -0,0 +1,185 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services.dense_index import DenseIndex, IVFIndex, reciprocal_rank_fusion
+from services.embedding_service import HashingEmbeddingService
+
+PARAGRAPHS = [
+    "Pricing starts at ten dollars per month for the starter plan.",
+    "Refunds are issued within thirty days of the purchase date.",
+    "Contact support by email for help with integrations.",
+    "The analytics dashboard shows conversations per day and per channel.",
+]
+
+
+async def ingest(rag_service, chatbot_id="bot"):
+    """Store each paragraph as its own single-chunk source"""
+    for i, paragraph in enumerate(PARAGRAPHS):
+        result = await rag_service.process_document(paragraph, chatbot_id, f"s{i}", "text")
+        assert result["success"], result
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    lexical = [(9.0, "a"), (5.0, "b"), (1.0, "c")]
+    dense = [(0.9, "b"), (0.8, "d")]
+
+    fused = reciprocal_rank_fusion([lexical, dense], top_k=3)
+
+    assert [chunk_id for _, chunk_id in fused] == ["b", "a", "d"]
+    assert fused[0][0] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1][0] == pytest.approx(1 / 61)
+
+
+def test_dense_index_ranks_by_cosine_similarity():
+    index = DenseIndex(["x", "y", "z"], np.array([[1, 0], [1, 1], [0, 3]], dtype=np.float32), version=1)
+
+    results = index.search([2.0, 0.1], top_k=2)
+
+    assert [chunk_id for _, chunk_id in results] == ["x", "y"]
+    assert results[0][0] == pytest.approx(2.0 / np.hypot(2.0, 0.1), rel=1e-5)
+
+
+def test_ivf_index_with_every_cluster_probed_matches_exhaustive_search():
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(8, 32))
+    vectors = np.concatenate([center + 0.5 * rng.normal(size=(40, 32)) for center in centers]).astype(np.float32)
+    chunk_ids = [f"c{i}" for i in range(len(vectors))]
+
+    ivf = IVFIndex.train(chunk_ids, vectors, nlist=8)
+    exact = DenseIndex(chunk_ids, vectors, version=1)
+    restored = IVFIndex.from_bytes(ivf.to_bytes())
+
+    for query in vectors[::37]:
+        expected = exact.search(query, top_k=1)[0][1]
+        assert ivf.search(query, top_k=1, nprobe=ivf.nlist)[0][1] == expected
+        assert restored.search(query, top_k=1, nprobe=ivf.nlist)[0][1] == expected
+
+
+def test_switching_to_hybrid_embeds_existing_chunks(rag_service):
+    async def scenario():
+        await ingest(rag_service)
+        switch = await rag_service.set_retrieval_mode("bot", "hybrid")
+        missing = await rag_service.vector_store.get_chunks_without_embeddings("bot")
+        mode = await rag_service.vector_store.get_retrieval_mode("bot")
+        context = await rag_service.retrieve_relevant_context("how long do refunds take", "bot", top_k=1)
+        return switch, missing, mode, context
+
+    switch, missing, mode, context = asyncio.run(scenario())
+
+    assert mode == "hybrid"
+    assert switch["chunks_embedded"] > 0
+    assert missing == []
+    assert "Refunds are issued" in context["context"]
+
+
+def test_dense_search_ranks_stored_embeddings(rag_service):
+    store = rag_service.vector_store
+
+    async def scenario():
+        await ingest(rag_service)
+        await rag_service.set_retrieval_mode("bot", "hybrid")
+        query_embedding = await rag_service.embedding_service.generate_embedding("email support integrations")
+        ranked = await store._search_dense("bot", query_embedding, top_k=len(PARAGRAPHS))
+        chunks = await store._fetch_chunks("bot", [chunk_id for _, chunk_id in ranked])
+        return ranked, chunks
+
+    ranked, chunks = asyncio.run(scenario())
+
+    assert len(ranked) == len(PARAGRAPHS)
+    assert chunks[ranked[0][1]]["text"] == PARAGRAPHS[2]
+    assert [score for score, _ in ranked] == sorted((score for score, _ in ranked), reverse=True)
+
+
+def test_failed_backfill_keeps_the_previous_mode(rag_service):
+    class FailingEmbedder:
+        async def generate_embeddings_batch(self, texts):
+            raise RuntimeError("embedding API unavailable")
+
+    async def scenario():
+        await ingest(rag_service)
+        rag_service._embedding_service = FailingEmbedder()
+        with pytest.raises(RuntimeError):
+            await rag_service.set_retrieval_mode("bot", "hybrid")
+        return await rag_service.vector_store.get_retrieval_mode("bot")
+
+    assert asyncio.run(scenario()) == "lexical"
+
+
+def test_hybrid_search_fuses_dense_candidates(rag_service, monkeypatch):
+    store = rag_service.vector_store
+
+    async def scenario():
+        await ingest(rag_service)
+        await rag_service.set_retrieval_mode("bot", "hybrid")
+        support = await store.chunks_collection.find_one({"chatbot_id": "bot", "text": {"$regex": "^Contact"}})
+
+        # A dense-only candidate (no query term in common) must still be fused in
+        async def dense_only(chatbot_id, query_embedding, top_k):
+            return [(0.9, support["chunk_id"])]
+        monkeypatch.setattr(store, "_search_dense", dense_only)
+
+        query_embedding = await rag_service.embedding_service.generate_embedding("refunds")
+        lexical = await store.search("bot", query="refunds", top_k=2)
+        hybrid = await store.search("bot", query_embedding=query_embedding, query="refunds", top_k=2)
+        return lexical, hybrid
+
+    lexical, hybrid = asyncio.run(scenario())
+
+    assert [match["text"] for match in lexical] == [PARAGRAPHS[1]]
+    assert [match["text"] for match in hybrid] == [PARAGRAPHS[1], PARAGRAPHS[2]]
+
+
+def test_large_hybrid_chatbots_search_through_the_ann_index(rag_service):
+    store = rag_service.vector_store
+    store.ann_min_vectors = 2
+
+    async def scenario():
+        await ingest(rag_service)
+        await rag_service.set_retrieval_mode("bot", "hybrid")
+        settings = await store.get_retrieval_settings("bot")
+        query_embedding = await rag_service.embedding_service.generate_embedding("analytics dashboard conversations")
+        matches = await store.search("bot", query_embedding=query_embedding, query="analytics dashboard", top_k=1)
+        return settings, matches
+
+    settings, matches = asyncio.run(scenario())
+
+    assert settings["ann_index"] is True
+    assert "bot" in store.ann_store.indexes
+    assert matches[0]["text"] == PARAGRAPHS[3]
+
+
+@pytest.mark.parametrize("hot_corpus_max_chunks", [5000, 0])
+def test_batch_retrieval_matches_single_queries(rag_service, hot_corpus_max_chunks):
+    rag_service.vector_store.hot_corpus_max_chunks = hot_corpus_max_chunks
+    queries = ["refunds", "pricing plan", "analytics dashboard", "nothing matches this"]
+
+    async def scenario():
+        await ingest(rag_service)
+        batch = await rag_service.vector_store.search_batch("bot", queries, top_k=2)
+        single = [await rag_service.vector_store.search("bot", query=query, top_k=2) for query in queries]
+        return batch, single
+
+    batch, single = asyncio.run(scenario())
+
+    assert batch == single
+    assert batch[-1] == []
+
+
+def test_blank_texts_get_a_zero_vector_in_place(vector_store):
+    texts = ["Refunds are issued within thirty days.", "   ", "Contact support by email."]
+
+    async def scenario():
+        embeddings = await HashingEmbeddingService().generate_embeddings_batch(texts)
+        await vector_store.add_chunks(
+            "bot", [{"text": text} for text in texts], embeddings=embeddings, source_id="s1"
+        )
+        return embeddings, await vector_store.get_chunks_without_embeddings("bot")
+
+    embeddings, missing = asyncio.run(scenario())
+
+    assert len(embeddings) == len(texts)
+    assert not any(embeddings[1]) and all(any(embedding) for embedding in (embeddings[0], embeddings[2]))
+    # One vector per chunk, so none of them is dropped
+    assert missing == []
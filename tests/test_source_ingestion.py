@@ -0,0 +1,208 @@
+import asyncio
+import io
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services import source_ingestion as source_ingestion_module
+from services.document_processor import DocumentProcessor
+from services.source_ingestion import SourceIngestionService
+
+TEXT = "Refunds are issued within thirty days of the purchase date."
+
+
+class MemoryGridIn:
+    def __init__(self, files, filename):
+        self._files = files
+        self._id = ObjectId()
+        self._data = b""
+
+    async def write(self, data):
+        self._data += data
+
+    async def close(self):
+        self._files[self._id] = self._data
+
+    async def abort(self):
+        self._files.pop(self._id, None)
+
+
+class MemoryGridOut:
+    def __init__(self, data):
+        self._data = data
+
+    async def read(self):
+        return self._data
+
+
+class MemoryGridFSBucket:
+    """AsyncIOMotorGridFSBucket keeping staged uploads in a dict"""
+
+    def __init__(self, db, bucket_name="fs"):
+        self.files = {}
+
+    def open_upload_stream(self, filename, metadata=None):
+        return MemoryGridIn(self.files, filename)
+
+    async def open_download_stream(self, file_id):
+        return MemoryGridOut(self.files[file_id])
+
+    async def delete(self, file_id):
+        del self.files[file_id]
+
+
+@pytest.fixture(autouse=True)
+def offline_ingestion(monkeypatch, ingestion_pool):
+    monkeypatch.setattr(source_ingestion_module, "ingestion_pool", ingestion_pool)
+    monkeypatch.setattr(source_ingestion_module, "AsyncIOMotorGridFSBucket", MemoryGridFSBucket)
+
+
+@pytest.fixture
+def ingestion_service(rag_service):
+    return SourceIngestionService(AsyncMongoMockClient()["botsmith_test"], rag_service)
+
+
+async def add_text_source(ingestion_service, source_id, text=TEXT, chatbot_id="bot"):
+    content_hash = DocumentProcessor.content_hash(text.encode("utf-8"))
+    await ingestion_service.db.sources.insert_one({
+        "id": source_id, "chatbot_id": chatbot_id, "type": "text", "content": text,
+        "status": "processing", "content_hash": content_hash
+    })
+    succeeded = await ingestion_service.ingest_text(chatbot_id, source_id, source_id, text, content_hash)
+    return succeeded, await ingestion_service.db.sources.find_one({"id": source_id})
+
+
+def test_identical_source_shares_the_stored_chunks(ingestion_service):
+    chunks = ingestion_service.rag_service.vector_store.chunks_collection
+
+    async def scenario():
+        first = await add_text_source(ingestion_service, "s1")
+        stored = await chunks.count_documents({"chatbot_id": "bot"})
+        second = await add_text_source(ingestion_service, "s2")
+        shared = await chunks.find_one({"chatbot_id": "bot"})
+        return first, second, stored, await chunks.count_documents({"chatbot_id": "bot"}), shared
+
+    (ok1, first), (ok2, second), stored, stored_after, shared = asyncio.run(scenario())
+
+    assert ok1 and ok2
+    assert first["status"] == second["status"] == "completed"
+    assert second["duplicate_of"] == "s1"
+    assert second["chunks_saved"] == stored
+    assert second["bytes_saved"] == len(TEXT.encode("utf-8"))
+    assert stored_after == stored
+    assert set(shared["source_ids"]) == {"s1", "s2"}
+
+
+def test_repeated_chunks_of_other_sources_are_deduplicated(rag_service):
+    store = rag_service.vector_store
+
+    async def scenario():
+        await rag_service.process_document(TEXT, "bot", "s1", "text")
+        result = await rag_service.process_document(TEXT, "bot", "s2", "text")
+        await rag_service.delete_source("bot", "s1")
+        matches = await store.search("bot", query="refunds", top_k=3)
+        return result, matches
+
+    result, matches = asyncio.run(scenario())
+
+    assert result["success"]
+    assert result["chunks_deduplicated"] == result["chunks_created"] == 1
+    assert result["chunks_stored"] == 0
+    # The shared chunk outlives the source that stored it
+    assert [match["text"] for match in matches] == [TEXT]
+
+
+def test_failed_processing_marks_the_source_failed(ingestion_service, monkeypatch):
+    rag_service = ingestion_service.rag_service
+    process_document = rag_service.process_document
+    # Only the first attempt hits the outage
+    outages = [False, True]
+
+    async def flaky_process_document(**kwargs):
+        if outages.pop():
+            return {"success": False, "error": "embedding API unavailable", "chunks_created": 0}
+        return await process_document(**kwargs)
+
+    monkeypatch.setattr(rag_service, "process_document", flaky_process_document)
+
+    async def scenario():
+        failed = await add_text_source(ingestion_service, "s1")
+        # A failed source is never reused as a duplicate
+        retried = await add_text_source(ingestion_service, "s2")
+        return failed, retried
+
+    (ok1, failed), (ok2, retried) = asyncio.run(scenario())
+
+    assert not ok1
+    assert failed["status"] == "failed"
+    assert "embedding API unavailable" in failed["error_message"]
+    assert ok2 and retried["status"] == "completed"
+    assert "duplicate_of" not in retried
+
+
+def test_file_sources_complete_after_their_chunks_are_stored(ingestion_service):
+    content = b"Pricing starts at ten dollars per month.\n\nRefunds are issued within thirty days."
+
+    async def scenario():
+        await ingestion_service.db.sources.insert_one({"id": "f1", "chatbot_id": "bot", "status": "processing"})
+        succeeded = await ingestion_service.ingest_file(
+            "bot", "f1", "faq.txt", content, DocumentProcessor.content_hash(content)
+        )
+        source = await ingestion_service.db.sources.find_one({"id": "f1"})
+        matches = await ingestion_service.rag_service.vector_store.search("bot", query="pricing", top_k=1)
+        return succeeded, source, matches
+
+    succeeded, source, matches = asyncio.run(scenario())
+
+    assert succeeded
+    assert source["status"] == "completed"
+    assert source["content"] == content.decode("utf-8")
+    assert matches[0]["metadata"]["filename"] == "faq.txt"
+
+
+def test_uploads_are_staged_and_hashed_block_by_block(ingestion_service):
+    ingestion_service.UPLOAD_BLOCK_BYTES = 4
+    content = b"a staged upload larger than one block"
+
+    async def scenario():
+        file_id, content_hash, size = await ingestion_service.stage_upload("a.txt", io.BytesIO(content))
+        loaded = await ingestion_service.load_upload(file_id)
+        oversized = await ingestion_service.stage_upload("b.txt", io.BytesIO(content), max_bytes=10)
+        await ingestion_service.delete_upload(file_id)
+        return content_hash, size, loaded, oversized
+
+    content_hash, size, loaded, oversized = asyncio.run(scenario())
+
+    assert loaded == content
+    assert content_hash == DocumentProcessor.content_hash(content)
+    assert size == len(content)
+    assert oversized is None
+    assert ingestion_service.uploads.files == {}
+
+
+def test_job_progress_completes_the_job_unless_it_failed(ingestion_service):
+    jobs = ingestion_service.db.ingestion_jobs
+
+    async def scenario():
+        await jobs.insert_many([
+            {"id": "j1", "total": 2, "completed": 0, "failed": 0, "status": "processing"},
+            {"id": "j2", "total": 1, "completed": 0, "failed": 0, "status": "processing"},
+        ])
+        await ingestion_service.db.sources.insert_one({"id": "s1", "status": "processing"})
+
+        await ingestion_service.record_job_progress("j1", True)
+        halfway = await jobs.find_one({"id": "j1"})
+        await ingestion_service.record_job_progress("j1", False)
+
+        await ingestion_service.fail_job("j2", "worker crashed", ["s1"])
+        await ingestion_service.record_job_progress("j2", True)
+        return halfway, await jobs.find_one({"id": "j1"}), await jobs.find_one({"id": "j2"}), \
+            await ingestion_service.db.sources.find_one({"id": "s1"})
+
+    halfway, done, failed, source = asyncio.run(scenario())
+
+    assert halfway["status"] == "processing"
+    assert (done["status"], done["completed"], done["failed"]) == ("completed", 1, 1)
+    assert failed["status"] == "failed" and failed["error_message"] == "worker crashed"
+    assert source["status"] == "failed"
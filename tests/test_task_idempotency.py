@@ -0,0 +1,85 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("celery")
+pytest.importorskip("redis")
+fakeredis = pytest.importorskip("fakeredis")
+
+from backend import tasks  # noqa: E402
+
+calls = []
+
+
+@tasks.celery_app.task(base=tasks.IdempotentTask, name="tests.ingest_source")
+def ingest_source(source_id, outcome="success"):
+    calls.append(source_id)
+    if outcome == "error":
+        raise RuntimeError("worker crashed")
+    return {"status": outcome, "source_id": source_id}
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(tasks, "redis_client", client)
+    calls.clear()
+    return client
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    countdowns = []
+    monkeypatch.setattr(ingest_source, "apply_async", lambda args=None, kwargs=None, countdown=None, **options: countdowns.append(countdown))
+    return countdowns
+
+
+def test_finished_task_returns_its_recorded_outcome(redis_client):
+    first = ingest_source("s1")
+    second = ingest_source("s1")
+
+    assert first == second == {"status": "success", "source_id": "s1"}
+    assert calls == ["s1"]
+    assert not redis_client.exists(ingest_source.get_lock_key(ingest_source.generate_task_id("s1")))
+
+
+def test_failed_outcomes_are_recorded_too(redis_client):
+    assert ingest_source("s1", outcome="failed")["status"] == "failed"
+    assert ingest_source("s1", outcome="failed")["status"] == "failed"
+    assert calls == ["s1"]
+
+
+def test_exceptions_release_the_lock(redis_client):
+    with pytest.raises(RuntimeError):
+        ingest_source("s1", outcome="error")
+
+    assert ingest_source("s1")["status"] == "success"
+    assert calls == ["s1", "s1"]
+
+
+def test_duplicates_of_a_running_task_are_deferred_with_backoff(redis_client, scheduled):
+    task_id = ingest_source.generate_task_id("s1")
+    ingest_source.acquire_lock(task_id)
+
+    results = [ingest_source("s1") for _ in range(6)]
+
+    assert {result["status"] for result in results} == {"deferred"}
+    assert scheduled == [5, 10, 20, 40, 60, 60]
+    assert calls == []
+    assert redis_client.ttl(ingest_source.get_lock_key(task_id)) > tasks.celery_app.conf.task_time_limit
+
+
+def test_duplicates_give_up_once_the_lock_could_have_expired(redis_client, scheduled):
+    task_id = ingest_source.generate_task_id("s1")
+    ingest_source.acquire_lock(task_id)
+    deferral_key = ingest_source.get_deferral_key(task_id)
+    redis_client.hset(deferral_key, mapping={"since": time.time() - ingest_source.lock_timeout - 1, "count": 12})
+
+    outcome = ingest_source("s1")
+
+    assert outcome["status"] == "skipped" and outcome["reason"] == "duplicate_timeout"
+    assert outcome["deferrals"] == 13
+    assert scheduled == []
+    recorded = json.loads(redis_client.get(f"task_dropped:{ingest_source.name}:{task_id}"))
+    assert recorded == outcome
@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services import website_crawler as website_crawler_module
+from services.website_crawler import WebsiteCrawler
+
+SITE = {
+    "/": '<html><body><nav><a href="/about">About</a></nav><p>Welcome home</p>'
+         '<a href="/docs">Docs</a><a href="https://other.example/">Elsewhere</a>'
+         '<a href="/manual.pdf">Manual</a></body></html>',
+    "/about": '<html><body><p>About us</p><a href="/team">Team</a></body></html>',
+    "/docs": '<html><body><p>Read the docs</p></body></html>',
+    "/team": '<html><body><p>Our team</p></body></html>',
+}
+ETAGS = {"/": '"home-v1"', "/about": '"about-v1"'}
+
+
+@pytest.fixture(autouse=True)
+def offline_parsing(monkeypatch, ingestion_pool):
+    monkeypatch.setattr(website_crawler_module, "ingestion_pool", ingestion_pool)
+
+
+def make_crawler(handler):
+    crawler = WebsiteCrawler(max_pages=10, max_depth=1)
+    crawler._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+    return crawler
+
+
+def site_handler(requests, site=SITE, etags=ETAGS):
+    def handler(request):
+        requests.append(request)
+        path = request.url.path
+        if request.url.host != "example.com" or path not in site:
+            return httpx.Response(404)
+        etag = etags.get(path)
+        if etag and request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        headers = {"content-type": "text/html; charset=utf-8"}
+        if etag:
+            headers["etag"] = etag
+        return httpx.Response(200, text=site[path], headers=headers)
+    return handler
+
+
+def count_parses(monkeypatch):
+    parsed = []
+    extract_html = website_crawler_module.ingestion_pool.extract_html
+
+    async def counting_extract_html(html, base_url):
+        parsed.append(base_url)
+        return await extract_html(html, base_url)
+
+    monkeypatch.setattr(website_crawler_module.ingestion_pool, "extract_html", counting_extract_html)
+    return parsed
+
+
+def test_crawl_follows_same_host_links_up_to_the_depth():
+    requests = []
+    crawler = make_crawler(site_handler(requests))
+
+    pages = asyncio.run(crawler.crawl("https://example.com/#top"))
+
+    assert [(page["url"], page["depth"]) for page in pages] == [
+        ("https://example.com/", 0), ("https://example.com/about", 1), ("https://example.com/docs", 1)
+    ]
+    assert pages[0]["text"] == "Welcome home\nDocs\nElsewhere\nManual"
+    assert pages[0]["etag"] == '"home-v1"'
+    assert not any(page["unchanged"] for page in pages)
+    assert {request.url.path for request in requests} == {"/", "/about", "/docs"}
+
+
+def test_recrawl_sends_conditional_requests_and_reuses_unchanged_pages(monkeypatch):
+    requests = []
+    crawler = make_crawler(site_handler(requests))
+
+    async def scenario():
+        previous = await crawler.crawl("https://example.com/")
+        requests.clear()
+        parsed = count_parses(monkeypatch)
+        return previous, await crawler.crawl("https://example.com/", previous_pages=previous), parsed
+
+    previous, pages, parsed = asyncio.run(scenario())
+
+    sent = {request.url.path: request.headers.get("if-none-match") for request in requests}
+    assert sent == {"/": '"home-v1"', "/about": '"about-v1"', "/docs": None}
+    # 304 for pages with an ETag, an identical body hash for the others: nothing is parsed
+    assert all(page["unchanged"] for page in pages)
+    assert parsed == []
+    assert [(page["url"], page["text"]) for page in pages] == [(page["url"], page["text"]) for page in previous]
+
+
+def test_recrawl_parses_changed_pages():
+    requests = []
+    site = dict(SITE)
+    crawler = make_crawler(site_handler(requests, site=site, etags={}))
+
+    async def scenario():
+        previous = await crawler.crawl("https://example.com/")
+        site["/docs"] = "<html><body><p>Read the new docs</p></body></html>"
+        return await crawler.crawl("https://example.com/", previous_pages=previous)
+
+    pages = {page["url"]: page for page in asyncio.run(scenario())}
+
+    assert pages["https://example.com/docs"]["text"] == "Read the new docs"
+    assert not pages["https://example.com/docs"]["unchanged"]
+    assert pages["https://example.com/about"]["unchanged"]
+
+
+def test_sitemap_pages_are_crawled_as_one_level():
+    site = dict(SITE)
+    site["/sitemap.xml"] = (
+        '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        '<url><loc>https://example.com/team</loc></url>'
+        '<url><loc>https://other.example/page</loc></url></urlset>'
+    )
+    requests = []
+    crawler = make_crawler(site_handler(requests, site=site))
+
+    pages = asyncio.run(crawler.crawl("https://example.com/", use_sitemap=True))
+
+    assert [page["url"] for page in pages] == ["https://example.com/", "https://example.com/team"]
+    assert "/about" not in {request.url.path for request in requests}